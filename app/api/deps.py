@@ -0,0 +1,31 @@
+"""
+Services the routes depend on, built once per process on first use and shared by every
+request: the event store, executor and their caches hold no per-request state and are
+safe to share across threads. Swap them in tests through `app.dependency_overrides`.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Annotated
+
+from fastapi import Depends
+
+from app.infra.event_store.async_repository import AsyncSqlAlchemyEventStore
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.services.account_service import AccountService
+from app.services.async_account_service import AsyncAccountService
+
+
+@lru_cache
+def get_account_service() -> AccountService:
+    return AccountService(SqlAlchemyEventStore())
+
+
+@lru_cache
+def get_async_account_service() -> AsyncAccountService:
+    return AsyncAccountService(AsyncSqlAlchemyEventStore())
+
+
+AccountServiceDep = Annotated[AccountService, Depends(get_account_service)]
+AsyncAccountServiceDep = Annotated[AsyncAccountService, Depends(get_async_account_service)]
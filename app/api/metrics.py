@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.infra.metrics import get_metrics
+
+router = APIRouter()
+
+PROMETHEUS_TEXT = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    m = get_metrics()
+    if not m.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED)")
+    return PlainTextResponse(m.render(), media_type=PROMETHEUS_TEXT)
@@ -1,6 +1,12 @@
 from fastapi import APIRouter
 
-from app.api.v1.routes import accounts
+from app.api.v1.routes import accounts, accounts_async, usage
+from app.settings import get_settings
 
 router = APIRouter()
-router.include_router(accounts.router, prefix="/accounts", tags=["accounts"])
+router.include_router(
+    accounts_async.router if get_settings().io_mode == "async" else accounts.router,
+    prefix="/accounts",
+    tags=["accounts"],
+)
+router.include_router(usage.router, tags=["usage"])
@@ -1,13 +1,37 @@
-from fastapi import APIRouter, Header, HTTPException
-from pydantic import BaseModel
+import json
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from typing import Annotated
 
-from app.domain.commands import CreateAccount, RecordUsage, ReinstateAccount, SuspendAccount
-from app.domain.errors import InvariantViolation, NotFound
-from app.infra.event_store.repository import SqlAlchemyEventStore
-from app.services.account_service import AccountService
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.api.deps import AccountServiceDep
+from app.domain.commands import (
+    ChangePlan,
+    CreateAccount,
+    RecordUsage,
+    ReinstateAccount,
+    ResetPeriod,
+    ShardUsage,
+    SuspendAccount,
+)
+from app.domain.errors import ConcurrencyConflict, InvariantViolation, NotFound, NotSupported
+from app.infra.event_store.repository import EventQuery
+from app.infra.projections.usage_rollups import Granularity, RollupQuery
+from app.services.point_in_time import AsOf
 
 router = APIRouter()
 
+NDJSON = "application/x-ndjson"
+DEFAULT_EVENTS_PAGE = 1000
+MAX_EVENTS_PAGE = 10_000
+BUCKET = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DEFAULT_USAGE_RANGE = {"hour": timedelta(days=1), "day": timedelta(days=31)}
+# Per meter: a quarter of hourly buckets, ten years of daily ones.
+MAX_USAGE_BUCKETS = 2_300
+
 
 class CreateAccountRequest(BaseModel):
     account_id: str
@@ -25,9 +49,20 @@ class SuspendAccountRequest(BaseModel):
     reason: str
 
 
+class ChangePlanRequest(BaseModel):
+    plan_id: str
+
+
+class ResetPeriodRequest(BaseModel):
+    period: str  # "YYYY-MM", must move forward
+
+
+class ShardUsageRequest(BaseModel):
+    shards: int = Field(ge=1, le=256)  # usage sub-streams; can only grow
+
+
 @router.post("", status_code=201)
-def create_account(req: CreateAccountRequest) -> dict:
-    svc = AccountService(SqlAlchemyEventStore())
+def create_account(req: CreateAccountRequest, svc: AccountServiceDep) -> dict:
     try:
         version = svc.create_account(
             CreateAccount(
@@ -36,36 +71,152 @@ def create_account(req: CreateAccountRequest) -> dict:
                 period=req.period,
             )
         )
-    except InvariantViolation as e:
+    except (InvariantViolation, ConcurrencyConflict) as e:
         raise HTTPException(status_code=409, detail=str(e)) from None
     return {"account_id": req.account_id, "stream_version": version}
 
 
+def _timestamp(value: str) -> datetime:
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid timestamp: {value}") from None
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=UTC)
+
+
+def as_of_query(
+    as_of: str | None = Query(
+        default=None, description="Past state at a stream version or ISO8601 timestamp"
+    ),
+) -> AsOf | None:
+    if as_of is None:
+        return None
+    if as_of.isdigit():
+        return int(as_of)
+    return _timestamp(as_of)
+
+
 @router.get("/{account_id}")
-def get_account(account_id: str) -> dict:
-    svc = AccountService(SqlAlchemyEventStore())
+def get_account(
+    account_id: str,
+    response: Response,
+    svc: AccountServiceDep,
+    max_lag: int | None = Query(
+        default=None, ge=0, description="Max versions the projection may trail the stream"
+    ),
+    if_none_match: str | None = Header(default=None),
+    as_of: Annotated[AsOf | None, Depends(as_of_query)] = None,
+):
     try:
-        return svc.get_state(account_id)
+        if as_of is not None:
+            return svc.get_state_as_of(account_id, as_of)
+        view = svc.get_state(account_id, max_lag=max_lag)
     except NotFound as e:
         raise HTTPException(status_code=404, detail=str(e)) from None
+    except NotSupported as e:
+        raise HTTPException(status_code=422, detail=str(e)) from None
+    return conditional(view, response, if_none_match)
+
+
+def state_etag(view: dict) -> str:
+    # Weak: `remaining` may shift with plan edits without the stream moving.
+    return f'W/"{view["stream_version"]}"'
+
+
+def conditional(view: dict, response: Response, if_none_match: str | None) -> dict | Response:
+    """The view with its ETag, or an empty 304 when the client already has that version."""
+    etag = state_etag(view)
+    if if_none_match is not None:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return view
+
+
+def event_query_params(
+    after: int = Query(default=0, ge=0, description="Return events after this stream_version"),
+    limit: int | None = Query(default=None, ge=1, le=MAX_EVENTS_PAGE),
+    event_type: Annotated[list[str] | None, Query(alias="type")] = None,
+    occurred_from: str | None = Query(default=None, alias="from"),
+    occurred_to: str | None = Query(default=None, alias="to"),
+) -> EventQuery:
+    for value in (occurred_from, occurred_to):
+        if value is not None:
+            try:
+                datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                raise HTTPException(status_code=422, detail=f"Invalid timestamp: {value}") from None
+    return EventQuery(
+        after=after,
+        limit=limit,
+        event_types=tuple(event_type or ()),
+        occurred_from=occurred_from,
+        occurred_to=occurred_to,
+    )
+
+
+def usage_query_params(
+    granularity: Granularity = "hour",
+    start: str | None = Query(default=None, alias="from", description="ISO8601, inclusive"),
+    end: str | None = Query(default=None, alias="to", description="ISO8601, exclusive"),
+    meter: Annotated[list[str] | None, Query()] = None,
+) -> RollupQuery:
+    to = _timestamp(end) if end is not None else datetime.now(UTC)
+    frm = _timestamp(start) if start is not None else to - DEFAULT_USAGE_RANGE[granularity]
+    if frm >= to:
+        raise HTTPException(status_code=422, detail="'from' must be before 'to'")
+    if (to - frm) / BUCKET[granularity] > MAX_USAGE_BUCKETS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Range spans more than {MAX_USAGE_BUCKETS} {granularity} buckets",
+        )
+    return RollupQuery(start=frm, end=to, granularity=granularity, meters=tuple(meter or ()))
+
+
+def wants_ndjson(format: str | None, accept: str | None) -> bool:
+    return format == "ndjson" or (accept or "").startswith(NDJSON)
 
 
 @router.get("/{account_id}/events")
-def list_events(account_id: str) -> dict:
-    svc = AccountService(SqlAlchemyEventStore())
-    return {"account_id": account_id, "events": svc.list_events(account_id)}
+def list_events(
+    account_id: str,
+    query: Annotated[EventQuery, Depends(event_query_params)],
+    svc: AccountServiceDep,
+    format: str | None = None,
+    accept: str | None = Header(default=None),
+):
+    if wants_ndjson(format, accept):
+        # Unbounded unless a limit is given: rows flow from a server-side cursor.
+        lines = (json.dumps(e) + "\n" for e in svc.stream_events(account_id, query))
+        return StreamingResponse(lines, media_type=NDJSON)
+
+    if query.limit is None:
+        query = replace(query, limit=DEFAULT_EVENTS_PAGE)
+    return svc.events_page(account_id, query)
+
+
+@router.get("/{account_id}/usage")
+def usage_over_time(
+    account_id: str,
+    query: Annotated[RollupQuery, Depends(usage_query_params)],
+    svc: AccountServiceDep,
+) -> dict:
+    try:
+        return svc.usage_over_time(account_id, query)
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
 
 
 @router.post("/{account_id}/usage")
 def record_usage(
     account_id: str,
     req: RecordUsageRequest,
+    svc: AccountServiceDep,
     idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
 ) -> dict:
     if not idempotency_key:
         raise HTTPException(status_code=400, detail="Missing Idempotency-Key header")
-
-    svc = AccountService(SqlAlchemyEventStore())
     try:
         version = svc.record_usage(
             RecordUsage(
@@ -79,29 +230,60 @@ def record_usage(
         return {"account_id": account_id, "stream_version": version}
     except NotFound as e:
         raise HTTPException(status_code=404, detail=str(e)) from None
-    except InvariantViolation as e:
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/plan")
+def change_plan(account_id: str, req: ChangePlanRequest, svc: AccountServiceDep) -> dict:
+    try:
+        version = svc.change_plan(ChangePlan(account_id=account_id, new_plan_id=req.plan_id))
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/period")
+def reset_period(account_id: str, req: ResetPeriodRequest, svc: AccountServiceDep) -> dict:
+    try:
+        version = svc.reset_period(ResetPeriod(account_id=account_id, new_period=req.period))
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
         raise HTTPException(status_code=409, detail=str(e)) from None
 
 
 @router.post("/{account_id}/suspend")
-def suspend_account(account_id: str, req: SuspendAccountRequest) -> dict:
-    svc = AccountService(SqlAlchemyEventStore())
+def suspend_account(account_id: str, req: SuspendAccountRequest, svc: AccountServiceDep) -> dict:
     try:
         version = svc.suspend_account(SuspendAccount(account_id=account_id, reason=req.reason))
         return {"account_id": account_id, "stream_version": version}
     except NotFound as e:
         raise HTTPException(status_code=404, detail=str(e)) from None
-    except InvariantViolation as e:
+    except (InvariantViolation, ConcurrencyConflict) as e:
         raise HTTPException(status_code=409, detail=str(e)) from None
 
 
 @router.post("/{account_id}/reinstate")
-def reinstate_account(account_id: str) -> dict:
-    svc = AccountService(SqlAlchemyEventStore())
+def reinstate_account(account_id: str, svc: AccountServiceDep) -> dict:
     try:
         version = svc.reinstate_account(ReinstateAccount(account_id=account_id))
         return {"account_id": account_id, "stream_version": version}
     except NotFound as e:
         raise HTTPException(status_code=404, detail=str(e)) from None
-    except InvariantViolation as e:
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/usage-shards")
+def shard_usage(account_id: str, req: ShardUsageRequest, svc: AccountServiceDep) -> dict:
+    try:
+        version = svc.shard_usage(ShardUsage(account_id=account_id, shards=req.shards))
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
         raise HTTPException(status_code=409, detail=str(e)) from None
@@ -0,0 +1,192 @@
+import json
+from dataclasses import replace
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import AsyncAccountServiceDep
+from app.api.v1.routes.accounts import (
+    DEFAULT_EVENTS_PAGE,
+    NDJSON,
+    ChangePlanRequest,
+    CreateAccountRequest,
+    RecordUsageRequest,
+    ResetPeriodRequest,
+    ShardUsageRequest,
+    SuspendAccountRequest,
+    as_of_query,
+    conditional,
+    event_query_params,
+    usage_query_params,
+    wants_ndjson,
+)
+from app.domain.commands import (
+    ChangePlan,
+    CreateAccount,
+    RecordUsage,
+    ReinstateAccount,
+    ResetPeriod,
+    ShardUsage,
+    SuspendAccount,
+)
+from app.domain.errors import ConcurrencyConflict, InvariantViolation, NotFound, NotSupported
+from app.infra.event_store.repository import EventQuery
+from app.infra.projections.usage_rollups import RollupQuery
+from app.services.point_in_time import AsOf
+
+# Same contract as app.api.v1.routes.accounts, served from async handlers (IO_MODE=async).
+router = APIRouter()
+
+
+@router.post("", status_code=201)
+async def create_account(req: CreateAccountRequest, svc: AsyncAccountServiceDep) -> dict:
+    try:
+        version = await svc.create_account(
+            CreateAccount(
+                account_id=req.account_id,
+                initial_plan_id=req.initial_plan_id,
+                period=req.period,
+            )
+        )
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+    return {"account_id": req.account_id, "stream_version": version}
+
+
+@router.get("/{account_id}")
+async def get_account(
+    account_id: str,
+    response: Response,
+    svc: AsyncAccountServiceDep,
+    max_lag: int | None = Query(
+        default=None, ge=0, description="Max versions the projection may trail the stream"
+    ),
+    if_none_match: str | None = Header(default=None),
+    as_of: Annotated[AsOf | None, Depends(as_of_query)] = None,
+):
+    try:
+        if as_of is not None:
+            return await svc.get_state_as_of(account_id, as_of)
+        view = await svc.get_state(account_id, max_lag=max_lag)
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except NotSupported as e:
+        raise HTTPException(status_code=422, detail=str(e)) from None
+    return conditional(view, response, if_none_match)
+
+
+@router.get("/{account_id}/events")
+async def list_events(
+    account_id: str,
+    query: Annotated[EventQuery, Depends(event_query_params)],
+    svc: AsyncAccountServiceDep,
+    format: str | None = None,
+    accept: str | None = Header(default=None),
+):
+    if wants_ndjson(format, accept):
+        lines = (json.dumps(e) + "\n" async for e in svc.stream_events(account_id, query))
+        return StreamingResponse(lines, media_type=NDJSON)
+
+    if query.limit is None:
+        query = replace(query, limit=DEFAULT_EVENTS_PAGE)
+    return await svc.events_page(account_id, query)
+
+
+@router.get("/{account_id}/usage")
+async def usage_over_time(
+    account_id: str,
+    query: Annotated[RollupQuery, Depends(usage_query_params)],
+    svc: AsyncAccountServiceDep,
+) -> dict:
+    try:
+        return await svc.usage_over_time(account_id, query)
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+
+
+@router.post("/{account_id}/usage")
+async def record_usage(
+    account_id: str,
+    req: RecordUsageRequest,
+    svc: AsyncAccountServiceDep,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+) -> dict:
+    if not idempotency_key:
+        raise HTTPException(status_code=400, detail="Missing Idempotency-Key header")
+    try:
+        version = await svc.record_usage(
+            RecordUsage(
+                account_id=account_id,
+                meter=req.meter,  # type: ignore[arg-type]
+                units=req.units,
+                occurred_at=req.occurred_at,
+                idempotency_key=idempotency_key,
+            )
+        )
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/plan")
+async def change_plan(account_id: str, req: ChangePlanRequest, svc: AsyncAccountServiceDep) -> dict:
+    try:
+        version = await svc.change_plan(ChangePlan(account_id=account_id, new_plan_id=req.plan_id))
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/period")
+async def reset_period(
+    account_id: str, req: ResetPeriodRequest, svc: AsyncAccountServiceDep
+) -> dict:
+    try:
+        version = await svc.reset_period(ResetPeriod(account_id=account_id, new_period=req.period))
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/suspend")
+async def suspend_account(
+    account_id: str, req: SuspendAccountRequest, svc: AsyncAccountServiceDep
+) -> dict:
+    try:
+        version = await svc.suspend_account(
+            SuspendAccount(account_id=account_id, reason=req.reason)
+        )
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/reinstate")
+async def reinstate_account(account_id: str, svc: AsyncAccountServiceDep) -> dict:
+    try:
+        version = await svc.reinstate_account(ReinstateAccount(account_id=account_id))
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/{account_id}/usage-shards")
+async def shard_usage(account_id: str, req: ShardUsageRequest, svc: AsyncAccountServiceDep) -> dict:
+    try:
+        version = await svc.shard_usage(ShardUsage(account_id=account_id, shards=req.shards))
+        return {"account_id": account_id, "stream_version": version}
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e)) from None
+    except (InvariantViolation, ConcurrencyConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
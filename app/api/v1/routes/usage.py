@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from app.api.deps import AccountServiceDep
+from app.domain.commands import RecordUsage
+
+router = APIRouter()
+
+MAX_BATCH_ITEMS = 5000
+
+
+class UsageBatchItem(BaseModel):
+    account_id: str
+    meter: str
+    units: int
+    occurred_at: str  # ISO8601, e.g. 2026-01-28T01:00:00Z
+    idempotency_key: str
+
+
+class UsageBatchRequest(BaseModel):
+    items: list[UsageBatchItem] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+@router.post("/usage:batch")
+def record_usage_batch(req: UsageBatchRequest, svc: AccountServiceDep) -> dict:
+    results = svc.record_usage_batch(
+        [
+            RecordUsage(
+                account_id=item.account_id,
+                meter=item.meter,  # type: ignore[arg-type]
+                units=item.units,
+                occurred_at=item.occurred_at,
+                idempotency_key=item.idempotency_key,
+            )
+            for item in req.items
+        ]
+    )
+    return {
+        "results": [
+            {
+                "index": i,
+                "account_id": item.account_id,
+                "status": r.status,
+                "stream_version": r.stream_version,
+                "error": r.error,
+                "error_type": r.error_type,
+            }
+            for i, (item, r) in enumerate(zip(req.items, results, strict=True))
+        ]
+    }
@@ -8,11 +8,16 @@ from app.domain.commands import (
     RecordUsage,
     ReinstateAccount,
     ResetPeriod,
+    ShardUsage,
     SuspendAccount,
 )
 from app.domain.errors import InvariantViolation, NotFound
 from app.domain.events import EventEnvelope
-from app.domain.types import AccountQuotaState
+from app.domain.types import AccountQuotaState, Meter, Plan
+
+# Bump whenever apply_event changes how state is derived; persisted snapshots
+# are tagged with this and ignored once it moves.
+FOLD_VERSION = 2
 
 
 def apply_event(state: AccountQuotaState, e: EventEnvelope) -> AccountQuotaState:
@@ -49,11 +54,41 @@ def apply_event(state: AccountQuotaState, e: EventEnvelope) -> AccountQuotaState
     if t == "AccountReinstated":
         return replace(state, status="active")
 
+    if t == "UsageSharded":
+        return replace(state, usage_shards=int(p["shards"]))
+
     return state
 
 
-def decide(state: AccountQuotaState, cmd) -> list[EventEnvelope]:
-    # NOTE: limits/plan resolution happens in the app/service layer for simplicity.
+def remaining_quota(state: AccountQuotaState, plan: Plan | None) -> dict[Meter, int] | None:
+    """Units left this period per limited meter (never below 0); None when unlimited."""
+    if not state.exists:
+        return None
+    return remaining_units(state.used or {}, plan)
+
+
+def remaining_units(used: dict[Meter, int], plan: Plan | None) -> dict[Meter, int] | None:
+    if plan is None:
+        return None
+    return {m: max(0, limit - int(used.get(m, 0))) for m, limit in plan.limits.items()}
+
+
+def shard_allowance(limit: int | None, main_used: int, shards: int, shard: int) -> int | None:
+    """
+    Units of a limited meter that usage sub-stream `shard` (of `shards`) may hold this
+    period: what the account's own stream left of `limit`, split as evenly as integers
+    allow. The shares add up to that remainder, so shards deciding independently can never
+    exceed the limit together. None when the meter is unlimited.
+    """
+    if limit is None:
+        return None
+    left = max(0, limit - main_used)
+    return left // shards + (1 if shard < left % shards else 0)
+
+
+def decide(state: AccountQuotaState, cmd, plan: Plan | None = None) -> list[EventEnvelope]:
+    # `plan` is the account's current plan (state.plan_id), resolved by the service layer;
+    # None means no limits are enforced.
     if isinstance(cmd, CreateAccount):
         if state.exists:
             raise InvariantViolation("Account already exists")
@@ -86,6 +121,9 @@ def decide(state: AccountQuotaState, cmd) -> list[EventEnvelope]:
             raise InvariantViolation("Usage units must be > 0")
         if state.status != "active":
             raise InvariantViolation("Cannot record usage when account is suspended")
+        limit = plan.limits.get(cmd.meter) if plan is not None else None
+        if limit is not None and int((state.used or {}).get(cmd.meter, 0)) + cmd.units > limit:
+            raise InvariantViolation(f"Usage limit exceeded for meter '{cmd.meter}'")
         return [
             EventEnvelope(
                 event_type="UsageRecorded",
@@ -133,4 +171,17 @@ def decide(state: AccountQuotaState, cmd) -> list[EventEnvelope]:
             )
         ]
 
+    if isinstance(cmd, ShardUsage):
+        # Never shrinks: the sub-streams already written keep counting for the period.
+        if cmd.shards <= state.usage_shards:
+            raise InvariantViolation(f"Usage shards can only grow (currently {state.usage_shards})")
+        return [
+            EventEnvelope(
+                event_type="UsageSharded",
+                schema_version=1,
+                occurred_at="now",
+                payload={"shards": cmd.shards},
+            )
+        ]
+
     raise InvariantViolation(f"Unknown command: {type(cmd).__name__}")
@@ -42,3 +42,9 @@ class SuspendAccount:
 @dataclass(frozen=True)
 class ReinstateAccount:
     account_id: str
+
+
+@dataclass(frozen=True)
+class ShardUsage:
+    account_id: str
+    shards: int  # usage sub-streams; can only grow
@@ -12,3 +12,7 @@ class InvariantViolation(DomainError):
 
 class ConcurrencyConflict(DomainError):
     pass
+
+
+class NotSupported(DomainError):
+    """A valid request this service cannot answer (yet) for the account at hand."""
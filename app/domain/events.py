@@ -10,6 +10,7 @@ EventType = Literal[
     "PeriodReset",
     "AccountSuspended",
     "AccountReinstated",
+    "UsageSharded",
 ]
 
 
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from app.domain.aggregate import apply_event
+from app.domain.events import EventEnvelope
+from app.domain.types import AccountQuotaState
+
+
+class StateFold:
+    """
+    Mutable accumulator for replaying a stream: same result as folding `apply_event`, but
+    one object and one `used` dict for the whole replay instead of a new state (and, for
+    usage, a new dict) per event. Freeze it into an AccountQuotaState once at the end.
+    """
+
+    __slots__ = ("exists", "status", "plan_id", "period", "used", "usage_shards")
+
+    def __init__(self, state: AccountQuotaState | None = None) -> None:
+        state = state if state is not None else AccountQuotaState()
+        self.exists = state.exists
+        self.status = state.status
+        self.plan_id = state.plan_id
+        self.period = state.period
+        # Copied once so the caller's state is never mutated.
+        self.used: dict[str, int] | None = dict(state.used) if state.used is not None else None
+        self.usage_shards = state.usage_shards
+
+    def apply(self, e: EventEnvelope) -> None:
+        handler = _HANDLERS.get((e.event_type, e.schema_version))
+        if handler is None:
+            # Unknown (type, version): defer to the reference fold.
+            self._thaw(apply_event(self.freeze(), e))
+        elif self.exists or e.event_type == "AccountCreated":
+            handler(self, e.payload)
+
+    def apply_all(self, events: Iterable[EventEnvelope]) -> StateFold:
+        for e in events:
+            self.apply(e)
+        return self
+
+    def freeze(self) -> AccountQuotaState:
+        return AccountQuotaState(
+            exists=self.exists,
+            status=self.status,  # type: ignore[arg-type]
+            plan_id=self.plan_id,
+            period=self.period,
+            used=dict(self.used) if self.used is not None else None,  # type: ignore[arg-type]
+            usage_shards=self.usage_shards,
+        )
+
+    def _thaw(self, state: AccountQuotaState) -> None:
+        self.exists = state.exists
+        self.status = state.status
+        self.plan_id = state.plan_id
+        self.period = state.period
+        self.used = dict(state.used) if state.used is not None else None
+        self.usage_shards = state.usage_shards
+
+
+def _created(f: StateFold, p: dict[str, Any]) -> None:
+    f.exists = True
+    f.status = "active"
+    f.plan_id = p["plan_id"]
+    f.period = p["period"]
+    f.used = {}
+    f.usage_shards = 0
+
+
+def _plan_changed(f: StateFold, p: dict[str, Any]) -> None:
+    f.plan_id = p["plan_id"]
+
+
+def _usage_recorded(f: StateFold, p: dict[str, Any]) -> None:
+    used = f.used
+    if used is None:
+        used = f.used = {}
+    meter = p["meter"]
+    used[meter] = int(used.get(meter, 0)) + int(p["units"])
+
+
+def _period_reset(f: StateFold, p: dict[str, Any]) -> None:
+    f.period = p["period"]
+    f.used = {}
+
+
+def _suspended(f: StateFold, p: dict[str, Any]) -> None:
+    f.status = "suspended"
+
+
+def _reinstated(f: StateFold, p: dict[str, Any]) -> None:
+    f.status = "active"
+
+
+def _usage_sharded(f: StateFold, p: dict[str, Any]) -> None:
+    f.usage_shards = int(p["shards"])
+
+
+# Keyed by (event_type, schema_version). Must stay in step with apply_event (and bump
+# FOLD_VERSION with it); tests/unit/test_fold.py compares the two.
+_HANDLERS: dict[tuple[str, int], Callable[[StateFold, dict[str, Any]], None]] = {
+    ("AccountCreated", 1): _created,
+    ("PlanChanged", 1): _plan_changed,
+    ("UsageRecorded", 1): _usage_recorded,
+    ("UsageRecorded", 2): _usage_recorded,
+    ("PeriodReset", 1): _period_reset,
+    ("AccountSuspended", 1): _suspended,
+    ("AccountReinstated", 1): _reinstated,
+    ("UsageSharded", 1): _usage_sharded,
+}
+
+
+def fold(
+    events: Iterable[EventEnvelope], state: AccountQuotaState | None = None
+) -> AccountQuotaState:
+    """Replay `events` on top of `state` (default: empty); equivalent to folding apply_event."""
+    return StateFold(state).apply_all(events).freeze()
@@ -19,3 +19,5 @@ class AccountQuotaState:
     plan_id: str | None = None
     period: str | None = None  # e.g. "2026-01"
     used: dict[Meter, int] | None = None
+    # Usage sub-streams (UsageSharded); 0 records usage on the account's own stream.
+    usage_shards: int = 0
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import replace
+from typing import Any
+
+from app.domain.events import EventEnvelope
+
+Upcaster = Callable[[dict[str, Any]], dict[str, Any]]
+
+# (event_type, schema_version) -> function lifting a payload of that version to version + 1.
+# Stored events are never rewritten; readers see the latest version of every event.
+_UPCASTERS: dict[tuple[str, int], Upcaster] = {}
+# (event_type, schema_version) -> (target version, chain of upcasters), built on first use.
+_CHAINS: dict[tuple[str, int], tuple[int, tuple[Upcaster, ...]]] = {}
+
+
+def upcaster(event_type: str, from_version: int) -> Callable[[Upcaster], Upcaster]:
+    def register(fn: Upcaster) -> Upcaster:
+        _UPCASTERS[(event_type, from_version)] = fn
+        _CHAINS.clear()
+        return fn
+
+    return register
+
+
+def _chain(event_type: str, version: int) -> tuple[int, tuple[Upcaster, ...]]:
+    key = (event_type, version)
+    chain = _CHAINS.get(key)
+    if chain is None:
+        steps = []
+        while (fn := _UPCASTERS.get((event_type, version))) is not None:
+            steps.append(fn)
+            version += 1
+        chain = _CHAINS[key] = (version, tuple(steps))
+    return chain
+
+
+def upcast(e: EventEnvelope) -> EventEnvelope:
+    """`e` lifted to the latest schema version of its type (itself when already current)."""
+    version, steps = _chain(e.event_type, e.schema_version)
+    if not steps:
+        return e
+    payload = e.payload
+    for step in steps:
+        payload = step(payload)
+    return replace(e, schema_version=version, payload=payload)
+
+
+@upcaster("UsageRecorded", 1)
+def _usage_recorded_v1(p: dict[str, Any]) -> dict[str, Any]:
+    # v2 added the origin of the usage; everything before it came through the API.
+    return {**p, "source": "api"}
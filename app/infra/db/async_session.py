@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.infra.db.pool import configure_engine, engine_options
+from app.infra.db.session import DATABASE_URL
+from app.settings import get_settings
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg",
+    "postgresql+psycopg2": "postgresql+psycopg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto an asyncio driver (psycopg 3 serves both)."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is not None:
+        parsed = parsed.set(drivername=driver)
+    return parsed.render_as_string(hide_password=False)
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    # Built lazily so the sync-only deployment never needs an asyncio driver installed.
+    url = async_database_url(DATABASE_URL)
+    settings = get_settings()
+    engine = create_async_engine(url, **engine_options(url, settings, asyncio=True))
+    configure_engine(engine.sync_engine, settings, "async")
+    return engine
+
+
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False)
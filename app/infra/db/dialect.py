@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def upsert_insert(session: Session, table: Table):
+    """
+    INSERT construct for the session's dialect that supports
+    `.on_conflict_do_nothing()` / `.on_conflict_do_update()` (Postgres and SQLite).
+    """
+    name = session.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(table)
+    if name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on dialect '{name}'")
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_AFTER_COMMIT_KEY = "quota_ledger.after_commit"
+
+
+def on_commit(session: Session, fn: Callable[[], None]) -> None:
+    """
+    Run `fn` once the session's current transaction commits; dropped on rollback.
+    For in-process side effects (caches) that must never observe uncommitted writes.
+    """
+    session.info.setdefault(_AFTER_COMMIT_KEY, []).append(fn)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    for fn in session.info.pop(_AFTER_COMMIT_KEY, ()):
+        fn()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT_KEY, None)
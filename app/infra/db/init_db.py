@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import app.infra.plans.models  # noqa: F401
 import app.infra.projections.models  # noqa: F401
+import app.infra.snapshots.models  # noqa: F401
 from app.infra.db.session import engine
 from app.infra.event_store.models import Base
 
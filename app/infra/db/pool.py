@@ -0,0 +1,118 @@
+"""
+Connection pool configuration shared by the sync and async engines.
+
+Pools are per engine, so per worker process: size them as (workers x (DB_POOL_SIZE +
+DB_MAX_OVERFLOW)) against the database's max_connections. Checkout waits, timeouts and
+occupancy are reported through app.infra.metrics under the pool's name ("sync"/"async").
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import suppress
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
+
+from app.infra.metrics import get_metrics
+from app.settings import Settings
+
+
+def _timed_get(name: str, get: Any) -> Any:
+    metrics = get_metrics()
+    started = time.perf_counter()
+    try:
+        return get()
+    except exc.TimeoutError:
+        metrics.pool_timeouts.inc(1, name)
+        raise
+    finally:
+        metrics.pool_wait_seconds.observe(time.perf_counter() - started, name)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self) -> Any:
+        return _timed_get("sync", super()._do_get)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self) -> Any:
+        return _timed_get("async", super()._do_get)
+
+
+def _in_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, settings: Settings, asyncio: bool = False) -> dict[str, Any]:
+    """create_engine / create_async_engine keyword arguments for `url` under `settings`."""
+    options: dict[str, Any] = {
+        "pool_pre_ping": settings.db_pre_ping == "always",
+        "pool_recycle": settings.db_pool_recycle_s,
+        "query_cache_size": settings.db_statement_cache_size,
+    }
+    # An in-memory SQLite database lives in its one connection: keep SQLAlchemy's pool.
+    if not _in_memory_sqlite(url):
+        options.update(
+            poolclass=TimedAsyncQueuePool if asyncio else TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_s,
+        )
+    if (
+        make_url(url).get_backend_name() == "postgresql"
+        and settings.db_prepare_threshold is not None
+    ):
+        options["connect_args"] = {"prepare_threshold": settings.db_prepare_threshold}
+    return options
+
+
+def configure_engine(engine: Engine, settings: Settings, name: str) -> None:
+    """Idle pre-ping and occupancy gauges for `engine` (the sync_engine of an async one)."""
+    if settings.db_pre_ping == "idle":
+        _install_idle_pre_ping(engine, settings.db_pre_ping_idle_s, name)
+
+    metrics = get_metrics()
+    # Read through the engine: dispose() replaces its pool.
+    metrics.pool_checked_out.set_function(lambda: _stat(engine, "checkedout"), name)
+    metrics.pool_overflow.set_function(lambda: _stat(engine, "overflow"), name)
+    metrics.pool_size.set_function(lambda: _stat(engine, "size"), name)
+
+
+def _stat(engine: Engine, attr: str) -> float:
+    fn = getattr(engine.pool, attr, None)
+    return float(fn()) if fn is not None else 0.0
+
+
+def _install_idle_pre_ping(engine: Engine, idle_s: float, name: str) -> None:
+    """
+    Ping a connection on checkout only when it sat in the pool for over `idle_s`: a
+    connection used a moment ago is all but certainly alive, and pinging it costs a round
+    trip per transaction. A failed ping makes the pool replace the connection and retry.
+    """
+    pings = get_metrics().pool_pings
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection: Any, record: ConnectionPoolEntry) -> None:
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection: Any, record: ConnectionPoolEntry, proxy: Any) -> None:
+        checked_in_at = record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_s:
+            return
+        pings.inc(1, name)
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as e:
+            raise exc.DisconnectionError("Idle connection failed its ping") from e
+        finally:
+            # After a failed ping the connection is being replaced anyway.
+            with suppress(Exception):
+                cursor.close()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.domain.events import EventEnvelope
+from app.domain.fold import StateFold
+from app.domain.types import AccountQuotaState
+from app.domain.upcasting import upcast
+from app.infra.event_store.codec import decode_payload
+from app.infra.event_store.models import Event, EventSegment
+from app.infra.snapshots.store import SqlAlchemySnapshotStore
+
+# Events per segment: bounds the archiver's memory and what one page read decompresses.
+SEGMENT_EVENTS = 10_000
+
+
+@dataclass(frozen=True)
+class ArchivedEvent:
+    position: int
+    stream_version: int
+    envelope: EventEnvelope
+    recorded_at: str
+
+
+def _iso(value: datetime) -> str:
+    value = value.astimezone(UTC) if value.tzinfo is not None else value.replace(tzinfo=UTC)
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def encode_segment(rows: list[Event]) -> bytes:
+    """
+    Events as stored (schema version and payload untouched, whatever their codec) in a
+    zlib-compressed JSON array, one positional list per event.
+    """
+    records: list[list[Any]] = [
+        [
+            r.position,
+            r.stream_version,
+            r.event_id,
+            r.event_type,
+            r.event_schema_version,
+            _iso(r.occurred_at),
+            r.idempotency_key,
+            decode_payload(
+                r.payload_codec, r.event_type, r.event_schema_version, r.payload, r.payload_bin
+            ),
+            r.meta,
+            _iso(r.recorded_at),
+        ]
+        for r in rows
+    ]
+    return zlib.compress(json.dumps(records, separators=(",", ":")).encode(), 6)
+
+
+def decode_segment(data: bytes) -> list[ArchivedEvent]:
+    out: list[ArchivedEvent] = []
+    recorded_at = ""
+    for record in json.loads(zlib.decompress(data)):
+        position, version, _, event_type, schema_version, occurred_at, key, payload, _ = record[:9]
+        # Segments written before recorded_at existed: the running max of occurred_at, as
+        # the migration that added the column backfilled it.
+        recorded_at = record[9] if len(record) > 9 else max(recorded_at, occurred_at)
+        out.append(
+            ArchivedEvent(
+                position=position,
+                stream_version=version,
+                envelope=upcast(
+                    EventEnvelope(
+                        event_type=event_type,
+                        schema_version=schema_version,
+                        occurred_at=occurred_at,
+                        payload=payload,
+                        idempotency_key=key,
+                    )
+                ),
+                recorded_at=recorded_at,
+            )
+        )
+    return out
+
+
+def read_archived_many(
+    session: Session, ranges: dict[str, tuple[int, int]]
+) -> dict[str, list[ArchivedEvent]]:
+    """Archived events per stream with after < stream_version <= through, in order."""
+    out: dict[str, list[ArchivedEvent]] = {stream_id: [] for stream_id in ranges}
+    wanted = {sid: (after, through) for sid, (after, through) in ranges.items() if after < through}
+    if not wanted:
+        return out
+    segments = session.execute(
+        select(EventSegment.stream_id, EventSegment.data)
+        .where(
+            or_(
+                *(
+                    and_(
+                        EventSegment.stream_id == sid,
+                        EventSegment.last_version > after,
+                        EventSegment.first_version <= through,
+                    )
+                    for sid, (after, through) in wanted.items()
+                )
+            )
+        )
+        .order_by(EventSegment.stream_id, EventSegment.first_version)
+    )
+    for stream_id, data in segments:
+        after, through = wanted[stream_id]
+        out[stream_id].extend(
+            e for e in decode_segment(data) if after < e.stream_version <= through
+        )
+    return out
+
+
+def iter_archived(
+    session: Session, stream_id: str, after: int, through: int
+) -> Iterator[ArchivedEvent]:
+    """
+    Archived events with after < stream_version <= through, in order. The segment index
+    picks the segments overlapping the range, and each is fetched and decompressed only
+    when the caller gets to it, so a page read stops at the segments it needs.
+    """
+    if after >= through:
+        return
+    starts = (
+        session.execute(
+            select(EventSegment.first_version)
+            .where(
+                EventSegment.stream_id == stream_id,
+                EventSegment.last_version > after,
+                EventSegment.first_version <= through,
+            )
+            .order_by(EventSegment.first_version)
+        )
+        .scalars()
+        .all()
+    )
+    for first in starts:
+        data = session.execute(
+            select(EventSegment.data).where(
+                EventSegment.stream_id == stream_id, EventSegment.first_version == first
+            )
+        ).scalar_one()
+        yield from (e for e in decode_segment(data) if after < e.stream_version <= through)
+
+
+def read_archived(
+    session: Session, stream_id: str, after: int, through: int
+) -> list[ArchivedEvent]:
+    return list(iter_archived(session, stream_id, after, through))
+
+
+def states_at_boundary(
+    session: Session,
+    archived_through: dict[str, int],
+    snapshots: SqlAlchemySnapshotStore | None = None,
+) -> dict[str, AccountQuotaState]:
+    """
+    State of each stream at its archive boundary: the snapshot the archiver left there,
+    or (after a FOLD_VERSION change) the nearest earlier one plus the archived events.
+    """
+    snapshots = snapshots if snapshots is not None else SqlAlchemySnapshotStore()
+    wanted = {sid: through for sid, through in archived_through.items() if through > 0}
+    base = snapshots.load_at_or_before_many(session, wanted)
+    folding = {sid: StateFold(base[sid].state if sid in base else None) for sid in wanted}
+    missing = {
+        sid: (base[sid].stream_version if sid in base else 0, through)
+        for sid, through in wanted.items()
+        if sid not in base or base[sid].stream_version < through
+    }
+    for sid, events in read_archived_many(session, missing).items():
+        folding[sid].apply_all(e.envelope for e in events)
+    return {sid: acc.freeze() for sid, acc in folding.items()}
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.domain.events import EventEnvelope
+from app.infra.db.async_session import get_async_sessionmaker
+from app.infra.event_store.repository import (
+    EventQuery,
+    RecordedEvent,
+    SqlAlchemyEventStore,
+    archived_page,
+    events_query,
+    integrity_conflict,
+    to_recorded,
+)
+
+
+class AsyncSqlAlchemyEventStore:
+    """
+    asyncio variant of SqlAlchemyEventStore on an AsyncEngine.
+
+    The statements are the sync store's, run through AsyncSession.run_sync: the driver
+    awaits the database on the event loop, so no worker thread is held per request.
+    """
+
+    def __init__(
+        self,
+        store: SqlAlchemyEventStore | None = None,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> None:
+        self.sync = store if store is not None else SqlAlchemyEventStore()
+        self.session_factory = session_factory or get_async_sessionmaker()
+
+    async def append(
+        self,
+        stream_id: str,
+        expected_version: int,
+        events: list[EventEnvelope],
+        session: AsyncSession | None = None,
+    ) -> int:
+        if session is not None:
+            return await session.run_sync(
+                lambda s: self.sync.append(stream_id, expected_version, events, session=s)
+            )
+
+        async with self.session_factory() as session:
+            next_version = await self.append(stream_id, expected_version, events, session=session)
+            try:
+                await session.commit()
+            except IntegrityError as exc:
+                await session.rollback()
+                raise integrity_conflict() from exc
+            return next_version
+
+    async def load_stream(
+        self, stream_id: str, session: AsyncSession | None = None
+    ) -> list[EventEnvelope]:
+        return await self.load_stream_since(stream_id, 0, session=session)
+
+    async def load_stream_since(
+        self, stream_id: str, since_version: int, session: AsyncSession | None = None
+    ) -> list[EventEnvelope]:
+        if session is None:
+            async with self.session_factory() as session:
+                return await self.load_stream_since(stream_id, since_version, session=session)
+
+        return await session.run_sync(
+            lambda s: self.sync.load_stream_since(stream_id, since_version, session=s)
+        )
+
+    async def read_page(self, stream_id: str, query: EventQuery) -> list[RecordedEvent]:
+        async with self.session_factory() as session:
+            return await session.run_sync(
+                lambda s: list(self.sync.iter_events(s, stream_id, query))
+            )
+
+    async def iter_events(
+        self, stream_id: str, query: EventQuery, yield_per: int = 500
+    ) -> AsyncIterator[RecordedEvent]:
+        """Async twin of SqlAlchemyEventStore.iter_events (server-side cursor)."""
+        async with self.session_factory() as session:
+            archived, rest = await session.run_sync(archived_page, stream_id, query)
+            for r in archived:
+                yield r
+            if rest is None:
+                return
+            rows = await session.stream_scalars(
+                events_query(stream_id, rest).execution_options(yield_per=yield_per)
+            )
+            async for r in rows:
+                yield to_recorded(r)
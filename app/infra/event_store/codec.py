@@ -0,0 +1,119 @@
+"""
+Event payload codecs.
+
+"json" rows keep the payload in the JSON column. "compact" rows store it in `payload_bin`
+using a fixed binary layout per (event_type, schema_version): a little-endian struct
+header holding the integer fields and the byte length of each string field, followed by
+the UTF-8 strings. Field names are implied by the layout, so a usage event takes about
+half the bytes of its JSON and decodes with one `unpack_from` plus slicing.
+
+Payloads a layout cannot represent exactly (extra or missing keys, other value types,
+out-of-range numbers) are stored as JSON whatever the configured codec. Layouts are part
+of the stored format: never change or remove one that rows may have been written with;
+add an event version (and an upcaster) instead.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Callable
+from typing import Any, Literal
+
+Codec = Literal["json", "compact"]
+
+JSON: Codec = "json"
+COMPACT: Codec = "compact"
+
+_INT = "q"
+_STR = "H"
+_INT_RANGE = range(-(2**63), 2**63)
+_STR_MAX = 2**16 - 1
+
+
+class Layout:
+    __slots__ = ("fields", "header", "keys", "decode")
+
+    def __init__(self, *fields: tuple[str, type]) -> None:
+        self.fields = fields
+        self.keys = frozenset(name for name, _ in fields)
+        self.header = struct.Struct("<" + "".join(_INT if t is int else _STR for _, t in fields))
+        self.decode = self._compile_decoder()
+
+    def encode(self, payload: dict[str, Any]) -> bytes | None:
+        """The packed payload, or None if this layout cannot represent it exactly."""
+        if payload.keys() != self.keys:
+            return None
+        header: list[int] = []
+        strings: list[bytes] = []
+        for name, kind in self.fields:
+            value = payload[name]
+            if type(value) is not kind:  # bool is not an int here
+                return None
+            if kind is int:
+                if value not in _INT_RANGE:
+                    return None
+                header.append(value)
+            else:
+                raw = value.encode()
+                if len(raw) > _STR_MAX:
+                    return None
+                header.append(len(raw))
+                strings.append(raw)
+        return self.header.pack(*header) + b"".join(strings)
+
+    def _compile_decoder(self) -> Callable[[bytes], dict[str, Any]]:
+        unpack_from = self.header.unpack_from
+        start = self.header.size
+        fields = tuple((name, kind is str) for name, kind in self.fields)
+
+        def decode(buf: bytes) -> dict[str, Any]:
+            values = unpack_from(buf)
+            out: dict[str, Any] = {}
+            offset = start
+            for (name, is_str), value in zip(fields, values, strict=True):
+                if is_str:
+                    end = offset + value
+                    out[name] = buf[offset:end].decode()
+                    offset = end
+                else:
+                    out[name] = value
+            return out
+
+        return decode
+
+
+LAYOUTS: dict[tuple[str, int], Layout] = {
+    ("AccountCreated", 1): Layout(("plan_id", str), ("period", str)),
+    ("PlanChanged", 1): Layout(("plan_id", str)),
+    ("UsageRecorded", 1): Layout(("meter", str), ("units", int)),
+    ("UsageRecorded", 2): Layout(("meter", str), ("units", int), ("source", str)),
+    ("PeriodReset", 1): Layout(("period", str)),
+    ("AccountSuspended", 1): Layout(("reason", str)),
+    ("AccountReinstated", 1): Layout(),
+}
+
+
+def encode_payload(
+    event_type: str, schema_version: int, payload: dict[str, Any], codec: Codec
+) -> tuple[Codec, dict[str, Any] | None, bytes | None]:
+    """(codec used, JSON payload, binary payload) for storing `payload`; one side is None."""
+    if codec == COMPACT:
+        layout = LAYOUTS.get((event_type, schema_version))
+        packed = layout.encode(payload) if layout is not None else None
+        if packed is not None:
+            return COMPACT, None, packed
+    return JSON, payload, None
+
+
+def decode_payload(
+    codec: str,
+    event_type: str,
+    schema_version: int,
+    payload: dict[str, Any] | None,
+    payload_bin: bytes | None,
+) -> dict[str, Any]:
+    if codec == JSON:
+        return payload  # type: ignore[return-value]
+    if codec == COMPACT:
+        return LAYOUTS[(event_type, schema_version)].decode(payload_bin)  # type: ignore[arg-type]
+    raise ValueError(f"Unknown payload codec {codec!r}")
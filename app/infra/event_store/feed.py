@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.infra.event_store.models import Event
+from app.infra.event_store.repository import RecordedEvent, to_recorded
+
+
+def head_position(session: Session) -> int:
+    return session.execute(select(func.coalesce(func.max(Event.position), 0))).scalar_one()
+
+
+def read_all(session: Session, after: int, limit: int) -> list[RecordedEvent]:
+    """Events from every stream with position > after, in position order."""
+    rows = session.execute(
+        select(Event).where(Event.position > after).order_by(Event.position.asc()).limit(limit)
+    ).scalars()
+    return [to_recorded(r) for r in rows]
+
+
+class CatchUpSubscription:
+    """
+    Ordered, gap-aware reader over the global feed.
+
+    Positions come from a sequence, so a transaction can commit a higher position before
+    a lower one is visible, and a rolled-back transaction leaves a permanent hole. A
+    subscriber that simply followed `position > last` could skip the late commit forever.
+    `poll` therefore only hands out the contiguous run after `position`, and treats a
+    hole as permanent once it lies below a feed head observed at least `gap_timeout`
+    seconds ago (anything still in flight would have committed or rolled back by then).
+    """
+
+    def __init__(self, position: int = 0, batch_size: int = 500, gap_timeout: float = 2.0) -> None:
+        self.position = position
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self._heads: deque[tuple[float, int]] = deque()  # (observed at, head position)
+
+    def _settled_horizon(self, session: Session) -> int:
+        now = time.monotonic()
+        self._heads.append((now, head_position(session)))
+        settled = 0
+        while self._heads and self._heads[0][0] <= now - self.gap_timeout:
+            settled = self._heads.popleft()[1]
+        if settled:
+            # Keep it as the oldest observation so the horizon never moves backwards.
+            self._heads.appendleft((now - self.gap_timeout, settled))
+        return settled
+
+    def poll(self, session: Session) -> list[RecordedEvent]:
+        """
+        Next batch of events after `position`, in order. Does not advance `position`;
+        call `ack` once the batch has been applied (see ProjectorRunner).
+        """
+        events = read_all(session, self.position, self.batch_size)
+        if not events:
+            return []
+
+        settled = None
+        expected = self.position + 1
+        for i, e in enumerate(events):
+            if e.position != expected:
+                if settled is None:
+                    settled = self._settled_horizon(session)
+                if e.position - 1 > settled:
+                    return events[:i]
+            expected = e.position + 1
+        return events
+
+    def ack(self, position: int) -> None:
+        self.position = position
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.settings import get_settings
+
+
+class BloomFilter:
+    def __init__(self, bits: int, hashes: int = 4) -> None:
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=8 * self.hashes).digest()
+        return [
+            int.from_bytes(digest[i * 8 : (i + 1) * 8], "little") % self.bits
+            for i in range(self.hashes)
+        ]
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class IdempotencyCache:
+    """
+    Bounded LRU + TTL cache of (stream_id, idempotency_key) -> stream version the key was
+    recorded at. Only committed results go in, so a hit is safe to return without touching
+    the database.
+
+    With `bloom_bits` > 0, each stream also gets a Bloom filter of the keys this worker
+    has seen. A key the filter has definitely not seen lets the store skip its idempotency
+    SELECT and lean on the unique constraint instead (see SqlAlchemyEventStore._append).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        ttl_seconds: float = 3600.0,
+        bloom_bits: int = 0,
+        bloom_streams: int = 10_000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.bloom_bits = bloom_bits
+        self.bloom_streams = bloom_streams
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bloom_skips = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], tuple[int, float]] = OrderedDict()
+        self._blooms: OrderedDict[str, BloomFilter] = OrderedDict()
+
+    def get(self, stream_id: str, key: str) -> int | None:
+        with self._lock:
+            entry = self._entries.get((stream_id, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            version, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[(stream_id, key)]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end((stream_id, key))
+            self.hits += 1
+            return version
+
+    def put(self, stream_id: str, key: str, version: int) -> None:
+        with self._lock:
+            if self.max_entries > 0:
+                self._entries[(stream_id, key)] = (version, time.monotonic() + self.ttl)
+                self._entries.move_to_end((stream_id, key))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            self._remember(stream_id, key)
+
+    def remember(self, stream_id: str, key: str) -> None:
+        """Mark a key as possibly recorded (Bloom only), e.g. after a unique-key collision."""
+        with self._lock:
+            self._remember(stream_id, key)
+
+    def _remember(self, stream_id: str, key: str) -> None:
+        if not self.bloom_bits:
+            return
+        bloom = self._blooms.get(stream_id)
+        if bloom is None:
+            bloom = self._blooms[stream_id] = BloomFilter(self.bloom_bits)
+            while len(self._blooms) > self.bloom_streams:
+                self._blooms.popitem(last=False)
+        self._blooms.move_to_end(stream_id)
+        bloom.add(key)
+
+    def definitely_new(self, stream_id: str, key: str) -> bool:
+        """
+        True only when the Bloom filter proves this worker never saw the key. Streams the
+        worker has no filter for are not trusted (it may have just started).
+        """
+        if not self.bloom_bits:
+            return False
+        with self._lock:
+            bloom = self._blooms.get(stream_id)
+            if bloom is None or key in bloom:
+                return False
+            self.bloom_skips += 1
+            return True
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "bloom_skips": self.bloom_skips,
+            }
+
+
+@lru_cache
+def get_idempotency_cache() -> IdempotencyCache:
+    settings = get_settings()
+    return IdempotencyCache(
+        max_entries=settings.idempotency_cache_size,
+        ttl_seconds=settings.idempotency_cache_ttl_s,
+        bloom_bits=settings.idempotency_bloom_bits,
+    )
@@ -5,7 +5,9 @@ from sqlalchemy import (
     BigInteger,
     Column,
     DateTime,
+    Index,
     Integer,
+    LargeBinary,
     String,
     UniqueConstraint,
     func,
@@ -17,17 +19,82 @@ from app.infra.db.base import Base
 class Event(Base):
     __tablename__ = "events"
 
-    event_id = Column(String, primary_key=True)
+    # Global, monotonically increasing order of appends across all streams (the feed).
+    position = Column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True
+    )
+    event_id = Column(String, nullable=False, unique=True)
     stream_id = Column(String, nullable=False, index=True)
     stream_version = Column(BigInteger, nullable=False)
     event_type = Column(String, nullable=False)
     event_schema_version = Column(Integer, nullable=False)
     occurred_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # When the append was written, stamped while the stream head is locked, so it grows
+    # with stream_version. occurred_at is client-supplied (usage may be backdated);
+    # point-in-time reads by timestamp go by this instead.
+    recorded_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     idempotency_key = Column(String, nullable=True)
-    payload = Column(JSON, nullable=False)
+    # Exactly one of payload / payload_bin is set, per payload_codec (see codec.py).
+    payload = Column(JSON, nullable=True)
+    payload_codec = Column(String, nullable=False, default="json", server_default="json")
+    payload_bin = Column(LargeBinary, nullable=True)
     meta = Column("metadata", JSON, nullable=False, default=dict)
 
     __table_args__ = (
         UniqueConstraint("stream_id", "stream_version", name="uq_events_stream_version"),
         UniqueConstraint("stream_id", "idempotency_key", name="uq_events_idempotency"),
+        # Point-in-time reads: the last event of a stream recorded at or before a timestamp.
+        Index("ix_events_stream_recorded_at", "stream_id", "recorded_at"),
+        # Never reuse the position of a deleted (archived) last row on SQLite.
+        {"sqlite_autoincrement": True},
     )
+
+
+class Stream(Base):
+    """
+    Stream head: one row per stream holding its current version. Appends advance it with a
+    conditional UPDATE, which is the optimistic-concurrency check.
+    """
+
+    __tablename__ = "streams"
+
+    stream_id = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    # Events up to this version have moved from `events` to `event_segments`.
+    archived_through = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+class EventSegment(Base):
+    """
+    A run of archived events of one stream (versions first_version..last_version),
+    zlib-compressed. The primary key is the segment index; min_recorded_at lets
+    timestamp lookups pick the one segment to decompress.
+    """
+
+    __tablename__ = "event_segments"
+
+    stream_id = Column(String, primary_key=True)
+    first_version = Column(BigInteger, primary_key=True)
+    last_version = Column(BigInteger, nullable=False)
+    events = Column(Integer, nullable=False)
+    min_occurred_at = Column(DateTime(timezone=True), nullable=False)
+    max_occurred_at = Column(DateTime(timezone=True), nullable=False)
+    # NULL on segments written before events carried recorded_at.
+    min_recorded_at = Column(DateTime(timezone=True), nullable=True)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class UsageShardTotal(Base):
+    """
+    Units recorded per usage sub-stream, billing period and meter (see usage_shards).
+    Written in the append transaction, like the stream head: shard appends decide their
+    limit share from it, and reads add the current period's rows to the account's usage.
+    """
+
+    __tablename__ = "usage_shard_totals"
+
+    stream_id = Column(String, primary_key=True)
+    period = Column(String, primary_key=True)
+    meter = Column(String, primary_key=True)
+    units = Column(BigInteger, nullable=False, default=0)
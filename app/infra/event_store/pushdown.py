@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import BigInteger, Integer, LargeBinary, String, cast, func, null, select, union_all
+from sqlalchemy.orm import Session
+
+from app.domain.fold import StateFold, fold
+from app.domain.types import AccountQuotaState
+from app.infra.event_store.archive import read_archived, states_at_boundary
+from app.infra.event_store.codec import COMPACT, JSON, LAYOUTS
+from app.infra.event_store.models import Event, Stream
+from app.infra.event_store.repository import _to_envelope
+
+_RESETS_USAGE = ("AccountCreated", "PeriodReset")
+
+
+def pushdown_state(session: Session, stream_id: str) -> tuple[AccountQuotaState, int]:
+    """
+    Hydrate without pulling the usage events: status, plan and period come from folding
+    the (few) lifecycle events, and `used` from a SUM(units) GROUP BY meter over the
+    usage recorded since the last reset, computed in the database. Three small queries
+    whatever the stream length. Returns (state, stream_version) like a full replay.
+
+    The database can only sum JSON payloads: usage rows stored with the compact codec come
+    back individually (payload bytes only) and are summed here, so pushdown pays off on
+    JSON rows.
+
+    An archived stream starts from its state at the archive boundary and only looks at the
+    events after it.
+    """
+    head, archived_through = session.execute(
+        select(
+            func.coalesce(func.max(Event.stream_version), Stream.version), Stream.archived_through
+        )
+        .select_from(Stream)
+        .outerjoin(Event, Event.stream_id == Stream.stream_id)
+        .where(Stream.stream_id == stream_id)
+        .group_by(Stream.version, Stream.archived_through)
+    ).one_or_none() or (0, 0)
+
+    lifecycle = session.execute(
+        select(Event)
+        .where(
+            Event.stream_id == stream_id,
+            Event.stream_version > archived_through,
+            Event.event_type != "UsageRecorded",
+        )
+        .order_by(Event.stream_version.asc())
+    ).scalars()
+
+    usage_from: int | None = None  # usage after this version counts towards `used`
+    if archived_through:
+        acc = StateFold(states_at_boundary(session, {stream_id: archived_through})[stream_id])
+        if acc.exists:
+            usage_from = archived_through
+    else:
+        acc = StateFold()
+    base_used = dict(acc.used or {})
+    for row in lifecycle:
+        acc.apply(_to_envelope(row))
+        if acc.exists and row.event_type in _RESETS_USAGE:
+            usage_from = row.stream_version
+            base_used = {}
+
+    if usage_from is None:
+        # Never created: usage events are ignored by the fold too.
+        return acc.freeze(), head
+
+    usage = (
+        Event.stream_id == stream_id,
+        Event.event_type == "UsageRecorded",
+        Event.stream_version > usage_from,
+    )
+    # Sums of the JSON rows, plus the compact rows themselves, in one round trip.
+    meter = Event.payload["meter"].as_string()
+    json_totals = (
+        select(
+            meter,
+            func.sum(Event.payload["units"].as_integer()),
+            cast(null(), Integer),
+            cast(null(), LargeBinary),
+        )
+        .where(*usage, Event.payload_codec == JSON)
+        .group_by(meter)
+    )
+    compact_rows = select(
+        cast(null(), String),
+        cast(null(), BigInteger),
+        Event.event_schema_version,
+        Event.payload_bin,
+    ).where(*usage, Event.payload_codec == COMPACT)
+
+    used = base_used
+    for m, units, version, payload_bin in session.execute(union_all(json_totals, compact_rows)):
+        if payload_bin is not None:
+            p = LAYOUTS[("UsageRecorded", version)].decode(payload_bin)
+            m, units = p["meter"], p["units"]
+        used[m] = used.get(m, 0) + int(units)
+
+    acc.used = used
+    return acc.freeze(), head
+
+
+@dataclass(frozen=True)
+class PushdownMismatch:
+    stream_id: str
+    pushdown: tuple[AccountQuotaState, int]
+    replay: tuple[AccountQuotaState, int]
+
+
+def check_pushdown(session: Session, stream_id: str) -> PushdownMismatch | None:
+    """Compare pushdown_state with a full Python fold of the stream; None when they agree."""
+    archived_through = session.execute(
+        select(Stream.archived_through).where(Stream.stream_id == stream_id)
+    ).scalar_one_or_none()
+    archived = read_archived(session, stream_id, 0, archived_through or 0)
+    envelopes = [e.envelope for e in archived]
+    rows = session.execute(
+        select(Event).where(Event.stream_id == stream_id).order_by(Event.stream_version.asc())
+    ).scalars()
+    version = archived[-1].stream_version if archived else 0
+    for r in rows:
+        envelopes.append(_to_envelope(r))
+        version = r.stream_version
+    replay = (fold(envelopes), version)
+
+    pushed = pushdown_state(session, stream_id)
+    if pushed == replay:
+        return None
+    return PushdownMismatch(stream_id=stream_id, pushdown=pushed, replay=replay)
@@ -1,18 +1,40 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
+from dataclasses import dataclass, replace
 from datetime import UTC, datetime
 from uuid import uuid4
 
-from sqlalchemy import func, select
+from sqlalchemy import Select, and_, insert, or_, select, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
-from app.domain.aggregate import apply_event
 from app.domain.errors import ConcurrencyConflict
 from app.domain.events import EventEnvelope
-from app.domain.types import AccountQuotaState
+from app.domain.upcasting import upcast
+from app.infra.db.dialect import upsert_insert
+from app.infra.db.hooks import on_commit
 from app.infra.db.session import SessionLocal
-from app.infra.event_store.models import Event
-from app.infra.projections.models import AccountCurrent
+from app.infra.event_store.archive import ArchivedEvent, iter_archived, read_archived_many
+from app.infra.event_store.codec import Codec, decode_payload, encode_payload
+from app.infra.event_store.idempotency import IdempotencyCache, get_idempotency_cache
+from app.infra.event_store.models import Event, Stream
+from app.infra.event_store.usage_shards import (
+    account_of,
+    add_shard_totals,
+    is_shard_stream,
+    shard_stream_id,
+    shard_stream_ids,
+)
+from app.infra.invalidation import InvalidationBus, get_invalidation_bus
+from app.infra.metrics import Metrics, get_metrics
+from app.infra.projections.account_current import (
+    update_account_current,
+    update_account_current_many,
+)
+from app.infra.projections.state_cache import AccountStateCache, get_state_cache
+from app.infra.projections.usage_rollups import Usage, update_usage_rollups
+from app.settings import get_settings
 
 
 def _parse_occurred_at(value: str) -> datetime:
@@ -31,23 +53,186 @@ def _parse_occurred_at(value: str) -> datetime:
 
     dt = datetime.fromisoformat(value)
     if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=UTC)
-    return dt
+        return dt.replace(tzinfo=UTC)
+    # Stored as UTC: SQLite keeps the wall time and drops the offset.
+    return dt.astimezone(UTC)
+
+
+class IdempotencyCollision(ConcurrencyConflict):
+    """
+    The unique idempotency constraint fired on a key whose SELECT was skipped (Bloom
+    filter). Retrying the command replays the original result.
+    """
+
+
+def integrity_conflict() -> ConcurrencyConflict:
+    # Could be idempotency unique violation or stream_version unique violation
+    # We'll treat it as concurrency for now; later we’ll make idempotency return prior result.
+    return ConcurrencyConflict("Integrity conflict while appending events")
 
 
 def _to_envelope(row: Event) -> EventEnvelope:
     occurred_at = row.occurred_at.astimezone(UTC).isoformat().replace("+00:00", "Z")
-    return EventEnvelope(
-        event_type=row.event_type,  # type: ignore[arg-type]
-        schema_version=row.event_schema_version,
-        occurred_at=occurred_at,
-        payload=row.payload,
-        idempotency_key=row.idempotency_key,
+    payload = decode_payload(
+        row.payload_codec, row.event_type, row.event_schema_version, row.payload, row.payload_bin
+    )
+    return upcast(
+        EventEnvelope(
+            event_type=row.event_type,  # type: ignore[arg-type]
+            schema_version=row.event_schema_version,
+            occurred_at=occurred_at,
+            payload=payload,
+            idempotency_key=row.idempotency_key,
+        )
     )
 
 
+def _event_row(stream_id: str, version: int, e: EventEnvelope, codec: Codec) -> dict:
+    payload_codec, payload, payload_bin = encode_payload(
+        e.event_type, e.schema_version, e.payload, codec
+    )
+    return {
+        "event_id": str(uuid4()),
+        "stream_id": stream_id,
+        "stream_version": version,
+        "event_type": e.event_type,
+        "event_schema_version": e.schema_version,
+        "occurred_at": _parse_occurred_at(e.occurred_at),
+        "idempotency_key": e.idempotency_key,
+        "payload": payload,
+        "payload_codec": payload_codec,
+        "payload_bin": payload_bin,
+        "meta": {},  # fill later with correlation_id, actor, etc.
+    }
+
+
+@dataclass(frozen=True)
+class RecordedEvent:
+    stream_id: str
+    stream_version: int
+    envelope: EventEnvelope
+    position: int  # global feed position
+
+
+def to_recorded(row: Event) -> RecordedEvent:
+    return RecordedEvent(
+        stream_id=row.stream_id,
+        stream_version=row.stream_version,
+        envelope=_to_envelope(row),
+        position=row.position,
+    )
+
+
+def from_archived(stream_id: str, a: ArchivedEvent) -> RecordedEvent:
+    return RecordedEvent(
+        stream_id=stream_id,
+        stream_version=a.stream_version,
+        envelope=a.envelope,
+        position=a.position,
+    )
+
+
+@dataclass(frozen=True)
+class EventQuery:
+    """Keyset filter over one stream: versions after `after`, oldest first."""
+
+    after: int = 0
+    limit: int | None = None
+    event_types: tuple[str, ...] = ()
+    occurred_from: str | None = None  # ISO8601, inclusive
+    occurred_to: str | None = None  # ISO8601, exclusive
+
+
+def _matches(e: EventEnvelope, query: EventQuery) -> bool:
+    if query.event_types and e.event_type not in query.event_types:
+        return False
+    if query.occurred_from or query.occurred_to:
+        at = _parse_occurred_at(e.occurred_at)
+        if query.occurred_from and at < _parse_occurred_at(query.occurred_from):
+            return False
+        if query.occurred_to and at >= _parse_occurred_at(query.occurred_to):
+            return False
+    return True
+
+
+def archived_page(
+    session: Session, stream_id: str, query: EventQuery
+) -> tuple[list[RecordedEvent], EventQuery | None]:
+    """
+    The archived events matching `query` (read-through for the events API), and the query
+    for the rest from the events table; None when the archived part already fills `limit`.
+    """
+    archived_through = session.execute(
+        select(Stream.archived_through).where(Stream.stream_id == stream_id)
+    ).scalar_one_or_none()
+    if not archived_through or query.after >= archived_through:
+        return [], query
+
+    found: list[RecordedEvent] = []
+    for a in iter_archived(session, stream_id, query.after, archived_through):
+        if _matches(a.envelope, query):
+            found.append(from_archived(stream_id, a))
+            if query.limit is not None and len(found) >= query.limit:
+                return found, None
+    limit = query.limit - len(found) if query.limit is not None else None
+    return found, replace(query, after=archived_through, limit=limit)
+
+
+def events_query(stream_id: str, query: EventQuery) -> Select:
+    stmt = select(Event).where(Event.stream_id == stream_id, Event.stream_version > query.after)
+    if query.event_types:
+        stmt = stmt.where(Event.event_type.in_(query.event_types))
+    if query.occurred_from:
+        stmt = stmt.where(Event.occurred_at >= _parse_occurred_at(query.occurred_from))
+    if query.occurred_to:
+        stmt = stmt.where(Event.occurred_at < _parse_occurred_at(query.occurred_to))
+    stmt = stmt.order_by(Event.stream_version.asc())
+    if query.limit is not None:
+        stmt = stmt.limit(query.limit)
+    return stmt
+
+
 class SqlAlchemyEventStore:
-    def append(self, stream_id: str, expected_version: int, events: list[EventEnvelope]) -> int:
+    """
+    Every method accepts an optional `session`. When given, the work joins the caller's
+    transaction and nothing is committed (see app.services.unit_of_work); otherwise the
+    method opens, and for appends commits, its own session.
+    """
+
+    def __init__(
+        self,
+        idempotency: IdempotencyCache | None = None,
+        inline_projections: bool | None = None,
+        state_cache: AccountStateCache | None = None,
+        metrics: Metrics | None = None,
+        codec: Codec | None = None,
+        bus: InvalidationBus | None = None,
+    ) -> None:
+        self.idempotency = idempotency if idempotency is not None else get_idempotency_cache()
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.state_cache = state_cache if state_cache is not None else get_state_cache()
+        self.codec = codec if codec is not None else get_settings().payload_codec
+        self.bus = bus if bus is not None else get_invalidation_bus()
+        self.inline_projections = (
+            get_settings().projection_mode == "inline"
+            if inline_projections is None
+            else inline_projections
+        )
+
+    def cached_result(self, stream_id: str, key: str | None) -> int | None:
+        """Version a committed command with this idempotency key produced, if cached."""
+        version = self.idempotency.get(stream_id, key) if key else None
+        if version is not None:
+            self.metrics.idempotent_hits.inc(1, "cache")
+        return version
+
+    def append(
+        self,
+        stream_id: str,
+        expected_version: int,
+        events: list[EventEnvelope],
+        session: Session | None = None,
+    ) -> int:
         """
         Append with optimistic concurrency.
         expected_version is the caller's view of the current stream version.
@@ -56,114 +241,460 @@ class SqlAlchemyEventStore:
         if not events:
             return expected_version
 
+        if session is not None:
+            return self._append(session, stream_id, expected_version, events)
+
+        try:
+            return self._append_and_commit(stream_id, expected_version, events)
+        except IdempotencyCollision:
+            # The key is now remembered, so the retry takes the checked path and replays.
+            return self._append_and_commit(stream_id, expected_version, events)
+
+    def _append_and_commit(
+        self, stream_id: str, expected_version: int, events: list[EventEnvelope]
+    ) -> int:
         with SessionLocal() as session:
-            # Determine current version in DB
-            current_version = session.execute(
-                select(func.coalesce(func.max(Event.stream_version), 0)).where(
-                    Event.stream_id == stream_id
-                )
-            ).scalar_one()
+            next_version = self._append(session, stream_id, expected_version, events)
+            try:
+                session.commit()
+            except IntegrityError as exc:
+                session.rollback()
+                raise integrity_conflict() from exc
+            return next_version
+
+    def _append(
+        self,
+        session: Session,
+        stream_id: str,
+        expected_version: int,
+        events: list[EventEnvelope],
+    ) -> int:
+        # Idempotency: if the first new event has an idempotency_key, and we already have it,
+        # return the stream_version it was recorded at (safe retry).
+        metrics = self.metrics
+        key = events[0].idempotency_key
+        checked = False
+        if key:
+            cached = self.idempotency.get(stream_id, key)
+            if cached is not None:
+                metrics.idempotent_hits.inc(1, "cache")
+                return cached
+            if not self.idempotency.definitely_new(stream_id, key):
+                checked = True
+                with metrics.stage("idempotency"):
+                    replayed = self._find_idempotent(session, stream_id, key)
+                if replayed is not None:
+                    metrics.idempotent_hits.inc(1, "db")
+                    return replayed
 
-            # Idempotency: if the first new event has an idempotency_key, and we already have it,
-            # return the existing stream_version (safe retry).
-            key = events[0].idempotency_key
+        next_version = expected_version + len(events)
+        with metrics.stage("version_check"):
+            advanced = self._advance_head(session, stream_id, expected_version, next_version)
+        if not advanced:
+            # Lost the race. A concurrent retry of the same command is a replay, not a conflict.
             if key:
-                existing = session.execute(
-                    select(Event).where(Event.stream_id == stream_id, Event.idempotency_key == key)
-                ).scalar_one_or_none()
-                if existing is not None:
-                    # Return current stream version as of now
-                    return current_version
-
-            if current_version != expected_version:
-                raise ConcurrencyConflict(
-                    f"Concurrency conflict for stream '{stream_id}': expected {expected_version}, found {current_version}"
-                )
+                replayed = self._find_idempotent(session, stream_id, key)
+                if replayed is not None:
+                    metrics.idempotent_hits.inc(1, "db")
+                    return replayed
+            current_version = self.head_version(session, stream_id)
+            metrics.conflicts.inc()
+            raise ConcurrencyConflict(
+                f"Concurrency conflict for stream '{stream_id}': expected {expected_version}, found {current_version}"
+            )
+
+        try:
+            with metrics.stage("insert"):
+                usage = self._insert_events(session, {stream_id: (expected_version, events)})
+        except ConcurrencyConflict as exc:
+            if key and not checked:
+                # Skipped the SELECT on the Bloom filter's word and the key was recorded
+                # elsewhere after all. The transaction is dead; the caller retries.
+                self.idempotency.remember(stream_id, key)
+                raise IdempotencyCollision(
+                    f"Idempotency key '{key}' already recorded on stream '{stream_id}'"
+                ) from exc
+            raise
+
+        if self.inline_projections:
+            with metrics.stage("projection"):
+                update_account_current(session, stream_id, expected_version, events)
+                update_usage_rollups(session, usage)
+
+        return next_version
+
+    def append_many(
+        self,
+        session: Session,
+        appends: dict[str, tuple[int, list[EventEnvelope]]],
+    ) -> dict[str, int | None]:
+        """
+        Append to several streams inside the caller's transaction: one conditional head
+        update per stream, then a single multi-row INSERT for every event and one batched
+        projection update.
+
+        Idempotency is the caller's job here (see find_idempotent_many). Returns the new
+        version per stream, or None for streams whose head had moved; nothing is written
+        for those.
+        """
+        results: dict[str, int | None] = {}
+        written: dict[str, tuple[int, list[EventEnvelope]]] = {}
+        # Fixed lock order so concurrent batches cannot deadlock on stream heads.
+        for stream_id in sorted(appends):
+            expected_version, events = appends[stream_id]
+            if not events:
+                results[stream_id] = expected_version
+                continue
+            next_version = expected_version + len(events)
+            with self.metrics.stage("version_check"):
+                advanced = self._advance_head(session, stream_id, expected_version, next_version)
+            if advanced:
+                results[stream_id] = next_version
+                written[stream_id] = (expected_version, events)
+            else:
+                self.metrics.conflicts.inc()
+                results[stream_id] = None
+
+        if written:
+            with self.metrics.stage("insert"):
+                usage = self._insert_events(session, written)
+            if self.inline_projections:
+                with self.metrics.stage("projection"):
+                    update_account_current_many(session, written)
+                    update_usage_rollups(session, usage)
+        return results
 
-            next_version = current_version
-            for e in events:
-                next_version += 1
-                row = Event(
-                    event_id=str(uuid4()),
-                    stream_id=stream_id,
-                    stream_version=next_version,
-                    event_type=e.event_type,
-                    event_schema_version=e.schema_version,
-                    occurred_at=_parse_occurred_at(e.occurred_at),
-                    idempotency_key=e.idempotency_key,
-                    payload=e.payload,
-                    meta={},  # fill later with correlation_id, actor, etc.
+    def find_idempotent_many(
+        self, session: Session, keys: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        """Stream version recorded for each (stream_id, idempotency_key) pair that exists."""
+        if not keys:
+            return {}
+        wanted = set(keys)
+        with self.metrics.stage("idempotency"):
+            rows = session.execute(
+                select(Event.stream_id, Event.idempotency_key, Event.stream_version).where(
+                    Event.stream_id.in_({s for s, _ in wanted}),
+                    Event.idempotency_key.in_({k for _, k in wanted}),
                 )
-                session.add(row)
-                session.flush()
+            ).all()
+        found = {(s, k): v for s, k, v in rows if (s, k) in wanted}
+        if found:
+            self.metrics.idempotent_hits.inc(len(found), "db")
+        for (stream_id, key), version in found.items():
+            self.idempotency.put(stream_id, key, version)
+        return found
 
-            # load existing events in this tx (cheap for now)
-            rows = (
-                session.execute(
-                    select(Event)
-                    .where(Event.stream_id == stream_id)
-                    .order_by(Event.stream_version.asc())
+    def find_shard_idempotent(
+        self, session: Session, account_id: str, shards: int, key: str
+    ) -> int | None:
+        """
+        Account version that usage with this key produced on a sharded account, looked up
+        on every shard and on the account's own stream (usage recorded before sharding).
+        """
+        with self.metrics.stage("idempotency"):
+            row = session.execute(
+                select(Event.stream_id, Event.stream_version, Event.meta).where(
+                    Event.stream_id.in_([account_id, *shard_stream_ids(account_id, shards)]),
+                    Event.idempotency_key == key,
                 )
-                .scalars()
-                .all()
+            ).first()
+        if row is None:
+            return None
+        # Usage recorded on the account's own stream before sharding has no account_version.
+        version = (row.meta or {}).get("account_version", row.stream_version)
+        self.metrics.idempotent_hits.inc(1, "db")
+        self.idempotency.put(account_id, key, version)
+        return version
+
+    def append_shard_usage(
+        self,
+        session: Session,
+        account_id: str,
+        shard: int,
+        expected_version: int,
+        events: list[EventEnvelope],
+        *,
+        period: str | None,
+        main_version: int,
+        account_version: int,
+    ) -> int:
+        """
+        Append usage to sub-stream `shard` of a sharded account (see usage_shards) inside
+        the caller's transaction, and add it to the shard's totals for `period`.
+
+        `main_version` is the version of the account's own stream the usage was decided
+        against, and `account_version` the account version this append makes (recorded
+        with the events, so a retried command replays it); it is returned. Raises
+        ConcurrencyConflict when the shard head moved, or when the account's stream did
+        (a lifecycle event committed since it was read).
+        """
+        stream_id = shard_stream_id(account_id, shard)
+        next_version = expected_version + len(events)
+        with self.metrics.stage("version_check"):
+            advanced = self._advance_head(session, stream_id, expected_version, next_version)
+        if not advanced:
+            self.metrics.conflicts.inc()
+            raise ConcurrencyConflict(
+                f"Concurrency conflict for stream '{stream_id}': expected {expected_version}"
             )
 
-            state = AccountQuotaState()
-            for r in rows:
-                state = apply_event(state, _to_envelope(r))
-
-            proj = session.get(AccountCurrent, stream_id)
-            if proj is None:
-                session.add(
-                    AccountCurrent(
-                        account_id=stream_id,
-                        stream_version=next_version,
-                        status=state.status,
-                        plan_id=state.plan_id,
-                        period=state.period,
-                        used=state.used or {},
-                    )
-                )
-            else:
-                proj.stream_version = next_version
-                proj.status = state.status
-                proj.plan_id = state.plan_id
-                proj.period = state.period
-                proj.used = state.used or {}
+        with self.metrics.stage("insert"):
+            usage = self._insert_events(
+                session,
+                {stream_id: (expected_version, events)},
+                meta={"period": period, "account_version": account_version},
+            )
+            units: dict[str, int] = {}
+            for _, _, p in usage:
+                units[p["meter"]] = units.get(p["meter"], 0) + int(p["units"])
+            add_shard_totals(session, stream_id, period, units)
+        if self.inline_projections:
+            with self.metrics.stage("projection"):
+                update_usage_rollups(session, usage)
 
-            try:
-                session.commit()
+        # Taken last so it is held for the shortest time: lifecycle commands on the account
+        # wait for it, and this append conflicts if one got in first.
+        with self.metrics.stage("version_check"):
+            head = session.execute(
+                select(Stream.version)
+                .where(Stream.stream_id == account_id)
+                .with_for_update(read=True)
+            ).scalar_one_or_none()
+        if head != main_version:
+            self.metrics.conflicts.inc()
+            raise ConcurrencyConflict(
+                f"Concurrency conflict for stream '{account_id}': expected {main_version}, found {head}"
+            )
 
-            except IntegrityError as exc:
-                session.rollback()
-                # Could be idempotency unique violation or stream_version unique violation
-                # We'll treat it as concurrency for now; later we’ll make idempotency return prior result.
-                raise ConcurrencyConflict("Integrity conflict while appending events") from exc
+        key = events[0].idempotency_key
+        on_commit(session, lambda: self._remember_shard_append(account_id, key, account_version))
+        return account_version
 
-            return next_version
+    def append_unsharded_usage(
+        self,
+        session: Session,
+        account_id: str,
+        expected_version: int,
+        events: list[EventEnvelope],
+        *,
+        shards: int,
+        shard_version: int,
+        account_version: int,
+    ) -> int:
+        """
+        Append usage of a sharded account to the account's own stream, for a command that
+        fits the limits but no single shard's share of them. Returns `account_version`,
+        recorded with the events as on a shard.
 
-    def load_stream(self, stream_id: str) -> list[EventEnvelope]:
-        with SessionLocal() as session:
-            rows = (
+        `shard_version` is the sum of the shard heads the usage was decided against. They
+        are read again once the account's head is locked, which keeps shard appends from
+        committing: ConcurrencyConflict when one got in first, or when the head moved.
+        """
+        next_version = expected_version + len(events)
+        with self.metrics.stage("version_check"):
+            advanced = self._advance_head(session, account_id, expected_version, next_version)
+            moved = not advanced or shard_version != sum(
                 session.execute(
-                    select(Event)
-                    .where(Event.stream_id == stream_id)
-                    .order_by(Event.stream_version.asc())
-                )
-                .scalars()
-                .all()
+                    select(Stream.version).where(
+                        Stream.stream_id.in_(shard_stream_ids(account_id, shards))
+                    )
+                ).scalars()
+            )
+        if moved:
+            self.metrics.conflicts.inc()
+            raise ConcurrencyConflict(
+                f"Concurrency conflict for stream '{account_id}': expected {expected_version} "
+                f"and shard heads at {shard_version}"
+            )
+
+        with self.metrics.stage("insert"):
+            usage = self._insert_events(
+                session,
+                {account_id: (expected_version, events)},
+                meta={"account_version": account_version},
             )
-            return [_to_envelope(r) for r in rows]
+        if self.inline_projections:
+            with self.metrics.stage("projection"):
+                update_account_current(session, account_id, expected_version, events)
+                update_usage_rollups(session, usage)
 
-    def load_stream_since(self, stream_id: str, since_version: int) -> list[EventEnvelope]:
+        key = events[0].idempotency_key
+        on_commit(session, lambda: self._remember_shard_append(account_id, key, account_version))
+        return account_version
+
+    def _remember_shard_append(self, account_id: str, key: str | None, version: int) -> None:
+        if key:
+            self.idempotency.put(account_id, key, version)
+        self.state_cache.invalidate(account_id, version)
+
+    def _insert_events(
+        self,
+        session: Session,
+        appends: dict[str, tuple[int, list[EventEnvelope]]],
+        meta: dict | None = None,
+    ) -> list[Usage]:
+        """
+        Insert the events (with `meta` as their metadata, if given); returns the usage
+        among them, per account and timestamped as stored (rollups).
+        """
+        new = [
+            (stream_id, expected_version + i, e)
+            for stream_id, (expected_version, events) in appends.items()
+            for i, e in enumerate(events, start=1)
+        ]
+        rows = [_event_row(stream_id, version, e, self.codec) for stream_id, version, e in new]
+        # The heads are locked by now, so a stream's recorded_at never goes backwards.
+        recorded_at = datetime.now(UTC)
+        for row in rows:
+            row["recorded_at"] = recorded_at
+        if meta is not None:
+            for row in rows:
+                row["meta"] = meta
+        try:
+            session.execute(insert(Event), rows)
+        except IntegrityError as exc:
+            raise integrity_conflict() from exc
+
+        recorded = [
+            (stream_id, e.idempotency_key, v) for stream_id, v, e in new if e.idempotency_key
+        ]
+        heads = {sid: expected + len(events) for sid, (expected, events) in appends.items()}
+        appended = len(new)
+        on_commit(session, lambda: self._remember_committed(recorded, heads, appended))
+        return [
+            (account_of(stream_id), row["occurred_at"], e.payload)
+            for (stream_id, _, e), row in zip(new, rows, strict=True)
+            if e.event_type == "UsageRecorded"
+        ]
+
+    def _remember_committed(
+        self, recorded: list[tuple[str, str, int]], heads: dict[str, int], appended: int
+    ) -> None:
+        self.metrics.events_appended.inc(appended)
+        for stream_id, key, version in recorded:
+            self.idempotency.put(stream_id, key, version)
+        for stream_id, version in heads.items():
+            self.state_cache.invalidate(stream_id, version)
+        if self.bus is not None:
+            # Usage sub-streams are not cached anywhere (views of sharded accounts are not).
+            changed = [(sid, v) for sid, v in heads.items() if not is_shard_stream(sid)]
+            if changed:
+                self.bus.publish(changed)
+
+    def _find_idempotent(self, session: Session, stream_id: str, key: str) -> int | None:
+        version = session.execute(
+            select(Event.stream_version).where(
+                Event.stream_id == stream_id, Event.idempotency_key == key
+            )
+        ).scalar_one_or_none()
+        if version is not None:
+            # Already committed, so safe to cache straight away.
+            self.idempotency.put(stream_id, key, version)
+        return version
+
+    def head_version(self, session: Session, stream_id: str) -> int:
+        version = session.execute(
+            select(Stream.version).where(Stream.stream_id == stream_id)
+        ).scalar_one_or_none()
+        return version or 0
+
+    def _advance_head(
+        self, session: Session, stream_id: str, expected_version: int, next_version: int
+    ) -> bool:
+        """
+        Move the stream head from expected_version to next_version in one statement.
+        Returns False when the head is somewhere else (someone appended first).
+        """
+        if expected_version == 0:
+            stmt = (
+                upsert_insert(session, Stream.__table__)
+                .values(stream_id=stream_id, version=next_version)
+                .on_conflict_do_nothing(index_elements=["stream_id"])
+            )
+        else:
+            stmt = (
+                update(Stream)
+                .where(Stream.stream_id == stream_id, Stream.version == expected_version)
+                .values(version=next_version)
+                .execution_options(synchronize_session=False)
+            )
+        return session.execute(stmt).rowcount == 1
+
+    def load_stream(self, stream_id: str, session: Session | None = None) -> list[EventEnvelope]:
+        return self.load_stream_since(stream_id, 0, session=session)
+
+    def iter_events(
+        self,
+        session: Session,
+        stream_id: str,
+        query: EventQuery,
+        yield_per: int = 500,
+    ) -> Iterator[RecordedEvent]:
+        """
+        Stream matching events in stream_version order through a server-side cursor,
+        `yield_per` rows at a time, so memory stays flat however long the stream is.
+        The session must stay open while the iterator is consumed. Archived events (see
+        app.tools.archive_streams) are read through from their segments first.
+        """
+        archived, rest = archived_page(session, stream_id, query)
+        yield from archived
+        if rest is None:
+            return
+        rows = session.execute(
+            events_query(stream_id, rest).execution_options(yield_per=yield_per)
+        ).scalars()
+        for r in rows:
+            yield to_recorded(r)
+
+    def read_page(self, stream_id: str, query: EventQuery) -> list[RecordedEvent]:
         with SessionLocal() as session:
-            rows = (
-                session.execute(
-                    select(Event)
-                    .where(Event.stream_id == stream_id, Event.stream_version > since_version)
-                    .order_by(Event.stream_version.asc())
-                )
-                .scalars()
-                .all()
+            return list(self.iter_events(session, stream_id, query))
+
+    def load_stream_since(
+        self, stream_id: str, since_version: int, session: Session | None = None
+    ) -> list[EventEnvelope]:
+        if session is None:
+            with SessionLocal() as session:
+                return self.load_stream_since(stream_id, since_version, session=session)
+
+        return self.load_streams_since(session, {stream_id: since_version})[stream_id]
+
+    def load_streams_since(
+        self, session: Session, since: dict[str, int]
+    ) -> dict[str, list[EventEnvelope]]:
+        """
+        load_stream_since for several streams in one query. The stream heads are joined in
+        so archived ranges are noticed without another round trip; only streams asked for
+        from below their archive boundary read their segments.
+        """
+        out: dict[str, list[EventEnvelope]] = {stream_id: [] for stream_id in since}
+        if not since:
+            return out
+        rows = session.execute(
+            select(Stream.stream_id, Stream.archived_through, Event)
+            .outerjoin(
+                Event,
+                and_(
+                    Event.stream_id == Stream.stream_id,
+                    or_(
+                        *(
+                            and_(Event.stream_id == stream_id, Event.stream_version > version)
+                            for stream_id, version in since.items()
+                        )
+                    ),
+                ),
             )
-            return [_to_envelope(r) for r in rows]
+            .where(Stream.stream_id.in_(since))
+            .order_by(Stream.stream_id, Event.stream_version.asc())
+        )
+        archived: dict[str, tuple[int, int]] = {}
+        for stream_id, archived_through, r in rows:
+            if since[stream_id] < archived_through:
+                archived[stream_id] = (since[stream_id], archived_through)
+            if r is not None:
+                out[stream_id].append(_to_envelope(r))
+        if archived:
+            for stream_id, events in read_archived_many(session, archived).items():
+                out[stream_id][:0] = [e.envelope for e in events]
+        return out
@@ -0,0 +1,132 @@
+"""
+Usage sub-streams of accounts in sharded mode (UsageSharded).
+
+An account with `usage_shards` = N keeps its lifecycle events (creation, plan changes,
+resets, suspensions) on its own stream and records usage on N sub-streams
+"<account_id>/usage/<k>". Each sub-stream has its own head, so usage appended to
+different shards commits in parallel instead of one at a time behind the account's head.
+
+Per sub-stream, period and meter the units are kept in usage_shard_totals, written in the
+append transaction. A shard may hold an even share of what the account's own stream left
+of each limit (shard_allowance), which keeps the shards within the plan without
+coordinating; a command whose shard has no room left falls over to the next one that
+does, and one that fits no share goes to the account's own stream, checked against the
+account's total (locking the account's head, so no shard append commits meanwhile). Reads add the current period's totals to `used`, and the account's version is its
+own stream version plus the shard heads.
+
+An append to a shard re-reads the account's head with a shared row lock before it
+commits: a suspension, reset or plan change committed after the state it decided on
+makes it conflict and decide again, and one committing meanwhile waits for it.
+"""
+
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass, field
+
+from sqlalchemy import ColumnElement, or_, select
+from sqlalchemy.orm import Session
+
+from app.infra.db.dialect import upsert_insert
+from app.infra.event_store.models import Stream, UsageShardTotal
+
+SHARD_INFIX = "/usage/"
+
+
+def shard_stream_id(account_id: str, shard: int) -> str:
+    # Account ids may not contain the infix (checked at creation), so the two never clash.
+    return f"{account_id}{SHARD_INFIX}{shard}"
+
+
+def shard_stream_ids(account_id: str, shards: int) -> list[str]:
+    return [shard_stream_id(account_id, k) for k in range(shards)]
+
+
+def account_of(stream_id: str) -> str:
+    """The account a stream belongs to: itself, or the owner of a usage sub-stream."""
+    account_id, sep, _ = stream_id.rpartition(SHARD_INFIX)
+    return account_id if sep else stream_id
+
+
+def is_shard_stream(stream_id: str) -> bool:
+    return SHARD_INFIX in stream_id
+
+
+def account_streams(column: ColumnElement[str]) -> ColumnElement[bool]:
+    """WHERE clause keeping account streams only (for tools that list the streams table)."""
+    return ~column.contains(SHARD_INFIX, autoescape=True)
+
+
+def shard_streams_of(column: ColumnElement[str], account_ids: list[str]) -> ColumnElement[bool]:
+    """WHERE clause matching the usage sub-streams of `account_ids`, however many they have."""
+    return or_(*(column.startswith(f"{a}{SHARD_INFIX}", autoescape=True) for a in account_ids))
+
+
+def pick_shard(idempotency_key: str, shards: int) -> int:
+    """Home shard of a command: stable per key, so concurrent retries meet on one head."""
+    return zlib.crc32(idempotency_key.encode()) % shards
+
+
+def probe_order(first: int, shards: int) -> list[int]:
+    return [(first + i) % shards for i in range(shards)]
+
+
+@dataclass(frozen=True)
+class ShardTotals:
+    """Units per shard and meter in one period, and the shard heads."""
+
+    used: dict[int, dict[str, int]] = field(default_factory=dict)
+    heads: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def version(self) -> int:
+        """Appends across all shards; added to the account's stream version."""
+        return sum(self.heads.values())
+
+    def totals(self) -> dict[str, int]:
+        out: dict[str, int] = {}
+        for used in self.used.values():
+            for meter, units in used.items():
+                out[meter] = out.get(meter, 0) + units
+        return out
+
+
+def read_shard_usage(
+    session: Session, account_id: str, shards: int, period: str | None
+) -> ShardTotals:
+    """Two small queries: the shard heads, and the period's totals (shards x meters rows)."""
+    ids = shard_stream_ids(account_id, shards)
+    index = {sid: k for k, sid in enumerate(ids)}
+    heads = {
+        index[sid]: version
+        for sid, version in session.execute(
+            select(Stream.stream_id, Stream.version).where(Stream.stream_id.in_(ids))
+        )
+    }
+    used: dict[int, dict[str, int]] = {}
+    for sid, meter, units in session.execute(
+        select(UsageShardTotal.stream_id, UsageShardTotal.meter, UsageShardTotal.units).where(
+            UsageShardTotal.stream_id.in_(ids), UsageShardTotal.period == period
+        )
+    ):
+        used.setdefault(index[sid], {})[meter] = int(units)
+    return ShardTotals(used=used, heads=heads)
+
+
+def add_shard_totals(session: Session, stream_id: str, period: str, units: dict[str, int]) -> None:
+    """Add `units` (per meter) onto the shard's totals for `period`."""
+    if not units:
+        return
+    table = UsageShardTotal.__table__
+    stmt = upsert_insert(session, table).values(
+        [
+            {"stream_id": stream_id, "period": period, "meter": meter, "units": n}
+            for meter, n in sorted(units.items())
+        ]
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["stream_id", "period", "meter"],
+            set_={"units": table.c.units + stmt.excluded.units},
+        )
+    )
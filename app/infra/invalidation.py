@@ -0,0 +1,402 @@
+"""
+Cross-worker cache invalidation.
+
+In-process caches (account state views, the plan catalog) see the appends of their own
+worker at once, but writes made by other workers only once an entry expires. The bus
+carries the (stream_id, new_version) of every committed append to the other workers,
+whose subscribers apply it like a local commit: AccountStateCache.invalidate leaves a
+version floor, so a hit is stale by at most the delivery lag instead of the TTL.
+
+Backends (INVALIDATION_BUS):
+- "memory": subscribers in this process only (tests, a single worker).
+- "socket": one Unix datagram socket per worker in INVALIDATION_SOCKET_DIR, for the
+  workers of one host (uvicorn --workers N).
+- "postgres": LISTEN/NOTIFY, for workers and pods on several hosts. Notifications go out
+  from a publisher thread on a connection of its own; the commit path only enqueues.
+
+Each message carries its worker's origin id and a sequence number. A receiver that sees
+a gap (a full queue or socket buffer, a failed send, an oversized payload) cannot tell
+what it missed and resets its subscribers, i.e. clears the caches; so does a listener
+whose connection dropped. Lag is measured from the sender's wall clock to delivery, so
+it includes clock skew between hosts.
+"""
+
+from __future__ import annotations
+
+import abc
+import itertools
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from app.infra.metrics import Metrics, get_metrics
+from app.settings import get_settings
+
+if TYPE_CHECKING:
+    from app.infra.plans.catalog import PlanCatalog
+    from app.infra.projections.state_cache import AccountStateCache
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "quota_ledger_invalidation"
+# NOTIFY payloads must stay below 8000 bytes; socket datagrams keep to the same size.
+MAX_PAYLOAD = 7900
+# A large batch commit is split so that each message fits a payload on its own.
+STREAMS_PER_MESSAGE = 64
+
+
+@dataclass(frozen=True)
+class Invalidation:
+    origin: str
+    seq: int
+    sent_at: float  # time.time() at the publisher
+    streams: tuple[tuple[str, int], ...] = ()
+    plans: bool = False
+
+
+def _encode_one(m: Invalidation) -> str:
+    return json.dumps(
+        [m.origin, m.seq, m.sent_at, [list(s) for s in m.streams], m.plans],
+        separators=(",", ":"),
+    )
+
+
+def decode(payload: str | bytes) -> list[Invalidation]:
+    return [
+        Invalidation(origin, seq, sent_at, tuple((sid, v) for sid, v in streams), bool(plans))
+        for origin, seq, sent_at, streams, plans in json.loads(payload)
+    ]
+
+
+def pack(messages: Iterable[Invalidation]) -> tuple[list[tuple[str, int]], int]:
+    """
+    Group messages into JSON payloads of at most MAX_PAYLOAD bytes. Returns the payloads
+    with the number of messages in each, and how many messages were too large to send.
+    """
+    payloads: list[tuple[str, int]] = []
+    parts: list[str] = []
+    size = 2  # the enclosing brackets
+    oversize = 0
+
+    def flush() -> None:
+        if parts:
+            payloads.append(("[" + ",".join(parts) + "]", len(parts)))
+
+    for m in messages:
+        part = _encode_one(m)  # ASCII (ensure_ascii), so characters are bytes
+        if len(part) + 2 > MAX_PAYLOAD:
+            oversize += 1
+            continue
+        if size + len(part) + 1 > MAX_PAYLOAD:
+            flush()
+            parts, size = [], 2
+        parts.append(part)
+        size += len(part) + 1
+    flush()
+    return payloads, oversize
+
+
+class InvalidationBus(abc.ABC):
+    """Base class: numbering, delivery to subscribers, gap detection and metrics."""
+
+    name = "none"
+    # Whether messages this worker published come back to it (and are skipped).
+    echoes = False
+
+    def __init__(self, metrics: Metrics | None = None) -> None:
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.origin = uuid.uuid4().hex[:12]
+        self._seq = itertools.count(1)
+        self._subscribers: list[tuple[Callable[[Invalidation], None], Callable[[], None]]] = []
+        self._last_seq: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Numbering and hand-off happen together, so a worker's messages leave in seq
+        # order: concurrent publishers would otherwise look like gaps to the receivers.
+        self._publish_lock = threading.Lock()
+
+    def subscribe(
+        self, on_message: Callable[[Invalidation], None], on_reset: Callable[[], None]
+    ) -> None:
+        """`on_reset` runs when messages may have been missed: drop everything cached."""
+        self._subscribers.append((on_message, on_reset))
+
+    def publish(self, streams: Iterable[tuple[str, int]] = (), plans: bool = False) -> None:
+        """Announce committed appends (and/or an edit of `plans`). Call after commit."""
+        streams = list(streams)
+        chunks = [
+            tuple(streams[i : i + STREAMS_PER_MESSAGE])
+            for i in range(0, len(streams), STREAMS_PER_MESSAGE)
+        ] or [()]
+        now = time.time()
+        with self._publish_lock:
+            messages = [Invalidation(self.origin, next(self._seq), now, c, plans) for c in chunks]
+            self._send(messages)
+        self.metrics.invalidations_published.inc(len(messages), self.name)
+
+    @abc.abstractmethod
+    def _send(self, messages: list[Invalidation]) -> None:
+        """Hand `messages` to the transport; must not block the commit path."""
+
+    def deliver(self, messages: list[Invalidation]) -> None:
+        with self._lock:
+            for m in messages:
+                if self.echoes and m.origin == self.origin:
+                    continue
+                last = self._last_seq.get(m.origin, m.seq - 1)
+                self._last_seq[m.origin] = max(last, m.seq)
+                if m.seq > last + 1:
+                    self.metrics.invalidations_dropped.inc(m.seq - last - 1, self.name, "gap")
+                    self._reset()
+                self.metrics.invalidation_lag_seconds.observe(
+                    max(0.0, time.time() - m.sent_at), self.name
+                )
+                self.metrics.invalidations_received.inc(1, self.name)
+                for on_message, _ in self._subscribers:
+                    on_message(m)
+
+    def resync(self) -> None:
+        """Forget the sequence numbers seen so far and reset the subscribers."""
+        with self._lock:
+            self._last_seq.clear()
+            self._reset()
+
+    def _reset(self) -> None:
+        for _, on_reset in self._subscribers:
+            on_reset()
+
+    def start(self, stop: threading.Event) -> None:  # noqa: B027 (nothing to receive by default)
+        """Start receiving until `stop` is set."""
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait (up to `timeout` seconds) until what was published has been sent; for
+        short-lived processes such as tools. True unless the wait timed out.
+        """
+        return True
+
+
+class MemoryInvalidationBus(InvalidationBus):
+    """Delivers inline to the subscribers of this process (e.g. several caches in tests)."""
+
+    name = "memory"
+
+    def _send(self, messages: list[Invalidation]) -> None:
+        self.deliver(messages)
+
+
+class SocketInvalidationBus(InvalidationBus):
+    """
+    Workers of one host, each bound to "<origin>.sock" in `directory`. A publish sends
+    one non-blocking datagram per payload to every other socket there, so a worker that
+    starts later is reached from its first commit on. A peer whose buffer is full misses
+    the datagram (and sees the gap); a socket file nobody is bound to any more is removed.
+    """
+
+    name = "socket"
+
+    def __init__(
+        self, directory: str | Path, metrics: Metrics | None = None, poll_s: float = 0.2
+    ) -> None:
+        super().__init__(metrics)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{self.origin}.sock"
+        self.poll_s = poll_s
+        self._out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._out.setblocking(False)
+
+    def peers(self) -> list[Path]:
+        return [p for p in self.directory.glob("*.sock") if p != self.path]
+
+    def _send(self, messages: list[Invalidation]) -> None:
+        payloads, oversize = pack(messages)
+        if oversize:
+            self.metrics.invalidations_dropped.inc(oversize, self.name, "oversize")
+        for peer in self.peers():
+            for payload, n in payloads:
+                try:
+                    self._out.sendto(payload.encode(), str(peer))
+                except BlockingIOError:
+                    self.metrics.invalidations_dropped.inc(n, self.name, "send")
+                except (ConnectionRefusedError, FileNotFoundError):
+                    peer.unlink(missing_ok=True)  # left behind by a worker that exited
+                    break
+
+    def start(self, stop: threading.Event) -> None:
+        inbox = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        inbox.bind(str(self.path))
+        inbox.settimeout(self.poll_s)
+        threading.Thread(
+            target=self._receive, args=(inbox, stop), name="invalidation-socket", daemon=True
+        ).start()
+
+    def _receive(self, inbox: socket.socket, stop: threading.Event) -> None:
+        try:
+            while not stop.is_set():
+                try:
+                    data = inbox.recv(MAX_PAYLOAD + 1024)
+                except TimeoutError:
+                    continue
+                try:
+                    self.deliver(decode(data))
+                except Exception:
+                    log.exception("bad invalidation datagram")
+        finally:
+            inbox.close()
+            self.path.unlink(missing_ok=True)
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """
+    LISTEN/NOTIFY on CHANNEL. Publishing enqueues (a full queue drops the message); a
+    publisher thread drains the queue and sends what it holds in one transaction of
+    pg_notify calls, several messages per payload. A listener thread resyncs whenever it
+    (re)connects or loses its connection. Both use psycopg connections of their own,
+    outside the pool.
+    """
+
+    name = "postgres"
+    echoes = True
+
+    def __init__(
+        self,
+        conninfo: str,
+        queue_size: int = 10_000,
+        metrics: Metrics | None = None,
+        poll_s: float = 1.0,
+        reconnect_s: float = 1.0,
+    ) -> None:
+        super().__init__(metrics)
+        self.conninfo = conninfo
+        self.poll_s = poll_s
+        self.reconnect_s = reconnect_s
+        self.listening = False
+        self._queue: queue.Queue[Invalidation] = queue.Queue(maxsize=queue_size)
+        self.metrics.invalidation_listening.set_function(lambda: float(self.listening), self.name)
+
+    def _connect(self):
+        import psycopg
+
+        return psycopg.connect(self.conninfo, autocommit=True)
+
+    def _send(self, messages: list[Invalidation]) -> None:
+        for m in messages:
+            try:
+                self._queue.put_nowait(m)
+            except queue.Full:
+                self.metrics.invalidations_dropped.inc(1, self.name, "queue")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def start(self, stop: threading.Event) -> None:
+        for target, name in (
+            (self._publish_forever, "publisher"),
+            (self._listen_forever, "listener"),
+        ):
+            threading.Thread(
+                target=target, args=(stop,), name=f"invalidation-{name}", daemon=True
+            ).start()
+
+    def _publish_forever(self, stop: threading.Event) -> None:
+        conn = None
+        while not stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=self.poll_s)]
+            except queue.Empty:
+                continue
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            payloads, oversize = pack(batch)
+            if oversize:
+                self.metrics.invalidations_dropped.inc(oversize, self.name, "oversize")
+            try:
+                if conn is None or conn.closed:
+                    conn = self._connect()
+                with conn.transaction():
+                    for payload, _ in payloads:
+                        conn.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+            except Exception:
+                log.exception("publishing invalidations failed; reconnecting")
+                self.metrics.invalidations_dropped.inc(
+                    sum(n for _, n in payloads), self.name, "send"
+                )
+                conn = None
+                stop.wait(self.reconnect_s)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        if conn is not None:
+            conn.close()
+
+    def _listen_forever(self, stop: threading.Event) -> None:
+        while not stop.is_set():
+            try:
+                with self._connect() as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    self.listening = True
+                    self.resync()  # anything sent before LISTEN was missed
+                    while not stop.is_set():
+                        for note in conn.notifies(timeout=self.poll_s):
+                            self.deliver(decode(note.payload))
+            except Exception:
+                log.exception("invalidation listener failed; reconnecting")
+            finally:
+                if self.listening:
+                    self.listening = False
+                    self.resync()
+            stop.wait(self.reconnect_s)
+
+
+def subscribe_caches(
+    bus: InvalidationBus, state_cache: AccountStateCache, plans: PlanCatalog
+) -> None:
+    """Apply other workers' appends to this worker's caches."""
+
+    def on_message(m: Invalidation) -> None:
+        for stream_id, version in m.streams:
+            state_cache.invalidate(stream_id, version)
+        if m.plans:
+            plans.invalidate()
+
+    def on_reset() -> None:
+        state_cache.clear()
+        plans.invalidate()
+
+    bus.subscribe(on_message, on_reset)
+
+
+@lru_cache
+def get_invalidation_bus() -> InvalidationBus | None:
+    settings = get_settings()
+    if settings.invalidation_bus == "memory":
+        return MemoryInvalidationBus()
+    if settings.invalidation_bus == "socket":
+        return SocketInvalidationBus(settings.invalidation_socket_dir)
+    if settings.invalidation_bus == "postgres":
+        from sqlalchemy.engine import make_url
+
+        from app.infra.db.session import DATABASE_URL
+
+        url = make_url(DATABASE_URL).set(drivername="postgresql")
+        return PostgresInvalidationBus(
+            url.render_as_string(hide_password=False), queue_size=settings.invalidation_queue_size
+        )
+    return None
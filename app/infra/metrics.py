@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar
+from functools import lru_cache
+
+from app.settings import get_settings
+
+# Seconds; covers a sub-millisecond cache hit up to a badly stuck transaction.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)  # fmt: skip
+REPLAY_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 100000)
+
+# Stage durations (ms) of the current request, for the Server-Timing header.
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "quota_ledger_request_timings", default=None
+)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.enabled = True
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self.enabled = True
+        # labels -> [count per bucket (+Inf last), sum]
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip((*self.buckets, float("inf")), counts, strict=True):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    bucket_labels = _format_labels(self.labels, labels, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total[0]:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A value read when rendered, from a function registered per label set."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.enabled = True
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set_function(self, fn: Callable[[], float], *labels: str) -> None:
+        self._functions[labels] = fn
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, fn in sorted(self._functions.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {fn():g}")
+        return lines
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: Metrics, name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc: object) -> None:
+        elapsed = time.perf_counter() - self.started
+        self.metrics.stage_seconds.observe(elapsed, self.name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed * 1000
+
+
+_NOOP: AbstractContextManager[None] = nullcontext()
+
+
+class Metrics:
+    """
+    In-process metrics for the write and read paths, rendered in the Prometheus text
+    format. When disabled, `stage` hands back a shared no-op context manager and every
+    counter/histogram update returns on its first line.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.stage_seconds = Histogram(
+            "quota_ledger_stage_seconds",
+            "Time spent per stage of a command or read.",
+            LATENCY_BUCKETS,
+            ("stage",),
+        )
+        self.replay_events = Histogram(
+            "quota_ledger_replay_events",
+            "Events folded per hydration (after the snapshot, if any).",
+            REPLAY_BUCKETS,
+        )
+        self.events_appended = Counter(
+            "quota_ledger_events_appended_total", "Events committed to the event store."
+        )
+        self.conflicts = Counter(
+            "quota_ledger_conflicts_total", "Appends rejected by optimistic concurrency."
+        )
+        self.conflict_retries = Counter(
+            "quota_ledger_conflict_retries_total", "Commands re-run after a concurrency conflict."
+        )
+        self.conflicts_exhausted = Counter(
+            "quota_ledger_conflicts_exhausted_total",
+            "Commands still conflicting after CONFLICT_RETRIES re-runs (answered 409).",
+        )
+        self.idempotent_hits = Counter(
+            "quota_ledger_idempotent_hits_total",
+            "Retries answered with the originally recorded version.",
+            ("source",),
+        )
+        self.pool_wait_seconds = Histogram(
+            "quota_ledger_pool_wait_seconds",
+            "Time to get a connection from the pool (including opening a new one).",
+            LATENCY_BUCKETS,
+            ("pool",),
+        )
+        self.pool_timeouts = Counter(
+            "quota_ledger_pool_timeouts_total",
+            "Checkouts that gave up after DB_POOL_TIMEOUT_S.",
+            ("pool",),
+        )
+        self.pool_pings = Counter(
+            "quota_ledger_pool_pings_total", "Liveness pings issued on checkout.", ("pool",)
+        )
+        self.pool_checked_out = Gauge(
+            "quota_ledger_pool_checked_out", "Connections currently in use.", ("pool",)
+        )
+        self.pool_overflow = Gauge(
+            "quota_ledger_pool_overflow",
+            "Connections open beyond DB_POOL_SIZE (negative: pool not yet filled).",
+            ("pool",),
+        )
+        self.pool_size = Gauge("quota_ledger_pool_size", "Configured pool size.", ("pool",))
+        self.invalidations_published = Counter(
+            "quota_ledger_invalidations_published_total",
+            "Cache invalidation messages published after commit.",
+            ("bus",),
+        )
+        self.invalidations_received = Counter(
+            "quota_ledger_invalidations_received_total",
+            "Invalidation messages from other workers applied to this worker's caches.",
+            ("bus",),
+        )
+        self.invalidations_dropped = Counter(
+            "quota_ledger_invalidations_dropped_total",
+            "Invalidation messages lost: not sent (queue, send, oversize) or missed (gap).",
+            ("bus", "reason"),
+        )
+        self.invalidation_lag_seconds = Histogram(
+            "quota_ledger_invalidation_lag_seconds",
+            "Time from publishing an invalidation to applying it in another worker.",
+            LATENCY_BUCKETS,
+            ("bus",),
+        )
+        self.invalidation_listening = Gauge(
+            "quota_ledger_invalidation_listening",
+            "1 while the invalidation listener is connected.",
+            ("bus",),
+        )
+        self._all: list[Counter | Histogram | Gauge] = [
+            self.stage_seconds,
+            self.replay_events,
+            self.events_appended,
+            self.conflicts,
+            self.conflict_retries,
+            self.conflicts_exhausted,
+            self.idempotent_hits,
+            self.pool_wait_seconds,
+            self.pool_timeouts,
+            self.pool_pings,
+            self.pool_checked_out,
+            self.pool_overflow,
+            self.pool_size,
+            self.invalidations_published,
+            self.invalidations_received,
+            self.invalidations_dropped,
+            self.invalidation_lag_seconds,
+            self.invalidation_listening,
+        ]
+        for m in self._all:
+            m.enabled = enabled
+
+    def stage(self, name: str) -> AbstractContextManager[None]:
+        """Time a block as `name` (histogram plus the current request's Server-Timing)."""
+        if not self.enabled:
+            return _NOOP
+        return _Stage(self, name)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._all:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+def start_request_timings() -> dict[str, float]:
+    """Collect stage timings for the current request (context) into the returned dict."""
+    timings: dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={ms:.3f}" for name, ms in timings.items())
+
+
+@lru_cache
+def get_metrics() -> Metrics:
+    return Metrics(enabled=get_settings().metrics_enabled)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+import time
+from functools import lru_cache
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.domain.types import Plan
+from app.infra.db.dialect import upsert_insert
+from app.infra.db.session import SessionLocal
+from app.infra.invalidation import InvalidationBus, get_invalidation_bus
+from app.infra.plans.models import PlanRecord
+from app.settings import get_settings
+
+
+class PlanCatalog:
+    """
+    In-process copy of the `plans` table, reloaded in one query once it is older than
+    `ttl_seconds`. Plans are few and rarely edited, so a usage write resolves its plan
+    from memory instead of with a lookup of its own.
+
+    A plan id the table does not know resolves to None, i.e. no limits are enforced.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 60.0,
+        session_factory: sessionmaker[Session] = SessionLocal,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.session_factory = session_factory
+        self._plans: dict[str, Plan] = {}
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _load(self, session: Session) -> dict[str, Plan]:
+        rows = session.execute(select(PlanRecord)).scalars()
+        return {r.plan_id: Plan(plan_id=r.plan_id, limits=dict(r.limits or {})) for r in rows}
+
+    def get(self, plan_id: str | None, session: Session | None = None) -> Plan | None:
+        """
+        Resolve `plan_id`. A reload, when due, runs on `session` if given (so a command
+        does not check out a second connection) and on a session of its own otherwise.
+        """
+        if plan_id is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded_at is None or now - self._loaded_at >= self.ttl_seconds:
+                if session is not None:
+                    self._plans = self._load(session)
+                else:
+                    with self.session_factory() as own:
+                        self._plans = self._load(own)
+                self._loaded_at = now
+            return self._plans.get(plan_id)
+
+    def invalidate(self) -> None:
+        """Force a reload on next use (e.g. after editing `plans`)."""
+        with self._lock:
+            self._loaded_at = None
+
+
+@lru_cache
+def get_plan_catalog() -> PlanCatalog:
+    return PlanCatalog(ttl_seconds=get_settings().plan_cache_ttl_s)
+
+
+def save_plan(
+    plan_id: str,
+    limits: dict[str, int],
+    catalog: PlanCatalog | None = None,
+    bus: InvalidationBus | None = None,
+    session_factory: sessionmaker[Session] = SessionLocal,
+) -> None:
+    """
+    Create plan `plan_id` or replace its limits, then make the catalogs reload: this
+    process's at once, the other workers' through the invalidation bus (when one is
+    configured) rather than once their TTL runs out.
+    """
+    with session_factory() as session:
+        stmt = upsert_insert(session, PlanRecord.__table__).values(plan_id=plan_id, limits=limits)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["plan_id"],
+                set_={"limits": stmt.excluded.limits, "updated_at": func.now()},
+            )
+        )
+        session.commit()
+    (catalog if catalog is not None else get_plan_catalog()).invalidate()
+    bus = bus if bus is not None else get_invalidation_bus()
+    if bus is not None:
+        bus.publish(plans=True)
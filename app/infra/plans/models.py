@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from sqlalchemy import JSON, Column, DateTime, String, func
+
+from app.infra.db.base import Base
+
+
+class PlanRecord(Base):
+    __tablename__ = "plans"
+
+    plan_id = Column(String, primary_key=True)
+    # meter -> units allowed per period; meters not listed are unlimited.
+    limits = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
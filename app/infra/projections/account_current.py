@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.domain.events import EventEnvelope
+from app.domain.fold import fold
+from app.domain.types import AccountQuotaState
+from app.infra.event_store.archive import states_at_boundary
+from app.infra.event_store.models import Event, Stream
+from app.infra.event_store.usage_shards import is_shard_stream
+from app.infra.projections.models import AccountCurrent
+
+if TYPE_CHECKING:
+    from app.infra.event_store.repository import RecordedEvent
+
+
+def state_from_row(row: AccountCurrent) -> AccountQuotaState:
+    return AccountQuotaState(
+        exists=True,
+        status=row.status,  # type: ignore[arg-type]
+        plan_id=row.plan_id,
+        period=row.period,
+        used=dict(row.used or {}),
+        usage_shards=row.usage_shards or 0,
+    )
+
+
+def _rebuild(session: Session, stream_id: str, up_to_version: int) -> AccountQuotaState:
+    # Local import: the repository module imports this one.
+    from app.infra.event_store.repository import _to_envelope
+
+    # An archived stream starts from its state at the archive boundary.
+    archived_through = (
+        session.execute(
+            select(Stream.archived_through).where(Stream.stream_id == stream_id)
+        ).scalar_one_or_none()
+        or 0
+    )
+    base = (
+        states_at_boundary(session, {stream_id: archived_through})[stream_id]
+        if archived_through
+        else None
+    )
+    rows = session.execute(
+        select(Event)
+        .where(
+            Event.stream_id == stream_id,
+            Event.stream_version > archived_through,
+            Event.stream_version <= up_to_version,
+        )
+        .order_by(Event.stream_version.asc())
+    ).scalars()
+    return fold((_to_envelope(r) for r in rows), base)
+
+
+def update_account_current(
+    session: Session,
+    stream_id: str,
+    previous_version: int,
+    new_events: list[EventEnvelope],
+) -> None:
+    """
+    Bring the account_current row for `stream_id` up to date with `new_events`, which were
+    just appended on top of `previous_version` in this transaction.
+
+    The row is locked and advanced incrementally; the stream is only replayed in full when
+    the row is missing or does not sit exactly at `previous_version` (a gap).
+    """
+    update_account_current_many(session, {stream_id: (previous_version, new_events)})
+
+
+def update_account_current_many(
+    session: Session,
+    appended: dict[str, tuple[int, list[EventEnvelope]]],
+) -> None:
+    """
+    update_account_current for several streams, with one SELECT ... FOR UPDATE for all rows
+    (locked in account_id order) and the row writes batched at flush.
+    """
+    if not appended:
+        return
+
+    existing = {
+        row.account_id: row
+        for row in session.execute(
+            select(AccountCurrent)
+            .where(AccountCurrent.account_id.in_(sorted(appended)))
+            .order_by(AccountCurrent.account_id)
+            .with_for_update()
+        ).scalars()
+    }
+
+    for stream_id, (previous_version, new_events) in appended.items():
+        new_version = previous_version + len(new_events)
+        proj = existing.get(stream_id)
+
+        if proj is not None and proj.stream_version >= new_version:
+            continue  # already applied (e.g. a projector re-reading the feed)
+        if proj is not None and proj.stream_version == previous_version:
+            state = fold(new_events, state_from_row(proj))
+        else:
+            state = _rebuild(session, stream_id, new_version)
+
+        if proj is None:
+            session.add(
+                AccountCurrent(
+                    account_id=stream_id,
+                    stream_version=new_version,
+                    status=state.status,
+                    plan_id=state.plan_id,
+                    period=state.period,
+                    used=state.used or {},
+                    usage_shards=state.usage_shards,
+                )
+            )
+        else:
+            proj.stream_version = new_version
+            proj.status = state.status
+            proj.plan_id = state.plan_id
+            proj.period = state.period
+            proj.used = state.used or {}
+            proj.usage_shards = state.usage_shards
+
+
+class AccountCurrentProjector:
+    """Feed-driven maintenance of account_current, for PROJECTION_MODE=async."""
+
+    name = "account_current"
+
+    def handle(self, session: Session, events: list[RecordedEvent]) -> None:
+        appended: dict[str, tuple[int, list[EventEnvelope]]] = {}
+        for r in events:
+            if is_shard_stream(r.stream_id):
+                continue  # usage sub-streams keep their totals in the append transaction
+            previous_version, envelopes = appended.get(r.stream_id, (r.stream_version - 1, []))
+            if previous_version + len(envelopes) + 1 != r.stream_version:
+                # Not contiguous with what we have for this stream: flush that run first.
+                update_account_current_many(session, {r.stream_id: (previous_version, envelopes)})
+                previous_version, envelopes = r.stream_version - 1, []
+            envelopes.append(r.envelope)
+            appended[r.stream_id] = (previous_version, envelopes)
+        update_account_current_many(session, appended)
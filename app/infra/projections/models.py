@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import JSON, Column, Integer, String
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Integer, String, func
 
 from app.infra.db.base import Base
 
@@ -15,3 +15,30 @@ class AccountCurrent(Base):
     plan_id = Column(String, nullable=True)
     period = Column(String, nullable=True)
     used = Column(JSON, nullable=False, default=dict)
+    # Usage sub-streams: `used` covers this stream only and reads add the shards' totals (see app.infra.event_store.usage_shards).
+    usage_shards = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class ProjectorCheckpoint(Base):
+    """Last global event position a projector has applied (committed with its writes)."""
+
+    __tablename__ = "projector_checkpoints"
+
+    name = Column(String, primary_key=True)
+    position = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
+
+class UsageRollup(Base):
+    """Units recorded per account, meter and UTC hour or day (bucket_start is its first instant)."""
+
+    __tablename__ = "usage_rollups"
+
+    account_id = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)  # "hour" | "day"
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    meter = Column(String, primary_key=True)
+    units = Column(BigInteger, nullable=False, default=0)
+    events = Column(BigInteger, nullable=False, default=0)
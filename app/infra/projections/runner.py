@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Protocol
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.infra.db.dialect import upsert_insert
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.feed import CatchUpSubscription
+from app.infra.event_store.repository import RecordedEvent
+from app.infra.projections.models import ProjectorCheckpoint
+
+log = logging.getLogger(__name__)
+
+
+class Projector(Protocol):
+    name: str
+
+    def handle(self, session: Session, events: list[RecordedEvent]) -> None:
+        """Apply a batch of feed events; runs in the transaction that saves the checkpoint."""
+
+
+class ProjectorRunner:
+    """
+    Drives one projector over the global feed. Each batch is applied and its checkpoint
+    saved in the same transaction, so a restart resumes exactly where the last commit
+    left off. The checkpoint row is locked per batch, so two runners for the same
+    projector take turns instead of double-applying.
+    """
+
+    def __init__(
+        self,
+        projector: Projector,
+        session_factory: sessionmaker[Session] = SessionLocal,
+        batch_size: int = 500,
+        gap_timeout: float = 2.0,
+    ) -> None:
+        self.projector = projector
+        self.session_factory = session_factory
+        self.subscription = CatchUpSubscription(batch_size=batch_size, gap_timeout=gap_timeout)
+
+    def _lock_checkpoint(self, session: Session) -> int:
+        session.execute(
+            upsert_insert(session, ProjectorCheckpoint.__table__)
+            .values(name=self.projector.name, position=0)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        return session.execute(
+            select(ProjectorCheckpoint.position)
+            .where(ProjectorCheckpoint.name == self.projector.name)
+            .with_for_update()
+        ).scalar_one()
+
+    def run_once(self) -> int:
+        """Apply the next batch, if any. Returns the number of events applied."""
+        with self.session_factory() as session:
+            self.subscription.ack(self._lock_checkpoint(session))
+            events = self.subscription.poll(session)
+            if not events:
+                return 0
+
+            self.projector.handle(session, events)
+            last = events[-1].position
+            session.get(ProjectorCheckpoint, self.projector.name).position = last
+            session.commit()
+
+        self.subscription.ack(last)
+        return len(events)
+
+    def catch_up(self) -> int:
+        """Run batches until the feed is drained (up to unsettled gaps)."""
+        total = 0
+        while applied := self.run_once():
+            total += applied
+        return total
+
+    def run_forever(self, stop: threading.Event, poll_interval: float = 0.2) -> None:
+        while not stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                log.exception("projector %s failed; retrying", self.projector.name)
+            stop.wait(poll_interval)
+
+    def start(self, stop: threading.Event, poll_interval: float = 0.2) -> threading.Thread:
+        thread = threading.Thread(
+            target=self.run_forever,
+            args=(stop, poll_interval),
+            name=f"projector-{self.projector.name}",
+            daemon=True,
+        )
+        thread.start()
+        return thread
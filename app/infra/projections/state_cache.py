@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+
+from app.settings import get_settings
+
+
+class AccountStateCache:
+    """
+    Bounded LRU + TTL cache of account state views, tagged with their stream_version.
+
+    Appends committed by this process call `invalidate` with the new head, which replaces
+    the entry with a version floor: a reader that loaded an older version before the
+    commit cannot put it back afterwards. Writes made by other processes are only seen
+    once an entry expires, so `ttl_seconds` bounds staleness across workers, unless an
+    invalidation bus (app.infra.invalidation) hands their appends to `invalidate` too.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 1.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        # account_id -> (stream_version, view or None for a floor, expires_at)
+        self._entries: OrderedDict[str, tuple[int, dict[str, Any] | None, float]] = OrderedDict()
+
+    def get(self, account_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry is None or entry[1] is None or entry[2] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(account_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, account_id: str, version: int, view: dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry is not None and entry[0] > version and entry[2] > time.monotonic():
+                return  # older than a committed append we know about
+            self._store(account_id, (version, view, time.monotonic() + self.ttl))
+
+    def invalidate(self, account_id: str, version: int) -> None:
+        """The stream was appended up to `version`; drop anything older."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry is not None and entry[0] >= version and entry[1] is not None:
+                return
+            self.invalidations += 1
+            self._store(account_id, (version, None, time.monotonic() + self.ttl))
+
+    def clear(self) -> None:
+        """Drop every entry (the invalidation bus may have missed appends)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, account_id: str, entry: tuple[int, dict[str, Any] | None, float]) -> None:
+        self._entries[account_id] = entry
+        self._entries.move_to_end(account_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+@lru_cache
+def get_state_cache() -> AccountStateCache:
+    settings = get_settings()
+    return AccountStateCache(
+        max_entries=settings.state_cache_size, ttl_seconds=settings.state_cache_ttl_s
+    )
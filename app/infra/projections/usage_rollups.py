@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any, Literal
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.infra.db.dialect import upsert_insert
+from app.infra.event_store.usage_shards import account_of
+from app.infra.projections.models import UsageRollup
+
+if TYPE_CHECKING:
+    from app.infra.event_store.repository import RecordedEvent
+
+Granularity = Literal["hour", "day"]
+GRANULARITIES: tuple[Granularity, ...] = ("hour", "day")
+
+# (account_id, occurred_at, payload) of one UsageRecorded event.
+Usage = tuple[str, datetime, dict[str, Any]]
+# (account_id, granularity, bucket_start, meter) -> [units, events]
+Deltas = dict[tuple[str, str, datetime, str], list[int]]
+
+
+def bucket_start(ts: datetime, granularity: Granularity) -> datetime:
+    ts = ts.astimezone(UTC) if ts.tzinfo is not None else ts.replace(tzinfo=UTC)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_deltas(usage: Iterable[Usage], deltas: Deltas | None = None) -> Deltas:
+    """Sum `usage` into per-bucket increments, for every granularity."""
+    deltas = deltas if deltas is not None else {}
+    for account_id, occurred_at, p in usage:
+        for granularity in GRANULARITIES:
+            key = (account_id, granularity, bucket_start(occurred_at, granularity), p["meter"])
+            delta = deltas.get(key)
+            if delta is None:
+                deltas[key] = [int(p["units"]), 1]
+            else:
+                delta[0] += int(p["units"])
+                delta[1] += 1
+    return deltas
+
+
+def apply_rollup_deltas(session: Session, deltas: Deltas, batch_size: int = 1000) -> None:
+    """
+    Add `deltas` onto usage_rollups with multi-row upserts, keys in a fixed order so
+    concurrent writers lock the same buckets in the same order.
+    """
+    table = UsageRollup.__table__
+    values = [
+        {
+            "account_id": account_id,
+            "granularity": granularity,
+            "bucket_start": start,
+            "meter": meter,
+            "units": units,
+            "events": events,
+        }
+        for (account_id, granularity, start, meter), (units, events) in sorted(deltas.items())
+    ]
+    for i in range(0, len(values), batch_size):
+        stmt = upsert_insert(session, table).values(values[i : i + batch_size])
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["account_id", "granularity", "bucket_start", "meter"],
+                set_={
+                    "units": table.c.units + stmt.excluded.units,
+                    "events": table.c.events + stmt.excluded.events,
+                },
+            )
+        )
+
+
+def update_usage_rollups(session: Session, usage: Iterable[Usage]) -> None:
+    """Fold usage just appended in this transaction into its hourly and daily buckets."""
+    apply_rollup_deltas(session, rollup_deltas(usage))
+
+
+def usage_of(events: Iterable[RecordedEvent]) -> Iterable[Usage]:
+    for r in events:
+        e = r.envelope
+        if e.event_type == "UsageRecorded":
+            occurred_at = datetime.fromisoformat(e.occurred_at.replace("Z", "+00:00"))
+            yield account_of(r.stream_id), occurred_at, e.payload
+
+
+@dataclass(frozen=True)
+class RollupQuery:
+    """Buckets starting in [bucket_start(start), end) (UTC), optionally for some meters."""
+
+    start: datetime
+    end: datetime
+    granularity: Granularity = "hour"
+    meters: tuple[str, ...] = ()
+
+
+def read_rollups(session: Session, account_id: str, query: RollupQuery) -> list[UsageRollup]:
+    """Non-empty buckets matching `query`, oldest first."""
+    stmt = select(UsageRollup).where(
+        UsageRollup.account_id == account_id,
+        UsageRollup.granularity == query.granularity,
+        UsageRollup.bucket_start >= bucket_start(query.start, query.granularity),
+        UsageRollup.bucket_start < query.end,
+    )
+    if query.meters:
+        stmt = stmt.where(UsageRollup.meter.in_(query.meters))
+    return list(
+        session.execute(stmt.order_by(UsageRollup.bucket_start, UsageRollup.meter)).scalars()
+    )
+
+
+class UsageRollupProjector:
+    """Feed-driven maintenance of usage_rollups, for PROJECTION_MODE=async."""
+
+    name = "usage_rollups"
+
+    def handle(self, session: Session, events: list[RecordedEvent]) -> None:
+        # Increments are not idempotent: this relies on the runner committing each batch
+        # with its checkpoint.
+        update_usage_rollups(session, usage_of(events))
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Integer, String, func
+
+from app.infra.db.base import Base
+
+
+class AccountSnapshot(Base):
+    __tablename__ = "account_snapshots"
+
+    stream_id = Column(String, primary_key=True)
+    stream_version = Column(BigInteger, primary_key=True)
+
+    # Version of the fold logic (apply_event) that produced `state`.
+    fold_version = Column(Integer, primary_key=True)
+    state = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
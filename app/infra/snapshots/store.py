@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import and_, func, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.domain.aggregate import FOLD_VERSION
+from app.domain.types import AccountQuotaState
+from app.infra.db.session import SessionLocal
+from app.infra.snapshots.models import AccountSnapshot
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    stream_version: int
+    state: AccountQuotaState
+
+
+def _state_to_json(state: AccountQuotaState) -> dict:
+    return asdict(state)
+
+
+def _state_from_json(data: dict) -> AccountQuotaState:
+    return AccountQuotaState(
+        exists=data["exists"],
+        status=data["status"],
+        plan_id=data["plan_id"],
+        period=data["period"],
+        used=data["used"],
+        usage_shards=data.get("usage_shards", 0),
+    )
+
+
+class SqlAlchemySnapshotStore:
+    def load_latest(self, stream_id: str, session: Session | None = None) -> Snapshot | None:
+        """
+        Latest snapshot for the stream produced by the current fold logic.
+        Snapshots tagged with another FOLD_VERSION are ignored (stale).
+        """
+        if session is None:
+            with SessionLocal() as session:
+                return self.load_latest(stream_id, session=session)
+
+        row = session.execute(
+            select(AccountSnapshot)
+            .where(
+                AccountSnapshot.stream_id == stream_id,
+                AccountSnapshot.fold_version == FOLD_VERSION,
+            )
+            .order_by(AccountSnapshot.stream_version.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        return Snapshot(stream_version=row.stream_version, state=_state_from_json(row.state))
+
+    def load_latest_many(self, session: Session, stream_ids: list[str]) -> dict[str, Snapshot]:
+        """load_latest for several streams in one query."""
+        if not stream_ids:
+            return {}
+        latest = (
+            select(
+                AccountSnapshot.stream_id,
+                func.max(AccountSnapshot.stream_version).label("stream_version"),
+            )
+            .where(
+                AccountSnapshot.stream_id.in_(stream_ids),
+                AccountSnapshot.fold_version == FOLD_VERSION,
+            )
+            .group_by(AccountSnapshot.stream_id)
+            .subquery()
+        )
+        rows = session.execute(
+            select(AccountSnapshot).join(
+                latest,
+                and_(
+                    AccountSnapshot.stream_id == latest.c.stream_id,
+                    AccountSnapshot.stream_version == latest.c.stream_version,
+                    AccountSnapshot.fold_version == FOLD_VERSION,
+                ),
+            )
+        ).scalars()
+        return {
+            row.stream_id: Snapshot(
+                stream_version=row.stream_version, state=_state_from_json(row.state)
+            )
+            for row in rows
+        }
+
+    def load_at_or_before_many(
+        self, session: Session, versions: dict[str, int]
+    ) -> dict[str, Snapshot]:
+        """
+        Per stream, the latest current-fold snapshot at or below the given version (for
+        point-in-time reads). Two queries: the snapshot keys, then the chosen rows.
+        """
+        if not versions:
+            return {}
+        best: dict[str, int] = {}
+        for stream_id, version in session.execute(
+            select(AccountSnapshot.stream_id, AccountSnapshot.stream_version).where(
+                AccountSnapshot.stream_id.in_(versions),
+                AccountSnapshot.fold_version == FOLD_VERSION,
+            )
+        ):
+            if best.get(stream_id, 0) < version <= versions[stream_id]:
+                best[stream_id] = version
+        if not best:
+            return {}
+
+        rows = session.execute(
+            select(AccountSnapshot).where(
+                tuple_(AccountSnapshot.stream_id, AccountSnapshot.stream_version).in_(
+                    list(best.items())
+                ),
+                AccountSnapshot.fold_version == FOLD_VERSION,
+            )
+        ).scalars()
+        return {
+            row.stream_id: Snapshot(
+                stream_version=row.stream_version, state=_state_from_json(row.state)
+            )
+            for row in rows
+        }
+
+    def save(
+        self,
+        stream_id: str,
+        stream_version: int,
+        state: AccountQuotaState,
+        session: Session | None = None,
+    ) -> None:
+        if session is not None:
+            session.add(
+                AccountSnapshot(
+                    stream_id=stream_id,
+                    stream_version=stream_version,
+                    fold_version=FOLD_VERSION,
+                    state=_state_to_json(state),
+                )
+            )
+            return
+
+        with SessionLocal() as session:
+            self.save(stream_id, stream_version, state, session=session)
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another writer already snapshotted this version; snapshots are best-effort.
+                session.rollback()
@@ -1,16 +1,52 @@
+import threading
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
+from app.api.metrics import router as metrics_router
 from app.api.v1.router import router as v1_router
 from app.infra.db.init_db import init_db
+from app.infra.invalidation import get_invalidation_bus, subscribe_caches
+from app.infra.metrics import get_metrics, server_timing_header, start_request_timings
+from app.infra.plans.catalog import get_plan_catalog
+from app.infra.projections.account_current import AccountCurrentProjector
+from app.infra.projections.runner import ProjectorRunner
+from app.infra.projections.state_cache import get_state_cache
+from app.infra.projections.usage_rollups import UsageRollupProjector
+from app.settings import get_settings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+
+    settings = get_settings()
+    stop = threading.Event()
+    if settings.projection_mode == "async":
+        for projector in (AccountCurrentProjector(), UsageRollupProjector()):
+            ProjectorRunner(
+                projector,
+                batch_size=settings.projector_batch_size,
+                gap_timeout=settings.projector_gap_timeout_s,
+            ).start(stop)
+    bus = get_invalidation_bus()
+    if bus is not None:
+        subscribe_caches(bus, get_state_cache(), get_plan_catalog())
+        bus.start(stop)
     yield
+    stop.set()
 
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(v1_router, prefix="/v1")
+app.include_router(metrics_router)
+
+if get_metrics().enabled:
+
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        timings = start_request_timings()
+        response = await call_next(request)
+        if timings:
+            response.headers["Server-Timing"] = server_timing_header(timings)
+        return response
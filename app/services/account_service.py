@@ -1,135 +1,308 @@
 from __future__ import annotations
 
-from app.domain.aggregate import apply_event, decide
+from collections.abc import Iterator
+from datetime import UTC
+
+from sqlalchemy.orm import Session
+
+from app.domain.aggregate import remaining_quota, remaining_units
 from app.domain.commands import (
+    ChangePlan,
     CreateAccount,
     RecordUsage,
     ReinstateAccount,
+    ResetPeriod,
+    ShardUsage,
     SuspendAccount,
 )
-from app.domain.errors import NotFound
-from app.domain.types import AccountQuotaState
+from app.domain.errors import InvariantViolation, NotFound, NotSupported
+from app.domain.types import AccountQuotaState, Plan
 from app.infra.db.session import SessionLocal
-from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.event_store.repository import EventQuery, RecordedEvent, SqlAlchemyEventStore
+from app.infra.event_store.usage_shards import SHARD_INFIX, read_shard_usage
 from app.infra.projections.models import AccountCurrent
+from app.infra.projections.usage_rollups import RollupQuery, read_rollups
+from app.infra.snapshots.store import SqlAlchemySnapshotStore
+from app.services.group_commit import UsageGroupCommitter, get_group_committer
+from app.services.point_in_time import AsOf, states_as_of
+from app.services.unit_of_work import CommandExecutor, UsageResult
+from app.settings import get_settings
 
 
 class AccountService:
-    def __init__(self, store: SqlAlchemyEventStore) -> None:
+    def __init__(
+        self,
+        store: SqlAlchemyEventStore,
+        snapshots: SqlAlchemySnapshotStore | None = None,
+        snapshot_every: int | None = None,
+        max_round_trips: int | None = None,
+        group_commit: UsageGroupCommitter | None = None,
+    ) -> None:
         self.store = store
+        self.executor = CommandExecutor(
+            store,
+            snapshots=snapshots,
+            snapshot_every=snapshot_every,
+            max_round_trips=max_round_trips,
+        )
+        self.snapshots = self.executor.snapshots
+        self.group_commit = group_commit if group_commit is not None else get_group_committer()
 
-    def create_account(self, cmd: CreateAccount) -> int:
-        history = self.store.load_stream(cmd.account_id)
-        state = AccountQuotaState()
-        for e in history:
-            state = apply_event(state, e)
+    def _hydrate(self, account_id: str) -> tuple[AccountQuotaState, int]:
+        return self.executor.load(account_id)
 
-        new_events = decide(state, cmd)
+    def _execute(self, account_id: str, cmd, *, require_exists: bool = True) -> int:
+        return self.executor.execute(account_id, cmd, require_exists=require_exists)
 
-        return self.store.append(
-            stream_id=cmd.account_id,
-            expected_version=len(history),
-            events=new_events,
-        )
+    def create_account(self, cmd: CreateAccount) -> int:
+        check_account_id(cmd.account_id)
+        return self._execute(cmd.account_id, cmd, require_exists=False)
 
     def record_usage(self, cmd: RecordUsage) -> int:
-        history = self.store.load_stream(cmd.account_id)
-        state = AccountQuotaState()
-        for e in history:
-            state = apply_event(state, e)
+        if self.group_commit is not None:
+            return self.group_commit.submit(cmd)
+        return self._execute(cmd.account_id, cmd)
 
-        if not state.exists:
-            raise NotFound("Account does not exist")
+    def record_usage_batch(self, cmds: list[RecordUsage]) -> list[UsageResult]:
+        return self.executor.record_usage_batch(cmds)
 
-        new_events = decide(state, cmd)
+    def change_plan(self, cmd: ChangePlan) -> int:
+        return self._execute(cmd.account_id, cmd)
 
-        return self.store.append(
-            stream_id=cmd.account_id,
-            expected_version=len(history),
-            events=new_events,
-        )
+    def reset_period(self, cmd: ResetPeriod) -> int:
+        return self._execute(cmd.account_id, cmd)
 
     def suspend_account(self, cmd: SuspendAccount) -> int:
-        history = self.store.load_stream(cmd.account_id)
-        state = AccountQuotaState()
-        for e in history:
-            state = apply_event(state, e)
-
-        if not state.exists:
-            raise NotFound("Account does not exist")
-
-        new_events = decide(state, cmd)
-
-        return self.store.append(
-            stream_id=cmd.account_id,
-            expected_version=len(history),
-            events=new_events,
-        )
+        return self._execute(cmd.account_id, cmd)
 
     def reinstate_account(self, cmd: ReinstateAccount) -> int:
-        history = self.store.load_stream(cmd.account_id)
-        state = AccountQuotaState()
-        for e in history:
-            state = apply_event(state, e)
-
-        if not state.exists:
-            raise NotFound("Account does not exist")
+        return self._execute(cmd.account_id, cmd)
 
-        new_events = decide(state, cmd)
+    def shard_usage(self, cmd: ShardUsage) -> int:
+        return self._execute(cmd.account_id, cmd)
 
-        return self.store.append(
-            stream_id=cmd.account_id,
-            expected_version=len(history),
-            events=new_events,
-        )
+    def get_state(self, account_id: str, max_lag: int | None = None) -> dict:
+        # An explicit staleness bound is answered from the database.
+        if max_lag is None:
+            cached = self.store.state_cache.get(account_id)
+            if cached is not None:
+                return cached
+        with self.store.metrics.stage("read_state"):
+            view = self._load_state(account_id, max_lag)
+        if cacheable(view):
+            self.store.state_cache.put(account_id, view["stream_version"], view)
+        return view
 
-    def get_state(self, account_id: str) -> dict:
+    def _load_state(self, account_id: str, max_lag: int | None) -> dict:
         # Prefer projection
         with SessionLocal() as session:
-            proj = session.get(AccountCurrent, account_id)
+            proj = fresh_projection(session, self.store, account_id, max_lag)
             if proj is not None:
-                return {
-                    "account_id": account_id,
-                    "exists": True,
-                    "status": proj.status,
-                    "plan_id": proj.plan_id,
-                    "period": proj.period,
-                    "used": proj.used or {},
-                    "stream_version": proj.stream_version,
-                    "source": "projection",
-                }
-
-        # Fallback to replay
-        history = self.store.load_stream(account_id)
-        state = AccountQuotaState()
-        for e in history:
-            state = apply_event(state, e)
-
-        if not state.exists:
-            raise NotFound("Account does not exist")
+                plan = self.executor.plans.get(proj.plan_id, session=session)
+                return with_shard_usage(
+                    session, projection_view(account_id, proj, plan), proj.usage_shards
+                )
+
+        # Fallback to replay (from the latest snapshot when there is one)
+        state, version = self._hydrate(account_id)
+        view = replay_view(account_id, state, version, self.executor.plans.get(state.plan_id))
+        if not state.usage_shards:
+            return view
+        with SessionLocal() as session:
+            return with_shard_usage(session, view, state.usage_shards)
+
+    def get_state_as_of(self, account_id: str, as_of: AsOf) -> dict:
+        """Account state at a past stream version or timestamp (see point_in_time)."""
+        with SessionLocal() as session:
+            state, version = states_as_of(session, self.snapshots, [account_id], as_of)[account_id]
+        return as_of_view(account_id, state, version, as_of)
+
+    def states_as_of(self, account_ids: list[str], as_of: AsOf) -> Iterator[dict]:
+        """
+        get_state_as_of for many accounts (audit jobs), skipping those not created yet.
+        Accounts in sharded mode at that point come back as {account_id, as_of, error}.
+        """
+        with SessionLocal() as session:
+            states = states_as_of(session, self.snapshots, account_ids, as_of)
+        for account_id, (state, version) in states.items():
+            if not state.exists:
+                continue
+            try:
+                yield as_of_view(account_id, state, version, as_of)
+            except NotSupported as e:
+                yield {"account_id": account_id, "as_of": as_of_param(as_of), "error": str(e)}
+
+    def list_events(self, account_id: str, query: EventQuery | None = None) -> list[dict]:
+        return [event_view(r) for r in self.store.read_page(account_id, query or EventQuery())]
 
+    def events_page(self, account_id: str, query: EventQuery) -> dict:
+        """One keyset page; pass `next_after` back as `after` for the next one."""
+        events = self.list_events(account_id, query)
+        full = query.limit is not None and len(events) == query.limit
         return {
             "account_id": account_id,
-            "exists": True,
-            "status": state.status,
-            "plan_id": state.plan_id,
-            "period": state.period,
-            "used": state.used or {},
-            "stream_version": len(history),
-            "source": "replay",
+            "events": events,
+            "next_after": events[-1]["stream_version"] if full else None,
         }
 
-    def list_events(self, account_id: str) -> list[dict]:
-        events = self.store.load_stream(account_id)
-        return [
+    def stream_events(self, account_id: str, query: EventQuery) -> Iterator[dict]:
+        """All matching events, read lazily through a server-side cursor."""
+        with SessionLocal() as session:
+            for r in self.store.iter_events(session, account_id, query):
+                yield event_view(r)
+
+    def usage_over_time(self, account_id: str, query: RollupQuery) -> dict:
+        with SessionLocal() as session:
+            return usage_view(session, self.store, account_id, query)
+
+
+def fresh_projection(
+    session: Session, store: SqlAlchemyEventStore, account_id: str, max_lag: int | None
+) -> AccountCurrent | None:
+    """
+    The account_current row, unless projections run asynchronously and the row trails the
+    stream head by more than `max_lag` versions (default: settings.projection_max_lag).
+    """
+    proj = session.get(AccountCurrent, account_id)
+    if proj is None or store.inline_projections:
+        return proj
+    if max_lag is None:
+        max_lag = get_settings().projection_max_lag
+    if store.head_version(session, account_id) - proj.stream_version > max_lag:
+        return None
+    return proj
+
+
+def projection_view(account_id: str, proj: AccountCurrent, plan: Plan | None) -> dict:
+    # `remaining` follows the plan as the catalog has it now, edits to its limits included.
+    return {
+        "account_id": account_id,
+        "exists": True,
+        "status": proj.status,
+        "plan_id": proj.plan_id,
+        "period": proj.period,
+        "used": proj.used or {},
+        "remaining": remaining_units(proj.used or {}, plan),
+        "stream_version": proj.stream_version,
+        "source": "projection",
+    }
+
+
+def with_shard_usage(session: Session, view: dict, shards: int) -> dict:
+    """
+    A state view of the account's own stream with the period's usage on its `shards`
+    usage sub-streams added in; `stream_version` becomes the account version (its stream
+    version plus the shard heads).
+    """
+    if not shards:
+        return view
+    usage = read_shard_usage(session, view["account_id"], shards, view["period"])
+    totals = usage.totals()
+    used = dict(view["used"])
+    for meter, units in totals.items():
+        used[meter] = used.get(meter, 0) + units
+    remaining = view["remaining"]
+    if remaining is not None:
+        remaining = {m: max(0, left - totals.get(m, 0)) for m, left in remaining.items()}
+    return {
+        **view,
+        "used": used,
+        "remaining": remaining,
+        "stream_version": view["stream_version"] + usage.version,
+        "usage_shards": shards,
+    }
+
+
+def cacheable(view: dict) -> bool:
+    # Lifecycle appends invalidate with the account's own stream version, which is below
+    # the account version of a sharded view: such views are never cached.
+    return "usage_shards" not in view
+
+
+def check_account_id(account_id: str) -> None:
+    if SHARD_INFIX in account_id:
+        raise InvariantViolation(f"Account ids cannot contain '{SHARD_INFIX}'")
+
+
+def replay_view(
+    account_id: str, state: AccountQuotaState, version: int, plan: Plan | None = None
+) -> dict:
+    if not state.exists:
+        raise NotFound("Account does not exist")
+
+    return {
+        "account_id": account_id,
+        "exists": True,
+        "status": state.status,
+        "plan_id": state.plan_id,
+        "period": state.period,
+        "used": state.used or {},
+        "remaining": remaining_quota(state, plan),
+        "stream_version": version,
+        "source": "replay",
+    }
+
+
+def as_of_view(account_id: str, state: AccountQuotaState, version: int, as_of: AsOf) -> dict:
+    if not state.exists:
+        raise NotFound(f"Account did not exist as of {as_of_param(as_of)}")
+    if state.usage_shards:
+        # The state folds the account's own stream only; its usage sub-streams have no
+        # version in common with it to stop at.
+        raise NotSupported(
+            f"as_of is not supported for accounts in sharded mode "
+            f"(sharded as of {as_of_param(as_of)})"
+        )
+    # Plan limits are not versioned, so `remaining` is not reported for past states.
+    view = replay_view(account_id, state, version)
+    view["source"] = "as_of"
+    view["as_of"] = as_of_param(as_of)
+    return view
+
+
+def as_of_param(as_of: AsOf) -> str | int:
+    return as_of if isinstance(as_of, int) else _utc_iso(as_of)
+
+
+def usage_view(
+    session: Session, store: SqlAlchemyEventStore, account_id: str, query: RollupQuery
+) -> dict:
+    """Usage per bucket and meter from the rollups; buckets without usage are omitted."""
+    rows = read_rollups(session, account_id, query)
+    if not rows and store.head_version(session, account_id) == 0:
+        raise NotFound("Account does not exist")
+    return {
+        "account_id": account_id,
+        "granularity": query.granularity,
+        "from": _utc_iso(query.start),
+        "to": _utc_iso(query.end),
+        "buckets": [
             {
-                "type": e.event_type,
-                "schema_version": e.schema_version,
-                "occurred_at": e.occurred_at.isoformat()
-                if hasattr(e.occurred_at, "isoformat")
-                else str(e.occurred_at),
-                "idempotency_key": e.idempotency_key,
-                "payload": e.payload,
+                "start": _utc_iso(r.bucket_start),
+                "meter": r.meter,
+                "units": r.units,
+                "events": r.events,
             }
-            for e in events
-        ]
+            for r in rows
+        ],
+    }
+
+
+def _utc_iso(ts) -> str:
+    # SQLite hands timestamps back naive; they are stored in UTC.
+    ts = ts.astimezone(UTC) if ts.tzinfo is not None else ts.replace(tzinfo=UTC)
+    return ts.isoformat().replace("+00:00", "Z")
+
+
+def event_view(r: RecordedEvent) -> dict:
+    e = r.envelope
+    return {
+        "stream_version": r.stream_version,
+        "type": e.event_type,
+        "schema_version": e.schema_version,
+        "occurred_at": e.occurred_at.isoformat()
+        if hasattr(e.occurred_at, "isoformat")
+        else str(e.occurred_at),
+        "idempotency_key": e.idempotency_key,
+        "payload": e.payload,
+    }
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.domain.commands import (
+    ChangePlan,
+    CreateAccount,
+    RecordUsage,
+    ReinstateAccount,
+    ResetPeriod,
+    ShardUsage,
+    SuspendAccount,
+)
+from app.domain.errors import ConcurrencyConflict
+from app.domain.types import AccountQuotaState
+from app.infra.event_store.async_repository import AsyncSqlAlchemyEventStore
+from app.infra.event_store.repository import (
+    EventQuery,
+    IdempotencyCollision,
+    integrity_conflict,
+)
+from app.infra.projections.usage_rollups import RollupQuery
+from app.infra.snapshots.store import SqlAlchemySnapshotStore
+from app.services.account_service import (
+    as_of_view,
+    cacheable,
+    check_account_id,
+    event_view,
+    fresh_projection,
+    projection_view,
+    replay_view,
+    usage_view,
+    with_shard_usage,
+)
+from app.services.group_commit import UsageGroupCommitter, get_group_committer
+from app.services.point_in_time import AsOf, states_as_of
+from app.services.stream_locks import get_async_stream_locks
+from app.services.unit_of_work import CommandExecutor
+from app.settings import get_settings
+
+
+class AsyncAccountService:
+    """
+    asyncio twin of AccountService. Commands follow the same unit of work as
+    CommandExecutor (hydrate, decide, append, commit on one AsyncSession) and reuse its
+    logic via run_sync, so the two paths cannot drift apart.
+    """
+
+    def __init__(
+        self,
+        store: AsyncSqlAlchemyEventStore,
+        snapshots: SqlAlchemySnapshotStore | None = None,
+        snapshot_every: int | None = None,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+        group_commit: UsageGroupCommitter | None = None,
+    ) -> None:
+        self.store = store
+        self.executor = CommandExecutor(
+            store.sync, snapshots=snapshots, snapshot_every=snapshot_every
+        )
+        self.snapshots = self.executor.snapshots
+        self.session_factory = session_factory or store.session_factory
+        self.group_commit = group_commit if group_commit is not None else get_group_committer()
+        self.stream_locks = get_async_stream_locks() if get_settings().serialize_streams else None
+
+    async def _maybe_snapshot(
+        self, stream_id: str, state: AccountQuotaState, version: int, replayed: int
+    ) -> None:
+        if not (self.executor.snapshot_every and state.exists):
+            return
+        if replayed < self.executor.snapshot_every:
+            return
+        async with self.session_factory() as session:
+            await session.run_sync(
+                lambda s: self.snapshots.save(stream_id, version, state, session=s)
+            )
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Another writer already snapshotted this version; snapshots are best-effort.
+                await session.rollback()
+
+    async def _hydrate(self, account_id: str) -> tuple[AccountQuotaState, int]:
+        async with self.session_factory() as session:
+            state, version, replayed = await session.run_sync(self.executor._hydrate, account_id)
+        await self._maybe_snapshot(account_id, state, version, replayed)
+        return state, version
+
+    async def _execute(self, account_id: str, cmd, *, require_exists: bool = True) -> int:
+        cached = self.store.sync.cached_result(account_id, getattr(cmd, "idempotency_key", None))
+        if cached is not None:
+            return cached
+
+        async with AsyncExitStack() as stack:
+            if self.stream_locks is not None:
+                with self.store.sync.metrics.stage("stream_lock"):
+                    await stack.enter_async_context(
+                        self.stream_locks.hold(self.executor.lock_key(account_id, cmd))
+                    )
+            return await self._execute_with_retry(account_id, cmd, require_exists)
+
+    async def _execute_with_retry(self, account_id: str, cmd, require_exists: bool) -> int:
+        """CommandExecutor._execute_with_retry, sleeping on the event loop."""
+        retry, metrics = self.executor.retry, self.store.sync.metrics
+        seen: list[tuple[AccountQuotaState, int, int]] = []
+        attempt = 0
+        while True:
+            try:
+                return await self._execute_once(account_id, cmd, require_exists, seen)
+            except IdempotencyCollision:
+                if attempt >= retry.attempts:
+                    raise
+            except ConcurrencyConflict:
+                if attempt >= retry.attempts:
+                    metrics.conflicts_exhausted.inc()
+                    raise
+                await asyncio.sleep(retry.delay(attempt))
+            attempt += 1
+            metrics.conflict_retries.inc()
+
+    async def _execute_once(
+        self,
+        account_id: str,
+        cmd,
+        require_exists: bool,
+        seen: list[tuple[AccountQuotaState, int, int]],
+    ) -> int:
+        hydrated: tuple[AccountQuotaState, int, int] | None = None
+        base = seen[-1][:2] if seen else None
+        try:
+            async with self.session_factory() as session:
+                hydrated = await session.run_sync(self.executor._hydrate, account_id, base)
+                seen.append(hydrated)
+                new_version = await session.run_sync(
+                    self.executor._decide_and_append, hydrated, account_id, cmd, require_exists
+                )
+                try:
+                    await session.commit()
+                except IntegrityError as exc:
+                    await session.rollback()
+                    raise integrity_conflict() from exc
+        finally:
+            if hydrated is not None:
+                await self._maybe_snapshot(account_id, *hydrated)
+
+        return new_version
+
+    async def create_account(self, cmd: CreateAccount) -> int:
+        check_account_id(cmd.account_id)
+        return await self._execute(cmd.account_id, cmd, require_exists=False)
+
+    async def record_usage(self, cmd: RecordUsage) -> int:
+        if self.group_commit is not None:
+            return await asyncio.wrap_future(self.group_commit.enqueue(cmd))
+        return await self._execute(cmd.account_id, cmd)
+
+    async def change_plan(self, cmd: ChangePlan) -> int:
+        return await self._execute(cmd.account_id, cmd)
+
+    async def reset_period(self, cmd: ResetPeriod) -> int:
+        return await self._execute(cmd.account_id, cmd)
+
+    async def suspend_account(self, cmd: SuspendAccount) -> int:
+        return await self._execute(cmd.account_id, cmd)
+
+    async def reinstate_account(self, cmd: ReinstateAccount) -> int:
+        return await self._execute(cmd.account_id, cmd)
+
+    async def shard_usage(self, cmd: ShardUsage) -> int:
+        return await self._execute(cmd.account_id, cmd)
+
+    async def get_state(self, account_id: str, max_lag: int | None = None) -> dict:
+        # An explicit staleness bound is answered from the database.
+        state_cache = self.store.sync.state_cache
+        if max_lag is None:
+            cached = state_cache.get(account_id)
+            if cached is not None:
+                return cached
+        with self.store.sync.metrics.stage("read_state"):
+            view = await self._load_state(account_id, max_lag)
+        if cacheable(view):
+            state_cache.put(account_id, view["stream_version"], view)
+        return view
+
+    async def _load_state(self, account_id: str, max_lag: int | None) -> dict:
+        # Prefer projection
+        async with self.session_factory() as session:
+            proj = await session.run_sync(fresh_projection, self.store.sync, account_id, max_lag)
+            if proj is not None:
+                plan = await session.run_sync(
+                    lambda s: self.executor.plans.get(proj.plan_id, session=s)
+                )
+                return await session.run_sync(
+                    with_shard_usage, projection_view(account_id, proj, plan), proj.usage_shards
+                )
+
+        # Fallback to replay (from the latest snapshot when there is one)
+        state, version = await self._hydrate(account_id)
+        async with self.session_factory() as session:
+            # Connects only if the catalog is due for a reload.
+            plan = await session.run_sync(
+                lambda s: self.executor.plans.get(state.plan_id, session=s)
+            )
+            view = replay_view(account_id, state, version, plan)
+            return await session.run_sync(with_shard_usage, view, state.usage_shards)
+
+    async def get_state_as_of(self, account_id: str, as_of: AsOf) -> dict:
+        async with self.session_factory() as session:
+            states = await session.run_sync(states_as_of, self.snapshots, [account_id], as_of)
+        state, version = states[account_id]
+        return as_of_view(account_id, state, version, as_of)
+
+    async def list_events(self, account_id: str, query: EventQuery | None = None) -> list[dict]:
+        records = await self.store.read_page(account_id, query or EventQuery())
+        return [event_view(r) for r in records]
+
+    async def events_page(self, account_id: str, query: EventQuery) -> dict:
+        """One keyset page; pass `next_after` back as `after` for the next one."""
+        events = await self.list_events(account_id, query)
+        full = query.limit is not None and len(events) == query.limit
+        return {
+            "account_id": account_id,
+            "events": events,
+            "next_after": events[-1]["stream_version"] if full else None,
+        }
+
+    async def stream_events(self, account_id: str, query: EventQuery) -> AsyncIterator[dict]:
+        """All matching events, read lazily through a server-side cursor."""
+        async for r in self.store.iter_events(account_id, query):
+            yield event_view(r)
+
+    async def usage_over_time(self, account_id: str, query: RollupQuery) -> dict:
+        async with self.session_factory() as session:
+            return await session.run_sync(usage_view, self.store.sync, account_id, query)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from app.domain.commands import RecordUsage
+from app.domain.errors import ConcurrencyConflict, DomainError, InvariantViolation, NotFound
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.services.unit_of_work import CommandExecutor, UsageResult
+from app.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+_ERRORS: dict[str, type[DomainError]] = {
+    cls.__name__: cls for cls in (NotFound, InvariantViolation, ConcurrencyConflict)
+}
+
+
+def _resolve(fut: Future[int], result: UsageResult) -> None:
+    if result.status == "rejected":
+        error_cls = _ERRORS.get(result.error_type or "", DomainError)
+        fut.set_exception(error_cls(result.error or "Usage rejected"))
+    else:
+        assert result.stream_version is not None
+        fut.set_result(result.stream_version)
+
+
+class UsageGroupCommitter:
+    """
+    Group commit for RecordUsage. Commands submitted from any thread are queued; a single
+    flusher thread takes whatever arrived within `window_ms` of the first queued command
+    (or `max_batch` commands, whichever comes first) and commits them in one
+    CommandExecutor.record_usage_batch transaction: each stream hydrated once, commands
+    decided in arrival order.
+
+    Every caller still gets its own stream_version or domain error. Added latency is at
+    most `window_ms` plus the batch's commit while the flusher keeps up; a hot account
+    commits up to `max_batch` usage events per transaction instead of one.
+
+    A future cancelled while queued (the async caller went away) is dropped from its
+    batch, uncommitted; one the flusher has claimed can no longer be cancelled.
+
+    Usage of accounts known to be in sharded mode skips the queue: it gains nothing from
+    batching (each command takes its own shard transaction) and runs on one of
+    `shard_workers` threads instead, so it never holds up the flusher. Only the first such
+    command of an account after the process starts (or the account is sharded) still goes
+    through a batch, which is where the executor learns the account is sharded.
+    """
+
+    def __init__(
+        self,
+        executor: CommandExecutor,
+        window_ms: float = 2.0,
+        max_batch: int = 256,
+        shard_workers: int = 8,
+    ) -> None:
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.batches_committed = 0
+        self.commands_committed = 0
+
+        self._cond = threading.Condition()
+        self._queue: list[tuple[RecordUsage, Future[int]]] = []
+        self._thread: threading.Thread | None = None
+        self._shard_pool = ThreadPoolExecutor(
+            max_workers=shard_workers, thread_name_prefix="usage-shards"
+        )
+
+    def enqueue(self, cmd: RecordUsage) -> Future[int]:
+        fut: Future[int] = Future()
+        # Retries of committed commands skip the queue (and its window) entirely.
+        cached = self.executor.store.cached_result(cmd.account_id, cmd.idempotency_key)
+        if cached is not None:
+            fut.set_result(cached)
+            return fut
+        if self.executor.is_sharded(cmd.account_id):
+            return self._shard_pool.submit(self.executor.execute, cmd.account_id, cmd)
+
+        with self._cond:
+            self._queue.append((cmd, fut))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="usage-group-commit", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+        return fut
+
+    def submit(self, cmd: RecordUsage) -> int:
+        """Blocking enqueue; returns the stream version or raises the command's error."""
+        return self.enqueue(cmd).result()
+
+    def _take_batch(self) -> list[tuple[RecordUsage, Future[int]]]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[: self.max_batch]
+            del self._queue[: self.max_batch]
+        return [(cmd, fut) for cmd, fut in batch if fut.set_running_or_notify_cancel()]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self._commit(batch)
+            except Exception as exc:  # keep the flusher alive for the batches after this one
+                log.exception("group commit batch failed")
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+
+    def _commit(self, batch: list[tuple[RecordUsage, Future[int]]]) -> None:
+        try:
+            results = self.executor.record_usage_batch([cmd for cmd, _ in batch])
+        except Exception as exc:  # the whole transaction failed; every caller sees it
+            for _, fut in batch:
+                fut.set_exception(exc)
+            return
+
+        self.batches_committed += 1
+        self.commands_committed += len(batch)
+        for (_, fut), result in zip(batch, results, strict=True):
+            _resolve(fut, result)
+
+
+@lru_cache
+def get_group_committer() -> UsageGroupCommitter | None:
+    """Process-wide committer when GROUP_COMMIT_WINDOW_MS > 0, else None (disabled)."""
+    settings = get_settings()
+    if settings.group_commit_window_ms <= 0:
+        return None
+    return UsageGroupCommitter(
+        CommandExecutor(SqlAlchemyEventStore()),
+        window_ms=settings.group_commit_window_ms,
+        max_batch=settings.group_commit_max_batch,
+    )
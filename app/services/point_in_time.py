@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.domain.fold import StateFold
+from app.domain.types import AccountQuotaState
+from app.infra.event_store.archive import decode_segment, read_archived_many
+from app.infra.event_store.models import Event, EventSegment, Stream
+from app.infra.event_store.repository import _to_envelope
+from app.infra.snapshots.store import SqlAlchemySnapshotStore
+
+# A stream version, or a timestamp resolved to the version of the stream's latest event
+# recorded at or before it. Timestamps follow commit order (recorded_at), not occurred_at:
+# a backdated event lands after everything already committed, so a state read as of an
+# earlier instant never includes it.
+AsOf = int | datetime
+
+
+def versions_as_of(session: Session, stream_ids: list[str], as_of: AsOf) -> dict[str, int]:
+    """The stream version `as_of` refers to, per existing stream (capped at the head)."""
+    return {sid: v for sid, (v, _) in _versions_as_of(session, stream_ids, as_of).items()}
+
+
+def _versions_as_of(
+    session: Session, stream_ids: list[str], as_of: AsOf
+) -> dict[str, tuple[int, int]]:
+    """(version as of `as_of`, archived_through) per existing stream."""
+    if not isinstance(as_of, datetime):
+        rows = session.execute(
+            select(Stream.stream_id, Stream.version, Stream.archived_through).where(
+                Stream.stream_id.in_(stream_ids)
+            )
+        )
+        return {sid: (min(as_of, head), archived) for sid, head, archived in rows}
+
+    at = as_of.astimezone(UTC) if as_of.tzinfo is not None else as_of.replace(tzinfo=UTC)
+    # One index probe on (stream_id, recorded_at) per stream.
+    version = (
+        select(Event.stream_version)
+        .where(Event.stream_id == Stream.stream_id, Event.recorded_at <= at)
+        .order_by(Event.recorded_at.desc(), Event.stream_version.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    rows = session.execute(
+        select(Stream.stream_id, version, Stream.archived_through).where(
+            Stream.stream_id.in_(stream_ids)
+        )
+    )
+    out = {sid: (v or 0, archived) for sid, v, archived in rows}
+    # Earlier than every event still in the events table: look in the archive.
+    in_archive = [sid for sid, (v, archived) in out.items() if not v and archived]
+    if in_archive:
+        for sid, v in _archived_versions_at(session, in_archive, at).items():
+            out[sid] = (v, out[sid][1])
+    return out
+
+
+def _archived_versions_at(session: Session, stream_ids: list[str], at: datetime) -> dict[str, int]:
+    # Segments older than recorded_at have no min_recorded_at; their first event's
+    # occurred_at is a lower bound for it.
+    starts = func.coalesce(EventSegment.min_recorded_at, EventSegment.min_occurred_at)
+    candidates = session.execute(
+        select(EventSegment.stream_id, EventSegment.first_version)
+        .where(EventSegment.stream_id.in_(stream_ids), starts <= at)
+        .order_by(EventSegment.stream_id, EventSegment.first_version.desc())
+    )
+    firsts: dict[str, list[int]] = {}
+    for sid, first in candidates:
+        firsts.setdefault(sid, []).append(first)
+    # Newest candidate first; usually only the first one decoded holds the answer.
+    out: dict[str, int] = {}
+    for sid, versions in firsts.items():
+        for first in versions:
+            data = session.execute(
+                select(EventSegment.data).where(
+                    EventSegment.stream_id == sid, EventSegment.first_version == first
+                )
+            ).scalar_one()
+            recorded = [
+                e.stream_version
+                for e in decode_segment(data)
+                if datetime.fromisoformat(e.recorded_at) <= at
+            ]
+            if recorded:
+                out[sid] = max(recorded)
+                break
+    return out
+
+
+def states_as_of(
+    session: Session,
+    snapshots: SqlAlchemySnapshotStore,
+    stream_ids: list[str],
+    as_of: AsOf,
+    chunk_size: int = 500,
+) -> dict[str, tuple[AccountQuotaState, int]]:
+    """
+    (state, stream_version) of each stream as of `as_of`: the nearest snapshot at or below
+    the resolved version plus the events between the two. Four queries per `chunk_size`
+    streams whatever their length (plus one for archived ranges, when any). Unknown streams come back empty at version 0.
+    """
+    out: dict[str, tuple[AccountQuotaState, int]] = {}
+    for i in range(0, len(stream_ids), chunk_size):
+        out.update(_states_as_of(session, snapshots, stream_ids[i : i + chunk_size], as_of))
+    return out
+
+
+def _states_as_of(
+    session: Session, snapshots: SqlAlchemySnapshotStore, stream_ids: list[str], as_of: AsOf
+) -> dict[str, tuple[AccountQuotaState, int]]:
+    resolved = _versions_as_of(session, stream_ids, as_of)
+    versions = {sid: v for sid, (v, _) in resolved.items()}
+    wanted = {sid: v for sid, v in versions.items() if v > 0}
+    base = snapshots.load_at_or_before_many(session, wanted)
+
+    folding = {sid: StateFold(base[sid].state if sid in base else None) for sid in stream_ids}
+    after = {sid: base[sid].stream_version if sid in base else 0 for sid in wanted}
+    # Below the archive boundary the events come from segments, above it from the table.
+    archived = {
+        sid: (after[sid], min(v, resolved[sid][1]))
+        for sid, v in wanted.items()
+        if after[sid] < resolved[sid][1]
+    }
+    for sid, events in read_archived_many(session, archived).items():
+        folding[sid].apply_all(e.envelope for e in events)
+    ranges = [
+        and_(
+            Event.stream_id == sid,
+            Event.stream_version > max(after[sid], resolved[sid][1]),
+            Event.stream_version <= v,
+        )
+        for sid, v in wanted.items()
+        if max(after[sid], resolved[sid][1]) < v
+    ]
+    if ranges:
+        rows = session.execute(
+            select(Event).where(or_(*ranges)).order_by(Event.stream_id, Event.stream_version)
+        ).scalars()
+        for row in rows:
+            folding[row.stream_id].apply(_to_envelope(row))
+
+    return {sid: (acc.freeze(), versions.get(sid, 0)) for sid, acc in folding.items()}
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import AsyncIterator, Iterator
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from functools import lru_cache
+
+
+class KeyedLocks:
+    """
+    One lock per key (stream id), created on first use and dropped when its last holder
+    or waiter leaves, so memory stays bounded by the streams in flight. Commands on the
+    same stream inside this process run one at a time instead of racing to the
+    conditional head UPDATE; commands on different streams never wait for each other.
+    """
+
+    def __init__(self) -> None:
+        self._mutex = threading.Lock()
+        # key -> [lock, holders + waiters]
+        self._locks: dict[str, list] = {}
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        with self._mutex:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._mutex:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    @contextmanager
+    def hold_many(self, keys: list[str]) -> Iterator[None]:
+        """Hold the locks of several keys, taken in sorted order so two callers cannot deadlock."""
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                stack.enter_context(self.hold(key))
+            yield
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class AsyncKeyedLocks:
+    """KeyedLocks for coroutines on one event loop (IO_MODE=async)."""
+
+    def __init__(self) -> None:
+        self._locks: dict[str, list] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+@lru_cache
+def get_stream_locks() -> KeyedLocks:
+    return KeyedLocks()
+
+
+@lru_cache
+def get_async_stream_locks() -> AsyncKeyedLocks:
+    return AsyncKeyedLocks()
@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, replace
+from typing import Literal
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.domain.aggregate import apply_event, decide, shard_allowance
+from app.domain.commands import RecordUsage
+from app.domain.errors import ConcurrencyConflict, InvariantViolation, NotFound
+from app.domain.events import EventEnvelope
+from app.domain.fold import fold
+from app.domain.types import AccountQuotaState
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.pushdown import pushdown_state
+from app.infra.event_store.repository import (
+    IdempotencyCollision,
+    SqlAlchemyEventStore,
+    integrity_conflict,
+)
+from app.infra.event_store.usage_shards import (
+    pick_shard,
+    probe_order,
+    read_shard_usage,
+    shard_stream_id,
+)
+from app.infra.plans.catalog import PlanCatalog, get_plan_catalog
+from app.infra.snapshots.store import SqlAlchemySnapshotStore
+from app.services.stream_locks import KeyedLocks, get_stream_locks
+from app.settings import get_settings
+
+_ROUND_TRIPS_KEY = "quota_ledger.round_trips"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_round_trip(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = conn.info.get(_ROUND_TRIPS_KEY)
+    if counter is not None:
+        counter[0] += 1
+
+
+class RoundTripBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class UsageResult:
+    status: Literal["accepted", "duplicate", "rejected"]
+    stream_version: int | None = None
+    error: str | None = None
+    # Domain error class name for rejections ("NotFound", "InvariantViolation", ...).
+    error_type: str | None = None
+
+
+@dataclass(frozen=True)
+class ConflictRetry:
+    """How often, and after how long, a command that lost the race is re-run."""
+
+    attempts: int = 3
+    base_ms: float = 5.0
+    max_ms: float = 100.0
+
+    @classmethod
+    def from_settings(cls) -> ConflictRetry:
+        s = get_settings()
+        return cls(s.conflict_retries, s.conflict_backoff_ms, s.conflict_backoff_max_ms)
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before re-run `attempt` (from 0): full jitter, so racers spread out."""
+        return random.uniform(0, min(self.max_ms, self.base_ms * 2**attempt)) / 1000
+
+
+def _lost_race(result: UsageResult | None) -> bool:
+    return result is not None and result.error_type == ConcurrencyConflict.__name__
+
+
+class CommandExecutor:
+    """
+    Runs a command as a single unit of work: hydrate (snapshot + tail), decide, append and
+    commit on one session, i.e. one pool checkout and one transaction.
+
+    Round trips are the statements executed on that connection plus the final COMMIT. When
+    `max_round_trips` is set, a command that would exceed it is rolled back with
+    RoundTripBudgetExceeded instead of committing. The count of the last command executed on
+    the current thread is available as `last_round_trips`.
+
+    Commands on one stream are serialized within the process by `stream_locks`. A command
+    that still loses the race to another process (ConcurrencyConflict) is re-run per
+    `retry`: the state it saw is brought up to date with the events appended since, and
+    the command decided again against it.
+
+    Usage of an account in sharded mode goes to one of its usage sub-streams instead of
+    its own stream (see app.infra.event_store.usage_shards).
+    """
+
+    def __init__(
+        self,
+        store: SqlAlchemyEventStore,
+        snapshots: SqlAlchemySnapshotStore | None = None,
+        snapshot_every: int | None = None,
+        max_round_trips: int | None = None,
+        session_factory: sessionmaker[Session] = SessionLocal,
+        plans: PlanCatalog | None = None,
+        hydration_mode: Literal["fold", "pushdown"] | None = None,
+        retry: ConflictRetry | None = None,
+        stream_locks: KeyedLocks | None = None,
+    ) -> None:
+        self.store = store
+        self.plans = plans if plans is not None else get_plan_catalog()
+        self.snapshots = snapshots if snapshots is not None else SqlAlchemySnapshotStore()
+        self.snapshot_every = (
+            get_settings().snapshot_every if snapshot_every is None else snapshot_every
+        )
+        self.max_round_trips = (
+            get_settings().max_round_trips if max_round_trips is None else max_round_trips
+        )
+        self.session_factory = session_factory
+        self.hydration_mode = hydration_mode or get_settings().hydration_mode
+        self.metrics = store.metrics
+        self.retry = retry if retry is not None else ConflictRetry.from_settings()
+        self.stream_locks = (
+            stream_locks
+            if stream_locks is not None
+            else get_stream_locks()
+            if get_settings().serialize_streams
+            else None
+        )
+        self._local = threading.local()
+        # account_id -> usage shards, as last hydrated; only picks in-process lock keys.
+        self._usage_shards: dict[str, int] = {}
+
+    @property
+    def last_round_trips(self) -> int | None:
+        return getattr(self._local, "round_trips", None)
+
+    def _hydrate(
+        self,
+        session: Session,
+        stream_id: str,
+        base: tuple[AccountQuotaState, int] | None = None,
+    ) -> tuple[AccountQuotaState, int, int]:
+        """
+        Rebuild state from the latest snapshot (or `base`, a state already known at some
+        version) plus the events appended after it, or, in pushdown mode, with
+        pushdown_state. Returns (state, stream_version, number of events replayed); pushdown
+        replays none, so it never triggers a snapshot.
+        """
+        metrics = self.metrics
+        if self.hydration_mode == "pushdown":
+            with metrics.stage("pushdown"):
+                state, version = pushdown_state(session, stream_id)
+            return state, version, 0
+
+        with metrics.stage("load_stream"):
+            snapshot = (
+                self.snapshots.load_latest(stream_id, session=session)
+                if self.snapshot_every and base is None
+                else None
+            )
+            if base is not None:
+                state, base_version = base
+            elif snapshot is None:
+                state, base_version = AccountQuotaState(), 0
+            else:
+                state, base_version = snapshot.state, snapshot.stream_version
+            tail = self.store.load_stream_since(stream_id, base_version, session=session)
+
+        with metrics.stage("fold"):
+            state = fold(tail, state)
+        metrics.replay_events.observe(len(tail))
+        return state, base_version + len(tail), len(tail)
+
+    def _maybe_snapshot(
+        self, stream_id: str, state: AccountQuotaState, version: int, replayed: int
+    ) -> None:
+        # Snapshot what we just folded (it is exactly the committed state at `version`) once
+        # the replayed tail gets long enough. Written in its own transaction, after the
+        # command's, so a duplicate snapshot can never fail the command.
+        if self.snapshot_every and state.exists and replayed >= self.snapshot_every:
+            self.snapshots.save(stream_id, version, state)
+
+    def load(self, stream_id: str) -> tuple[AccountQuotaState, int]:
+        with self.session_factory() as session:
+            state, version, replayed = self._hydrate(session, stream_id)
+        self._maybe_snapshot(stream_id, state, version, replayed)
+        return state, version
+
+    @contextmanager
+    def _round_trips(self, session: Session) -> Iterator[list[int]]:
+        counter = [0]
+        # Connection-record info outlives the Connection object closed by commit().
+        with self.metrics.stage("pool_checkout"):
+            conn_info = session.connection().info
+        conn_info[_ROUND_TRIPS_KEY] = counter
+        try:
+            yield counter
+        finally:
+            conn_info.pop(_ROUND_TRIPS_KEY, None)
+            self._local.round_trips = counter[0]
+
+    def _check_budget(self, counter: list[int], stream_id: str) -> None:
+        # +1 for the COMMIT still to come.
+        if self.max_round_trips is not None and counter[0] + 1 > self.max_round_trips:
+            raise RoundTripBudgetExceeded(
+                f"Command on stream '{stream_id}' needs {counter[0] + 1} round trips, "
+                f"budget is {self.max_round_trips}"
+            )
+
+    def _commit(self, session: Session, counter: list[int]) -> None:
+        try:
+            with self.metrics.stage("commit"):
+                session.commit()
+        except IntegrityError as exc:
+            session.rollback()
+            self.metrics.conflicts.inc()
+            raise integrity_conflict() from exc
+        counter[0] += 1
+
+    def _decide_and_append(
+        self,
+        session: Session,
+        hydrated: tuple[AccountQuotaState, int, int],
+        stream_id: str,
+        cmd,
+        require_exists: bool,
+    ) -> int:
+        state, version, _ = hydrated
+
+        if require_exists and not state.exists:
+            raise NotFound("Account does not exist")
+
+        if isinstance(cmd, RecordUsage) and state.usage_shards:
+            return self._append_sharded(session, state, version, stream_id, cmd)
+
+        with self.metrics.stage("decide"):
+            new_events = decide(state, cmd, self.plans.get(state.plan_id, session=session))
+        return self.store.append(
+            stream_id=stream_id,
+            expected_version=version,
+            events=new_events,
+            session=session,
+        )
+
+    def _append_sharded(
+        self,
+        session: Session,
+        state: AccountQuotaState,
+        version: int,
+        account_id: str,
+        cmd: RecordUsage,
+    ) -> int:
+        """
+        Record usage of a sharded account on its home shard, or on the next shard whose
+        share of the limits has room for it. Usage that fits the account's limits but no
+        single share (more than a share, or shares nearly used up) goes to the account's
+        own stream instead, decided against the shards' totals. Returns the account
+        version it produced.
+        """
+        shards = state.usage_shards
+        self._usage_shards[account_id] = shards
+        replayed = self.store.find_shard_idempotent(
+            session, account_id, shards, cmd.idempotency_key
+        )
+        if replayed is not None:
+            return replayed
+
+        with self.metrics.stage("load_stream"):
+            usage = read_shard_usage(session, account_id, shards, state.period)
+        with self.metrics.stage("decide"):
+            # Existence, status and units are checked against the account; the limit
+            # against each shard's share of it.
+            new_events = decide(state, cmd)
+            plan = self.plans.get(state.plan_id, session=session)
+            limit = plan.limits.get(cmd.meter) if plan is not None else None
+            main_used = int((state.used or {}).get(cmd.meter, 0))
+            shard = None
+            for k in probe_order(pick_shard(cmd.idempotency_key, shards), shards):
+                allowance = shard_allowance(limit, main_used, shards, k)
+                used = usage.used.get(k, {}).get(cmd.meter, 0)
+                if allowance is None or used + cmd.units <= allowance:
+                    shard = k
+                    break
+            if shard is None:
+                # Raises InvariantViolation when the account as a whole has no room left.
+                used = dict(state.used or {})
+                for meter, units in usage.totals().items():
+                    used[meter] = used.get(meter, 0) + units
+                new_events = decide(replace(state, used=used), cmd, plan)
+
+        if shard is None:
+            return self.store.append_unsharded_usage(
+                session,
+                account_id,
+                version,
+                new_events,
+                shards=shards,
+                shard_version=usage.version,
+                account_version=version + usage.version + len(new_events),
+            )
+        return self.store.append_shard_usage(
+            session,
+            account_id,
+            shard,
+            usage.heads.get(shard, 0),
+            new_events,
+            period=state.period,
+            main_version=version,
+            account_version=version + usage.version + len(new_events),
+        )
+
+    def is_sharded(self, account_id: str) -> bool:
+        """Whether the account was in sharded mode when last hydrated here (a hint)."""
+        return bool(self._usage_shards.get(account_id))
+
+    def lock_key(self, stream_id: str, cmd) -> str:
+        """
+        In-process lock a command takes: usage of an account known to be sharded only
+        waits for usage bound to the same shard. A stale guess costs contention, not
+        correctness (the database checks every head).
+        """
+        shards = self._usage_shards.get(stream_id) if isinstance(cmd, RecordUsage) else None
+        if not shards:
+            return stream_id
+        return shard_stream_id(stream_id, pick_shard(cmd.idempotency_key, shards))
+
+    def execute(self, stream_id: str, cmd, *, require_exists: bool = True) -> int:
+        # A retry of an already committed command is answered from memory.
+        cached = self.store.cached_result(stream_id, getattr(cmd, "idempotency_key", None))
+        if cached is not None:
+            return cached
+
+        with ExitStack() as stack:
+            if self.stream_locks is not None:
+                with self.metrics.stage("stream_lock"):
+                    stack.enter_context(self.stream_locks.hold(self.lock_key(stream_id, cmd)))
+            return self._execute_with_retry(stream_id, cmd, require_exists)
+
+    def _execute_with_retry(self, stream_id: str, cmd, require_exists: bool) -> int:
+        seen: list[tuple[AccountQuotaState, int, int]] = []
+        attempt = 0
+        while True:
+            try:
+                return self._execute_once(stream_id, cmd, require_exists, seen)
+            except IdempotencyCollision:
+                # The key turned out to be recorded: the re-run replays it, no need to wait.
+                if attempt >= self.retry.attempts:
+                    raise
+            except ConcurrencyConflict:
+                if attempt >= self.retry.attempts:
+                    self.metrics.conflicts_exhausted.inc()
+                    raise
+                time.sleep(self.retry.delay(attempt))
+            attempt += 1
+            self.metrics.conflict_retries.inc()
+
+    def _execute_once(
+        self,
+        stream_id: str,
+        cmd,
+        require_exists: bool,
+        seen: list[tuple[AccountQuotaState, int, int]] | None = None,
+    ) -> int:
+        """One attempt. `seen` carries the states hydrated by earlier attempts."""
+        hydrated: tuple[AccountQuotaState, int, int] | None = None
+        base = seen[-1][:2] if seen else None
+        try:
+            with self.session_factory() as session, self._round_trips(session) as counter:
+                hydrated = self._hydrate(session, stream_id, base)
+                if seen is not None:
+                    seen.append(hydrated)
+                new_version = self._decide_and_append(
+                    session, hydrated, stream_id, cmd, require_exists
+                )
+                self._check_budget(counter, stream_id)
+                self._commit(session, counter)
+        finally:
+            if hydrated is not None:
+                state, version, replayed = hydrated
+                self._maybe_snapshot(stream_id, state, version, replayed)
+
+        return new_version
+
+    def _hydrate_many(
+        self, session: Session, stream_ids: list[str]
+    ) -> dict[str, tuple[AccountQuotaState, int, int]]:
+        """
+        _hydrate for several streams: one snapshot query and one tail query in total.
+        Always folds: batched, this is already two queries for the whole batch.
+        """
+        metrics = self.metrics
+        with metrics.stage("load_stream"):
+            snapshots = (
+                self.snapshots.load_latest_many(session, stream_ids) if self.snapshot_every else {}
+            )
+            base: dict[str, tuple[AccountQuotaState, int]] = {
+                sid: (snapshots[sid].state, snapshots[sid].stream_version)
+                if sid in snapshots
+                else (AccountQuotaState(), 0)
+                for sid in stream_ids
+            }
+            tails = self.store.load_streams_since(session, {sid: v for sid, (_, v) in base.items()})
+
+        out: dict[str, tuple[AccountQuotaState, int, int]] = {}
+        for sid, (state, version) in base.items():
+            tail = tails[sid]
+            metrics.replay_events.observe(len(tail))
+            with metrics.stage("fold"):
+                state = fold(tail, state)
+            out[sid] = (state, version + len(tail), len(tail))
+        return out
+
+    def record_usage_batch(self, cmds: list[RecordUsage]) -> list[UsageResult]:
+        """
+        Decide and append many RecordUsage commands, across any number of accounts, in one
+        transaction. Each touched stream is hydrated once and the commands are decided in
+        order against its running state. Returns one result per command, in input order.
+
+        A stream whose head moved concurrently has its items decided again in a follow-up
+        transaction (per `retry`), then rejected; the rest of the batch still commits.
+        Usage of sharded accounts is recorded one command at a time after the batch.
+        """
+        results: list[UsageResult | None] = [None] * len(cmds)
+        for i, cmd in enumerate(cmds):
+            cached = self.store.cached_result(cmd.account_id, cmd.idempotency_key)
+            if cached is not None:
+                results[i] = UsageResult("duplicate", stream_version=cached)
+
+        todo = [i for i, r in enumerate(results) if r is None]
+        attempt = 0
+        while todo:
+            with ExitStack() as stack:
+                if self.stream_locks is not None:
+                    with self.metrics.stage("stream_lock"):
+                        stack.enter_context(
+                            self.stream_locks.hold_many([cmds[i].account_id for i in todo])
+                        )
+                self._record_usage_batch(cmds, todo, results)
+
+            # Items of streams that moved underneath the batch are decided again.
+            todo = [i for i in todo if _lost_race(results[i])]
+            if not todo:
+                break
+            if attempt >= self.retry.attempts:
+                self.metrics.conflicts_exhausted.inc(len(todo))
+                break
+            self.metrics.conflict_retries.inc(len(todo))
+            time.sleep(self.retry.delay(attempt))
+            attempt += 1
+        return [r for r in results if r is not None]
+
+    def _record_usage_batch(
+        self, cmds: list[RecordUsage], todo: list[int], results: list[UsageResult | None]
+    ) -> None:
+        """Runs the batch transaction for `todo` (item indexes), filling `results` in place."""
+        stream_ids = list(dict.fromkeys(cmds[i].account_id for i in todo))
+        accepted: dict[int, int] = {}  # item index -> assigned stream version
+        first_seen: dict[tuple[str, str], int] = {}  # (stream, key) -> accepted item index
+        echoes: dict[int, int] = {}  # duplicate item index -> item index it repeats
+        sharded: list[int] = []  # items for sharded accounts, run after the batch
+        hydrated: dict[str, tuple[AccountQuotaState, int, int]] = {}
+
+        try:
+            with self.session_factory() as session, self._round_trips(session) as counter:
+                hydrated = self._hydrate_many(session, stream_ids)
+                recorded = self.store.find_idempotent_many(
+                    session, [(cmds[i].account_id, cmds[i].idempotency_key) for i in todo]
+                )
+
+                states = {sid: h[0] for sid, h in hydrated.items()}
+                appends: dict[str, tuple[int, list[EventEnvelope]]] = {
+                    sid: (h[1], []) for sid, h in hydrated.items()
+                }
+
+                with self.metrics.stage("decide"):
+                    for i in todo:
+                        cmd = cmds[i]
+                        sid, pair = cmd.account_id, (cmd.account_id, cmd.idempotency_key)
+                        if pair in recorded:
+                            results[i] = UsageResult("duplicate", stream_version=recorded[pair])
+                            continue
+                        if pair in first_seen:
+                            echoes[i] = first_seen[pair]
+                            continue
+
+                        state = states[sid]
+                        if state.usage_shards:
+                            self._usage_shards[sid] = state.usage_shards
+                            replayed = self.store.find_shard_idempotent(
+                                session, sid, state.usage_shards, cmd.idempotency_key
+                            )
+                            if replayed is not None:
+                                results[i] = UsageResult("duplicate", stream_version=replayed)
+                            else:
+                                sharded.append(i)
+                                first_seen[pair] = i
+                            continue
+                        try:
+                            if not state.exists:
+                                raise NotFound("Account does not exist")
+                            new_events = decide(
+                                state, cmd, self.plans.get(state.plan_id, session=session)
+                            )
+                        except (NotFound, InvariantViolation) as e:
+                            results[i] = UsageResult(
+                                "rejected", error=str(e), error_type=type(e).__name__
+                            )
+                            continue
+
+                        for e in new_events:
+                            state = apply_event(state, e)
+                        states[sid] = state
+                        expected_version, pending = appends[sid]
+                        pending.extend(new_events)
+                        accepted[i] = expected_version + len(pending)
+                        first_seen[pair] = i
+
+                heads = self.store.append_many(
+                    session, {sid: a for sid, a in appends.items() if a[1]}
+                )
+                self._commit(session, counter)
+        finally:
+            for sid, (state, version, replayed) in hydrated.items():
+                self._maybe_snapshot(sid, state, version, replayed)
+
+        for i in sharded:
+            try:
+                version = self._execute_with_retry(cmds[i].account_id, cmds[i], True)
+            except (NotFound, InvariantViolation, ConcurrencyConflict) as e:
+                results[i] = UsageResult("rejected", error=str(e), error_type=type(e).__name__)
+            else:
+                results[i] = UsageResult("accepted", stream_version=version)
+        for i, version in accepted.items():
+            if heads[cmds[i].account_id] is None:
+                results[i] = UsageResult(
+                    "rejected",
+                    error=f"Concurrency conflict for stream '{cmds[i].account_id}'",
+                    error_type=ConcurrencyConflict.__name__,
+                )
+            else:
+                results[i] = UsageResult("accepted", stream_version=version)
+        for i, original in echoes.items():
+            first = results[original]
+            assert first is not None
+            results[i] = (
+                UsageResult("duplicate", stream_version=first.stream_version)
+                if first.status == "accepted"
+                else first
+            )
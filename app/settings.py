@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Literal
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Persist an aggregate snapshot once hydration has to replay this many events
+    # past the latest snapshot. 0 disables snapshotting.
+    snapshot_every: int = 100
+    # Cap on DB round trips (statements + COMMIT) per command; None only measures.
+    max_round_trips: int | None = None
+    # "async" serves the account routes from async handlers on an AsyncEngine.
+    io_mode: Literal["sync", "async"] = "sync"
+    # Group commit for usage writes: coalesce commands arriving within this window
+    # (or up to group_commit_max_batch of them) into one transaction. 0 disables it.
+    group_commit_window_ms: float = 0.0
+    group_commit_max_batch: int = 256
+    # Recently committed (stream_id, idempotency_key) -> version, answered without the DB.
+    idempotency_cache_size: int = 100_000
+    idempotency_cache_ttl_s: float = 3600.0
+    # Bits per stream for the optional Bloom filter in front of the idempotency SELECT.
+    # 0 disables it. When enabled, keys this worker has provably never seen skip the
+    # SELECT; a key recorded elsewhere then costs one rolled-back attempt.
+    idempotency_bloom_bits: int = 0
+    # "inline" updates account_current in the append transaction; "async" leaves it to a
+    # feed-driven projector (see app.infra.projections.runner) off the write path.
+    projection_mode: Literal["inline", "async"] = "inline"
+    # Async mode: how many versions account_current may trail the stream head before a
+    # read falls back to hydrating from the event store. Overridable per request.
+    projection_max_lag: int = 0
+    projector_batch_size: int = 500
+    projector_gap_timeout_s: float = 2.0
+    # How long the in-process plan catalog (limits per meter) is trusted before a reload.
+    plan_cache_ttl_s: float = 60.0
+    # "fold" replays events (from the latest snapshot) in Python; "pushdown" derives the
+    # state from lifecycle events plus per-meter usage totals aggregated in the database.
+    hydration_mode: Literal["fold", "pushdown"] = "fold"
+    # In-process cache of GET /accounts/{id} views; 0 entries disables it. Appends made by
+    # this process invalidate it at once; the TTL bounds staleness from other processes.
+    state_cache_size: int = 10_000
+    state_cache_ttl_s: float = 1.0
+    # How new event payloads are stored: "json" (the JSON column) or "compact" (per-type
+    # binary layouts, see app.infra.event_store.codec). Rows of either kind stay readable.
+    payload_codec: Literal["json", "compact"] = "json"
+    # Per-stage timers and counters (/metrics, Server-Timing). Off by default.
+    metrics_enabled: bool = False
+    # Commands on the same stream run one at a time within a process (keyed lock), so
+    # only commands from other processes can conflict.
+    serialize_streams: bool = True
+    # A command that still loses the optimistic-concurrency race is re-hydrated and
+    # re-decided up to this many times, after a full-jitter backoff between
+    # 0 and min(conflict_backoff_max_ms, conflict_backoff_ms * 2**attempt).
+    conflict_retries: int = 3
+    conflict_backoff_ms: float = 5.0
+    conflict_backoff_max_ms: float = 100.0
+    # Connection pool per engine (so per worker process): `db_pool_size` kept open, up to
+    # `db_max_overflow` more under load, waiting at most `db_pool_timeout_s` for one.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_s: float = 30.0
+    # Replace connections older than this; -1 keeps them (e.g. no idle-killing proxy).
+    db_pool_recycle_s: int = -1
+    # Liveness check on checkout: "always" pings every time (one extra round trip), "idle"
+    # only connections that sat in the pool for over `db_pre_ping_idle_s`, "never" none.
+    db_pre_ping: Literal["always", "idle", "never"] = "idle"
+    db_pre_ping_idle_s: float = 30.0
+    # Compiled SQL cached per engine (SQLAlchemy's query_cache_size); 0 disables it.
+    db_statement_cache_size: int = 500
+    # Postgres: executions of a query before psycopg prepares it server-side (0 prepares
+    # at once; None keeps the driver default). Turn off behind transaction-mode pgbouncer.
+    db_prepare_threshold: int | None = None
+    # Carry committed (stream_id, version) pairs to the caches of the other workers (see
+    # app.infra.invalidation): "memory" (this process), "socket" (workers of one host, via
+    # `invalidation_socket_dir`), "postgres" (LISTEN/NOTIFY) or "none". With a bus the
+    # state cache TTL only covers lost messages, so it can be raised.
+    invalidation_bus: Literal["none", "memory", "socket", "postgres"] = "none"
+    invalidation_socket_dir: str = os.path.join(tempfile.gettempdir(), "quota-ledger-invalidation")
+    # Postgres: messages waiting for the publisher thread before new ones are dropped.
+    invalidation_queue_size: int = 10_000
+
+
+def _invalidation_bus(value: str) -> Literal["none", "memory", "socket", "postgres"]:
+    if value in ("memory", "socket", "postgres"):
+        return value  # type: ignore[return-value]
+    return "none"
+
+
+def _pre_ping(value: str) -> Literal["always", "idle", "never"]:
+    if value in ("always", "never"):
+        return value  # type: ignore[return-value]
+    return "idle"
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings(
+        snapshot_every=int(os.getenv("SNAPSHOT_EVERY", "100")),
+        max_round_trips=int(os.environ["MAX_ROUND_TRIPS"])
+        if os.getenv("MAX_ROUND_TRIPS")
+        else None,
+        io_mode="async" if os.getenv("IO_MODE", "sync") == "async" else "sync",
+        group_commit_window_ms=float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0")),
+        group_commit_max_batch=int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256")),
+        idempotency_cache_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "100000")),
+        idempotency_cache_ttl_s=float(os.getenv("IDEMPOTENCY_CACHE_TTL_S", "3600")),
+        idempotency_bloom_bits=int(os.getenv("IDEMPOTENCY_BLOOM_BITS", "0")),
+        projection_mode="async" if os.getenv("PROJECTION_MODE", "inline") == "async" else "inline",
+        projection_max_lag=int(os.getenv("PROJECTION_MAX_LAG", "0")),
+        projector_batch_size=int(os.getenv("PROJECTOR_BATCH_SIZE", "500")),
+        projector_gap_timeout_s=float(os.getenv("PROJECTOR_GAP_TIMEOUT_S", "2")),
+        plan_cache_ttl_s=float(os.getenv("PLAN_CACHE_TTL_S", "60")),
+        hydration_mode="pushdown" if os.getenv("HYDRATION_MODE", "fold") == "pushdown" else "fold",
+        state_cache_size=int(os.getenv("STATE_CACHE_SIZE", "10000")),
+        state_cache_ttl_s=float(os.getenv("STATE_CACHE_TTL_S", "1")),
+        payload_codec="compact" if os.getenv("PAYLOAD_CODEC", "json") == "compact" else "json",
+        metrics_enabled=os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes"),
+        serialize_streams=os.getenv("SERIALIZE_STREAMS", "1").lower() in ("1", "true", "yes"),
+        conflict_retries=int(os.getenv("CONFLICT_RETRIES", "3")),
+        conflict_backoff_ms=float(os.getenv("CONFLICT_BACKOFF_MS", "5")),
+        conflict_backoff_max_ms=float(os.getenv("CONFLICT_BACKOFF_MAX_MS", "100")),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        db_pool_timeout_s=float(os.getenv("DB_POOL_TIMEOUT_S", "30")),
+        db_pool_recycle_s=int(os.getenv("DB_POOL_RECYCLE_S", "-1")),
+        db_pre_ping=_pre_ping(os.getenv("DB_PRE_PING", "idle")),
+        db_pre_ping_idle_s=float(os.getenv("DB_PRE_PING_IDLE_S", "30")),
+        db_statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500")),
+        db_prepare_threshold=int(os.environ["DB_PREPARE_THRESHOLD"])
+        if os.getenv("DB_PREPARE_THRESHOLD")
+        else None,
+        invalidation_bus=_invalidation_bus(os.getenv("INVALIDATION_BUS", "none")),
+        invalidation_socket_dir=os.getenv(
+            "INVALIDATION_SOCKET_DIR", Settings.invalidation_socket_dir
+        ),
+        invalidation_queue_size=int(os.getenv("INVALIDATION_QUEUE_SIZE", "10000")),
+    )
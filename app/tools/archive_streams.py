@@ -0,0 +1,303 @@
+"""
+Move closed billing periods out of the events table.
+
+    python -m app.tools.archive_streams --min-age-days 90
+    python -m app.tools.archive_streams --account a1 --account a2
+
+For each stream with a PeriodReset older than `--min-age-days` past its archive boundary,
+the events up to the latest such reset are packed into compressed event_segments rows of
+at most `--segment-events` events each (read from the events table one segment at a
+time) and deleted from the events table, a snapshot of the state at the reset
+is saved, and the stream's `archived_through` moves up to it. Hydration starts from that
+snapshot, so commands and reads never touch the archive; event listings, point-in-time
+reads and the rebuild/backfill tools read segments through when they reach below the
+boundary.
+
+Usage sub-streams of a sharded account (see usage_shards) are archived up to the same
+reset: their events for the periods it closed move to segments too, while the open
+period's usage and totals stay in place. Nothing is snapshotted for them; they are only
+read back by rollup backfills.
+
+One transaction per chunk of streams, with their stream heads locked (appends to them
+wait). Safe to re-run and to interrupt.
+
+Archived events no longer take part in idempotency checks: keep `--min-age-days` well
+above the longest time a client may retry a command. They also leave the global feed,
+so projections rebuilt from position 0 must use app.tools.rebuild_projections.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.domain.fold import StateFold
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.archive import (
+    SEGMENT_EVENTS,
+    encode_segment,
+    iter_archived,
+    states_at_boundary,
+)
+from app.infra.event_store.models import Event, EventSegment, Stream
+from app.infra.event_store.repository import _to_envelope
+from app.infra.event_store.usage_shards import account_of, account_streams, shard_streams_of
+from app.infra.snapshots.store import SqlAlchemySnapshotStore
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ArchiveStats:
+    streams: int
+    events: int
+    segment_bytes: int
+
+
+def _closed_through(session: Session, stream_ids: list[str], before: datetime) -> dict[str, int]:
+    """Per stream, the latest PeriodReset past its archive boundary that occurred before `before`."""
+    rows = session.execute(
+        select(Event.stream_id, func.max(Event.stream_version))
+        .join(Stream, Stream.stream_id == Event.stream_id)
+        .where(
+            Event.stream_id.in_(stream_ids),
+            Event.event_type == "PeriodReset",
+            Event.occurred_at < before,
+            Event.stream_version > Stream.archived_through,
+        )
+        .group_by(Event.stream_id)
+    )
+    return {sid: version for sid, version in rows}
+
+
+def _write_segments(
+    session: Session,
+    stream_id: str,
+    after: int,
+    through: int,
+    segment_events: int,
+    folding: StateFold | None = None,
+) -> tuple[int, int]:
+    """
+    Pack events after < stream_version <= through into segments (folding them into
+    `folding`, if given), delete them and move the stream's boundary: (events, bytes).
+    """
+    events = size = 0
+    done = after
+    while done < through:
+        rows = list(
+            session.execute(
+                select(Event)
+                .where(
+                    Event.stream_id == stream_id,
+                    Event.stream_version > done,
+                    Event.stream_version <= through,
+                )
+                .order_by(Event.stream_version)
+                .limit(segment_events)
+            ).scalars()
+        )
+        if folding is not None:
+            folding.apply_all(map(_to_envelope, rows))
+        data = encode_segment(rows)
+        segment = EventSegment(
+            stream_id=stream_id,
+            first_version=rows[0].stream_version,
+            last_version=rows[-1].stream_version,
+            events=len(rows),
+            min_occurred_at=min(r.occurred_at for r in rows),
+            max_occurred_at=max(r.occurred_at for r in rows),
+            min_recorded_at=rows[0].recorded_at,
+            data=data,
+        )
+        session.add(segment)
+        session.flush()
+        # Written: keep neither the rows nor the segment in the identity map.
+        for obj in (*rows, segment):
+            session.expunge(obj)
+        done = rows[-1].stream_version
+        events += len(rows)
+        size += len(data)
+
+    session.execute(
+        delete(Event).where(
+            Event.stream_id == stream_id,
+            Event.stream_version > after,
+            Event.stream_version <= through,
+        )
+    )
+    session.execute(
+        update(Stream).where(Stream.stream_id == stream_id).values(archived_through=through)
+    )
+    return events, size
+
+
+def _shard_closed_through(
+    session: Session, stream_id: str, after: int, open_period: str | None, reset_at: datetime
+) -> int:
+    """
+    How far a usage sub-stream may be archived: the run of events past `after` that were
+    recorded for a closed period, before the reset that opened `open_period`. A shard
+    append conflicts with a reset committed meanwhile, so those events come first.
+    """
+    through = after
+    rows = session.execute(
+        select(Event.stream_version, Event.meta, Event.recorded_at)
+        .where(Event.stream_id == stream_id, Event.stream_version > after)
+        .order_by(Event.stream_version)
+        .execution_options(yield_per=5000)
+    )
+    for version, meta, recorded_at in rows:
+        if _utc(recorded_at) > reset_at or (meta or {}).get("period") == open_period:
+            break
+        through = version
+    return through
+
+
+def _utc(value: datetime) -> datetime:
+    return value.astimezone(UTC) if value.tzinfo is not None else value.replace(tzinfo=UTC)
+
+
+def _archive_shards(
+    session: Session,
+    shards: dict[str, list[tuple[str, int]]],
+    boundaries: dict[str, int],
+    snapshots: SqlAlchemySnapshotStore,
+    segment_events: int,
+) -> tuple[int, int, int]:
+    """
+    Archive the usage sub-streams of archived accounts up to their account's boundary
+    reset; the open period's usage (read_shard_usage) stays in place: (streams, events, bytes).
+    """
+    archived = {a: v for a, v in boundaries.items() if v and a in shards}
+    if not archived:
+        return 0, 0, 0
+    at_boundary = states_at_boundary(session, archived, snapshots)
+    streams = events = size = 0
+    for account_id, version in sorted(archived.items()):
+        reset = next(iter_archived(session, account_id, version - 1, version))
+        reset_at = datetime.fromisoformat(reset.recorded_at.replace("Z", "+00:00"))
+        for stream_id, after in shards[account_id]:
+            through = _shard_closed_through(
+                session, stream_id, after, at_boundary[account_id].period, reset_at
+            )
+            if through > after:
+                n, b = _write_segments(session, stream_id, after, through, segment_events)
+                streams += 1
+                events += n
+                size += b
+    return streams, events, size
+
+
+def archive_chunk(
+    session: Session,
+    stream_ids: list[str],
+    before: datetime,
+    snapshots: SqlAlchemySnapshotStore | None = None,
+    segment_events: int = SEGMENT_EVENTS,
+) -> tuple[int, int, int]:
+    """Archive closed periods of `stream_ids` in the session's transaction: (streams, events, bytes)."""
+    snapshots = snapshots if snapshots is not None else SqlAlchemySnapshotStore()
+    # Usage sub-streams first: shard appends lock their shard's head before the account's.
+    shards: dict[str, list[tuple[str, int]]] = {}
+    for sid, archived_through in session.execute(
+        select(Stream.stream_id, Stream.archived_through)
+        .where(shard_streams_of(Stream.stream_id, stream_ids))
+        .order_by(Stream.stream_id)
+        .with_for_update()
+    ):
+        shards.setdefault(account_of(sid), []).append((sid, archived_through))
+    boundaries = {
+        sid: archived_through
+        for sid, archived_through in session.execute(
+            select(Stream.stream_id, Stream.archived_through)
+            .where(Stream.stream_id.in_(stream_ids))
+            .order_by(Stream.stream_id)
+            .with_for_update()
+        )
+    }
+    through = _closed_through(session, list(boundaries), before)
+
+    at_boundary = states_at_boundary(session, {sid: boundaries[sid] for sid in through}, snapshots)
+    existing = snapshots.load_at_or_before_many(session, through)
+    events = size = 0
+    for sid, version in sorted(through.items()):
+        folding = (
+            StateFold(at_boundary.get(sid))
+            if sid not in existing or existing[sid].stream_version != version
+            else None
+        )
+        n, b = _write_segments(session, sid, boundaries[sid], version, segment_events, folding)
+        if folding is not None:
+            snapshots.save(sid, version, folding.freeze(), session=session)
+        boundaries[sid] = version
+        events += n
+        size += b
+
+    s, n, b = _archive_shards(session, shards, boundaries, snapshots, segment_events)
+    return len(through) + s, events + n, size + b
+
+
+def archive(
+    min_age: timedelta = timedelta(days=90),
+    account_ids: list[str] | None = None,
+    chunk_size: int = 100,
+    segment_events: int = SEGMENT_EVENTS,
+    session_factory: sessionmaker[Session] = SessionLocal,
+) -> ArchiveStats:
+    before = datetime.now(UTC) - min_age
+    if account_ids is None:
+        with session_factory() as session:
+            account_ids = list(
+                session.execute(
+                    select(Stream.stream_id)
+                    .where(account_streams(Stream.stream_id))
+                    .order_by(Stream.stream_id)
+                ).scalars()
+            )
+
+    streams = events = size = 0
+    for i in range(0, len(account_ids), chunk_size):
+        chunk = account_ids[i : i + chunk_size]
+        with session_factory() as session:
+            s, n, b = archive_chunk(session, chunk, before, segment_events=segment_events)
+            session.commit()
+        streams += s
+        events += n
+        size += b
+        log.info("%d/%d accounts, %d events archived", i + len(chunk), len(account_ids), events)
+    return ArchiveStats(streams=streams, events=events, segment_bytes=size)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--min-age-days", type=float, default=90, help="only periods reset before")
+    parser.add_argument("--account", action="append", help="only this account (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=100, help="accounts per transaction")
+    parser.add_argument(
+        "--segment-events", type=int, default=SEGMENT_EVENTS, help="events per segment"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    stats = archive(
+        min_age=timedelta(days=args.min_age_days),
+        account_ids=args.account,
+        chunk_size=args.chunk_size,
+        segment_events=args.segment_events,
+    )
+    log.info(
+        "done: %d streams, %d events archived into %d bytes",
+        stats.streams,
+        stats.events,
+        stats.segment_bytes,
+    )
+
+
+if __name__ == "__main__":
+    main()
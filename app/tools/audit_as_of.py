@@ -0,0 +1,82 @@
+"""
+Dump account states as of a past stream version or timestamp, as NDJSON.
+
+    python -m app.tools.audit_as_of --as-of 2026-02-01T00:00:00Z > states.ndjson
+    python -m app.tools.audit_as_of --as-of 2026-02-01T00:00:00Z --account a1 --account a2
+
+A timestamp means commit time: events recorded after it are left out, whatever their
+occurred_at. Accounts already in sharded mode at that point cannot be read back in time
+and come out as {"account_id", "as_of", "error"}. Accounts are read in batches of `--batch-size`; each batch costs a handful of queries
+(version lookup, nearest snapshots, the events after them) whatever the stream lengths.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections.abc import Iterator
+from datetime import UTC, datetime
+
+from sqlalchemy import select
+
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.models import Stream
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.event_store.usage_shards import account_streams
+from app.services.account_service import AccountService
+from app.services.point_in_time import AsOf
+
+
+def parse_as_of(value: str) -> AsOf:
+    if value.isdigit():
+        return int(value)
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=UTC)
+
+
+def _all_accounts(batch_size: int) -> Iterator[list[str]]:
+    after = ""
+    while True:
+        with SessionLocal() as session:
+            batch = list(
+                session.execute(
+                    select(Stream.stream_id)
+                    .where(Stream.stream_id > after, account_streams(Stream.stream_id))
+                    .order_by(Stream.stream_id)
+                    .limit(batch_size)
+                ).scalars()
+            )
+        if not batch:
+            return
+        yield batch
+        after = batch[-1]
+
+
+def audit(
+    as_of: AsOf, account_ids: list[str] | None = None, batch_size: int = 500
+) -> Iterator[dict]:
+    svc = AccountService(SqlAlchemyEventStore())
+    if account_ids is not None:
+        batches: Iterator[list[str]] = (
+            account_ids[i : i + batch_size] for i in range(0, len(account_ids), batch_size)
+        )
+    else:
+        batches = _all_accounts(batch_size)
+    for batch in batches:
+        yield from svc.states_as_of(batch, as_of)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--as-of", required=True, help="stream version or ISO8601 timestamp")
+    parser.add_argument("--account", action="append", help="only this account (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    for view in audit(parse_as_of(args.as_of), args.account, args.batch_size):
+        sys.stdout.write(json.dumps(view) + "\n")
+
+
+if __name__ == "__main__":
+    main()
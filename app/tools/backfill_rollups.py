@@ -0,0 +1,145 @@
+"""
+Recompute usage_rollups from the event log.
+
+    python -m app.tools.backfill_rollups
+    python -m app.tools.backfill_rollups --account a1 --account a2
+
+Accounts are processed in chunks, one transaction each: the chunk's stream heads are
+locked (so inline appends to those accounts wait), its rollup rows deleted and rebuilt
+from the UsageRecorded events' `occurred_at` (archived ones and those on usage
+sub-streams included). Safe to run next to live traffic and to re-run; an interrupted
+run leaves every committed chunk correct.
+
+With PROJECTION_MODE=async the projector's checkpoint is locked as well, and only
+events at or below it are folded in: the projector adds the rest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from dataclasses import dataclass
+from itertools import chain
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.archive import read_archived_many
+from app.infra.event_store.models import Event, Stream
+from app.infra.event_store.repository import from_archived, to_recorded
+from app.infra.event_store.usage_shards import account_streams, shard_streams_of
+from app.infra.projections.models import ProjectorCheckpoint, UsageRollup
+from app.infra.projections.usage_rollups import (
+    UsageRollupProjector,
+    apply_rollup_deltas,
+    rollup_deltas,
+    usage_of,
+)
+from app.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BackfillStats:
+    accounts: int
+    events: int
+    buckets: int
+
+
+def backfill_chunk(
+    session: Session, account_ids: list[str], inline: bool, yield_per: int = 5000
+) -> tuple[int, int]:
+    """Rebuild the rollups of `account_ids` in the session's transaction: (events, buckets)."""
+    # Usage sub-streams too (their closed periods are archived along with the account's),
+    # and locked first: shard appends lock their shard's head before the account's.
+    archived_through = {
+        sid: version
+        for where in (
+            shard_streams_of(Stream.stream_id, account_ids),
+            Stream.stream_id.in_(account_ids),
+        )
+        for sid, version in session.execute(
+            select(Stream.stream_id, Stream.archived_through)
+            .where(where)
+            .order_by(Stream.stream_id)
+            .with_for_update()
+        )
+        if version
+    }
+    through: int | None = None  # feed position the projector has applied, in async mode
+    stmt = select(Event).where(
+        or_(Event.stream_id.in_(account_ids), shard_streams_of(Event.stream_id, account_ids)),
+        Event.event_type == "UsageRecorded",
+    )
+    if not inline:
+        through = (
+            session.execute(
+                select(ProjectorCheckpoint.position)
+                .where(ProjectorCheckpoint.name == UsageRollupProjector.name)
+                .with_for_update()
+            ).scalar_one_or_none()
+            or 0
+        )
+        stmt = stmt.where(Event.position <= through)
+
+    session.execute(delete(UsageRollup).where(UsageRollup.account_id.in_(account_ids)))
+    archived = [
+        from_archived(sid, a)
+        for sid, events in read_archived_many(
+            session, {sid: (0, v) for sid, v in archived_through.items()}
+        ).items()
+        for a in events
+        if through is None or a.position <= through
+    ]
+    rows = session.execute(stmt.execution_options(yield_per=yield_per)).scalars()
+    deltas = rollup_deltas(usage_of(chain(archived, map(to_recorded, rows))))
+    apply_rollup_deltas(session, deltas)
+    events = sum(n for (_, granularity, _, _), (_, n) in deltas.items() if granularity == "hour")
+    return events, len(deltas)
+
+
+def backfill(
+    account_ids: list[str] | None = None,
+    chunk_size: int = 100,
+    session_factory: sessionmaker[Session] = SessionLocal,
+) -> BackfillStats:
+    if account_ids is None:
+        with session_factory() as session:
+            account_ids = list(
+                session.execute(
+                    select(Stream.stream_id)
+                    .where(account_streams(Stream.stream_id))
+                    .order_by(Stream.stream_id)
+                ).scalars()
+            )
+
+    inline = get_settings().projection_mode == "inline"
+    events = buckets = 0
+    for i in range(0, len(account_ids), chunk_size):
+        chunk = account_ids[i : i + chunk_size]
+        with session_factory() as session:
+            n, b = backfill_chunk(session, chunk, inline)
+            session.commit()
+        events += n
+        buckets += b
+        log.info("%d/%d accounts, %d events", i + len(chunk), len(account_ids), events)
+    return BackfillStats(accounts=len(account_ids), events=events, buckets=buckets)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--account", action="append", help="only this account (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=100, help="accounts per transaction")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    stats = backfill(account_ids=args.account, chunk_size=args.chunk_size)
+    log.info(
+        "done: %d accounts, %d events, %d buckets", stats.accounts, stats.events, stats.buckets
+    )
+
+
+if __name__ == "__main__":
+    main()
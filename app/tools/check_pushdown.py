@@ -0,0 +1,61 @@
+"""
+Check pushdown hydration against the Python fold.
+
+    python -m app.tools.check_pushdown --sample 1000
+    python -m app.tools.check_pushdown --stream a1
+
+Exits non-zero if any stream's pushdown state differs from a full replay.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+
+from sqlalchemy import func, select
+
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.models import Stream
+from app.infra.event_store.pushdown import PushdownMismatch, check_pushdown
+
+log = logging.getLogger(__name__)
+
+
+def check_streams(
+    stream_ids: list[str] | None = None, sample: int | None = None
+) -> list[PushdownMismatch]:
+    """Check the given streams, a random `sample` of streams, or (by default) all of them."""
+    with SessionLocal() as session:
+        if stream_ids is None:
+            stmt = select(Stream.stream_id)
+            if sample is not None:
+                stmt = stmt.order_by(func.random()).limit(sample)
+            stream_ids = list(session.execute(stmt).scalars())
+
+        mismatches = []
+        for stream_id in stream_ids:
+            mismatch = check_pushdown(session, stream_id)
+            if mismatch is not None:
+                log.warning(
+                    "%s: pushdown %s != replay %s", stream_id, mismatch.pushdown, mismatch.replay
+                )
+                mismatches.append(mismatch)
+
+    log.info("checked %d streams, %d mismatches", len(stream_ids), len(mismatches))
+    return mismatches
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--stream", action="append", dest="streams", help="repeatable")
+    parser.add_argument("--sample", type=int, default=None, help="random streams to check")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if check_streams(args.streams, args.sample):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
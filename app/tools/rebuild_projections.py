@@ -0,0 +1,419 @@
+"""
+Rebuild account_current from the event log.
+
+    python -m app.tools.rebuild_projections --workers 8
+
+Stream ids are split into key ranges of about equal size, computed once when the rebuild
+is prepared, and the ranges are run across a process pool. Each worker reads only the ids
+in its range (through the primary key) and folds their
+events (in stream_version order, through a server-side cursor) and bulk-upserts the rows
+into a shadow table, recording its progress in the same transaction. When every partition
+is done the shadow table is brought up to the current stream heads and swapped in for
+account_current in one transaction.
+
+An interrupted rebuild resumes where each partition's last commit left off; pass
+`--fresh` to discard it and start over.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import FIRST_EXCEPTION, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.domain.fold import StateFold
+from app.infra.db.dialect import upsert_insert
+from app.infra.db.session import SessionLocal, engine
+from app.infra.event_store.archive import states_at_boundary
+from app.infra.event_store.feed import head_position
+from app.infra.event_store.models import Event, Stream
+from app.infra.event_store.repository import to_recorded
+from app.infra.event_store.usage_shards import account_streams
+from app.infra.projections.models import AccountCurrent
+
+log = logging.getLogger(__name__)
+
+_metadata = MetaData()
+
+SHADOW = AccountCurrent.__table__.to_metadata(_metadata, name="account_current_rebuild")
+
+PROGRESS = Table(
+    "account_current_rebuild_progress",
+    _metadata,
+    Column("partition", Integer, primary_key=True),
+    Column("partitions", Integer, nullable=False),
+    # Events at or below this feed position are folded by the workers; the rest is
+    # picked up by the catch-up pass at swap time.
+    Column("through_position", BigInteger, nullable=False),
+    # The partition's key range: lower_stream_id <= id < upper_stream_id, unbounded if None.
+    Column("lower_stream_id", String, nullable=True),
+    Column("upper_stream_id", String, nullable=True),
+    Column("last_stream_id", String, nullable=True),
+    Column("streams", BigInteger, nullable=False, default=0),
+    Column("events", BigInteger, nullable=False, default=0),
+    Column("done", Boolean, nullable=False, default=False),
+)
+
+
+@dataclass(frozen=True)
+class RebuildStats:
+    partitions: int
+    streams: int
+    events: int
+    caught_up: int  # streams refreshed at swap time
+    seconds: float
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else 0.0
+
+
+def partition_bounds(session: Session, partitions: int) -> list[str]:
+    """
+    First stream id of each of up to `partitions` equal-sized key ranges, in one query
+    (fewer ranges when there are fewer streams).
+    """
+    tiles = (
+        select(
+            Stream.stream_id,
+            func.ntile(partitions).over(order_by=Stream.stream_id).label("tile"),
+        )
+        .where(account_streams(Stream.stream_id))
+        .subquery()
+    )
+    return list(
+        session.execute(
+            select(func.min(tiles.c.stream_id)).group_by(tiles.c.tile).order_by(tiles.c.tile)
+        ).scalars()
+    )
+
+
+def _fold_into_shadow(
+    session: Session, stream_ids: list[str], through: int | None, yield_per: int
+) -> int:
+    """
+    Fold and upsert the shadow rows for `stream_ids`. Returns the number of events read.
+    Archived streams start from their state at the archive boundary.
+    """
+    archived_through = {
+        sid: version
+        for sid, version in session.execute(
+            select(Stream.stream_id, Stream.archived_through).where(
+                Stream.stream_id.in_(stream_ids), Stream.archived_through > 0
+            )
+        )
+    }
+    folding: dict[str, StateFold] = {
+        sid: StateFold(state)
+        for sid, state in states_at_boundary(session, archived_through).items()
+    }
+    versions: dict[str, int] = dict(archived_through)
+
+    stmt = select(Event).where(Event.stream_id.in_(stream_ids))
+    if through is not None:
+        stmt = stmt.where(Event.position <= through)
+    rows = session.execute(
+        stmt.order_by(Event.stream_id, Event.stream_version).execution_options(yield_per=yield_per)
+    ).scalars()
+
+    events = 0
+    for row in rows:
+        r = to_recorded(row)
+        acc = folding.get(r.stream_id)
+        if acc is None:
+            acc = folding[r.stream_id] = StateFold()
+        acc.apply(r.envelope)
+        versions[r.stream_id] = r.stream_version
+        events += 1
+    folded = {sid: (acc.freeze(), versions[sid]) for sid, acc in folding.items()}
+
+    values = [
+        {
+            "account_id": sid,
+            "stream_version": version,
+            "status": state.status,
+            "plan_id": state.plan_id,
+            "period": state.period,
+            "used": state.used or {},
+            "usage_shards": state.usage_shards,
+        }
+        for sid, (state, version) in folded.items()
+        if state.exists
+    ]
+    if values:
+        stmt = upsert_insert(session, SHADOW).values(values)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["account_id"],
+                set_={
+                    c: stmt.excluded[c]
+                    for c in (
+                        "stream_version",
+                        "status",
+                        "plan_id",
+                        "period",
+                        "used",
+                        "usage_shards",
+                    )
+                },
+            )
+        )
+    return events
+
+
+def _chunks(ids: Iterable[str], size: int) -> Iterable[list[str]]:
+    chunk: list[str] = []
+    for sid in ids:
+        chunk.append(sid)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_partition(
+    partition: int,
+    batch_size: int = 1000,
+    yield_per: int = 5000,
+    session_factory: sessionmaker[Session] = SessionLocal,
+) -> None:
+    """Fold one partition into the shadow table, committing every `batch_size` streams."""
+    with session_factory() as session:
+        p = session.execute(select(PROGRESS).where(PROGRESS.c.partition == partition)).one()
+    if p.done:
+        return
+
+    ids_stmt = (
+        select(Stream.stream_id).where(account_streams(Stream.stream_id)).order_by(Stream.stream_id)
+    )
+    if p.lower_stream_id is not None:
+        ids_stmt = ids_stmt.where(Stream.stream_id >= p.lower_stream_id)
+    if p.upper_stream_id is not None:
+        ids_stmt = ids_stmt.where(Stream.stream_id < p.upper_stream_id)
+    if p.last_stream_id is not None:
+        ids_stmt = ids_stmt.where(Stream.stream_id > p.last_stream_id)
+
+    # Ids only (not events) are held in memory, and the read is closed before the first
+    # write so it does not pin a snapshot for the whole partition.
+    with session_factory() as session:
+        ids = list(session.execute(ids_stmt.execution_options(yield_per=yield_per)).scalars())
+
+    for chunk in _chunks(ids, batch_size):
+        with session_factory() as session:
+            events = _fold_into_shadow(session, chunk, p.through_position, yield_per)
+            session.execute(
+                update(PROGRESS)
+                .where(PROGRESS.c.partition == partition)
+                .values(
+                    last_stream_id=chunk[-1],
+                    streams=PROGRESS.c.streams + len(chunk),
+                    events=PROGRESS.c.events + events,
+                )
+            )
+            session.commit()
+
+    with session_factory() as session:
+        session.execute(update(PROGRESS).where(PROGRESS.c.partition == partition).values(done=True))
+        session.commit()
+
+
+def _worker_init() -> None:
+    # Connections inherited from the parent must not be shared across processes.
+    engine.dispose(close=False)
+
+
+def prepare(session: Session, partitions: int, fresh: bool = False) -> int:
+    """
+    Create the shadow and progress tables, or keep an interrupted run's. Returns the
+    partition count in effect (a resumed run keeps its own).
+    """
+    tables = set(inspect(session.connection()).get_table_names())
+    if PROGRESS.name in tables and SHADOW.name in tables and not fresh:
+        existing = session.execute(select(func.max(PROGRESS.c.partitions))).scalar_one()
+        if existing:
+            log.info("resuming rebuild with %d partitions", existing)
+            return existing
+
+    _metadata.drop_all(session.connection())
+    _metadata.create_all(session.connection())
+    through = head_position(session)
+    bounds = partition_bounds(session, partitions)
+    # Range 0 starts unbounded and the last one ends unbounded, so streams created from
+    # here on still fall in a range; partitions beyond the ranges have nothing to do.
+    lower = [None, *bounds[1:]]
+    upper = [*bounds[1:], None]
+    session.execute(
+        PROGRESS.insert(),
+        [
+            {
+                "partition": i,
+                "partitions": partitions,
+                "through_position": through,
+                "lower_stream_id": lower[i] if i < len(bounds) else None,
+                "upper_stream_id": upper[i] if i < len(bounds) else None,
+                "done": i >= max(len(bounds), 1),
+            }
+            for i in range(partitions)
+        ],
+    )
+    session.commit()
+    return partitions
+
+
+def swap(session: Session, yield_per: int = 5000) -> int:
+    """
+    Bring the shadow rows up to the current stream heads and swap the shadow table in for
+    account_current, in one transaction. Writers wait on the table lock meanwhile.
+    Returns the number of streams that had to be caught up.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        session.execute(text("LOCK TABLE account_current IN ACCESS EXCLUSIVE MODE"))
+
+    behind = list(
+        session.execute(
+            select(Stream.stream_id)
+            .outerjoin(SHADOW, SHADOW.c.account_id == Stream.stream_id)
+            .where(
+                account_streams(Stream.stream_id),
+                or_(SHADOW.c.stream_version.is_(None), SHADOW.c.stream_version < Stream.version),
+            )
+        ).scalars()
+    )
+    for chunk in _chunks(behind, 1000):
+        _fold_into_shadow(session, chunk, None, yield_per)
+
+    session.execute(text("DROP TABLE account_current"))
+    session.execute(text(f"ALTER TABLE {SHADOW.name} RENAME TO account_current"))
+    if dialect == "postgresql":
+        session.execute(text(f"ALTER INDEX {SHADOW.name}_pkey RENAME TO account_current_pkey"))
+    PROGRESS.drop(session.connection())
+    session.commit()
+    return len(behind)
+
+
+def _progress(session_factory: sessionmaker[Session]) -> tuple[int, int, int]:
+    with session_factory() as session:
+        done, streams, events = session.execute(
+            select(
+                func.count().filter(PROGRESS.c.done),
+                func.coalesce(func.sum(PROGRESS.c.streams), 0),
+                func.coalesce(func.sum(PROGRESS.c.events), 0),
+            )
+        ).one()
+    return done, streams, events
+
+
+def rebuild(
+    workers: int | None = None,
+    partitions: int | None = None,
+    batch_size: int = 1000,
+    fresh: bool = False,
+    progress_every: float = 5.0,
+    session_factory: sessionmaker[Session] = SessionLocal,
+) -> RebuildStats:
+    """
+    Rebuild account_current. `workers <= 1` runs the partitions in this process;
+    `partitions` defaults to four per worker so a slow partition does not hold up the pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.monotonic()
+
+    with session_factory() as session:
+        partitions = prepare(session, partitions or workers * 4, fresh=fresh)
+    _, _, events_before = _progress(session_factory)
+
+    def report() -> None:
+        done, streams, events = _progress(session_factory)
+        elapsed = time.monotonic() - started
+        log.info(
+            "partitions %d/%d, %d streams, %d events, %.0f events/s",
+            done,
+            partitions,
+            streams,
+            events,
+            (events - events_before) / elapsed if elapsed else 0.0,
+        )
+
+    if workers <= 1:
+        for i in range(partitions):
+            run_partition(i, batch_size, session_factory=session_factory)
+            report()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+            pending: set[Future[None]] = {
+                pool.submit(run_partition, i, batch_size) for i in range(partitions)
+            }
+            while pending:
+                finished, pending = wait(
+                    pending, timeout=progress_every, return_when=FIRST_EXCEPTION
+                )
+                for f in finished:
+                    f.result()  # re-raise a worker failure; finished partitions keep their progress
+                report()
+
+    _, streams, events = _progress(session_factory)
+    with session_factory() as session:
+        caught_up = swap(session)
+
+    stats = RebuildStats(
+        partitions=partitions,
+        streams=streams,
+        events=events,
+        caught_up=caught_up,
+        seconds=time.monotonic() - started,
+    )
+    log.info(
+        "rebuilt account_current: %d streams, %d events in %.1fs (%.0f events/s), %d caught up",
+        stats.streams,
+        stats.events,
+        stats.seconds,
+        stats.events_per_second,
+        stats.caught_up,
+    )
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPUs)")
+    parser.add_argument("--partitions", type=int, default=None, help="default: 4 per worker")
+    parser.add_argument("--batch-size", type=int, default=1000, help="streams per transaction")
+    parser.add_argument("--fresh", action="store_true", help="discard an interrupted rebuild")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    rebuild(
+        workers=args.workers,
+        partitions=args.partitions,
+        batch_size=args.batch_size,
+        fresh=args.fresh,
+        progress_every=args.progress_every,
+    )
+
+
+if __name__ == "__main__":
+    main()
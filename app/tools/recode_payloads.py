@@ -0,0 +1,101 @@
+"""
+Rewrite stored event payloads with another codec.
+
+    python -m app.tools.recode_payloads                # JSON rows -> compact
+    python -m app.tools.recode_payloads --to json      # back, e.g. before a downgrade
+
+Walks the events table in feed order, committing every `--batch-size` rows, so it can run
+next to live traffic and be interrupted and restarted at any time. Only the storage
+representation changes: event types, versions and payload contents stay as written.
+Payloads the compact layouts cannot represent are left as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.codec import COMPACT, JSON, Codec, decode_payload, encode_payload
+from app.infra.event_store.models import Event
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RecodeStats:
+    scanned: int
+    recoded: int
+
+
+def recode_batch(session: Session, to: Codec, after: int, batch_size: int) -> tuple[int, int, int]:
+    """Recode up to `batch_size` rows past feed position `after`: (last position, scanned, recoded)."""
+    rows = session.execute(
+        select(
+            Event.position,
+            Event.event_type,
+            Event.event_schema_version,
+            Event.payload_codec,
+            Event.payload,
+            Event.payload_bin,
+        )
+        .where(Event.position > after, Event.payload_codec != to)
+        .order_by(Event.position)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return after, 0, 0
+
+    changes = []
+    for position, event_type, version, codec, payload, payload_bin in rows:
+        decoded = decode_payload(codec, event_type, version, payload, payload_bin)
+        new_codec, new_payload, new_bin = encode_payload(event_type, version, decoded, to)
+        if new_codec != codec:
+            changes.append(
+                {
+                    "position": position,
+                    "payload_codec": new_codec,
+                    "payload": new_payload,
+                    "payload_bin": new_bin,
+                }
+            )
+    if changes:
+        session.execute(update(Event), changes)
+    return rows[-1].position, len(rows), len(changes)
+
+
+def recode(
+    to: Codec = COMPACT,
+    batch_size: int = 1000,
+    session_factory: sessionmaker[Session] = SessionLocal,
+) -> RecodeStats:
+    after = scanned = recoded = 0
+    while True:
+        with session_factory() as session:
+            after, n, changed = recode_batch(session, to, after, batch_size)
+            session.commit()
+        if not n:
+            break
+        scanned += n
+        recoded += changed
+        log.info("recoded %d/%d rows (through position %d)", recoded, scanned, after)
+    return RecodeStats(scanned=scanned, recoded=recoded)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--to", choices=(COMPACT, JSON), default=COMPACT)
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    stats = recode(to=args.to, batch_size=args.batch_size)
+    log.info("done: %d rows scanned, %d recoded", stats.scanned, stats.recoded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Create a plan or replace its per-meter limits, and have every worker pick it up.
+
+    python -m app.tools.set_plan pro api_calls=100000 storage_mb=5000
+    python -m app.tools.set_plan free                  # no limits at all
+
+The limits given replace the plan's current ones; meters left out become unlimited. With
+INVALIDATION_BUS configured, the workers' plan catalogs reload on their next use instead
+of once PLAN_CACHE_TTL_S runs out.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+
+from app.infra.invalidation import get_invalidation_bus
+from app.infra.plans.catalog import save_plan
+
+log = logging.getLogger(__name__)
+
+
+def parse_limit(value: str) -> tuple[str, int]:
+    meter, sep, units = value.partition("=")
+    if not sep or not meter or not units.isdigit():
+        raise argparse.ArgumentTypeError(f"expected <meter>=<units>, got '{value}'")
+    return meter, int(units)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("plan_id")
+    parser.add_argument("limits", nargs="*", type=parse_limit, metavar="METER=UNITS")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    stop = threading.Event()
+    bus = get_invalidation_bus()
+    if bus is not None:
+        bus.start(stop)
+    try:
+        save_plan(args.plan_id, dict(args.limits), bus=bus)
+        if bus is not None and not bus.flush():
+            log.warning("plan saved, but the invalidation may not have reached the workers")
+    finally:
+        stop.set()
+    log.info("plan %s: %s", args.plan_id, dict(args.limits) or "unlimited")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 3) -> dict[str, float]:
+    """Latency summary (milliseconds) and throughput of calling `fn` `iterations` times."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "ops_per_s": len(samples) / sum(samples),
+    }
+
+
+def rate(fn: Callable[[], int], repeat: int = 3) -> float:
+    """Best-of-`repeat` items/s for `fn`, which returns how many items it processed."""
+    best = 0.0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        n = fn()
+        best = max(best, n / (time.perf_counter() - started))
+    return best
+
+
+# Metrics checked by `compare`; tails and means are reported but too noisy to gate on.
+GATED_METRICS = ("p50_ms", "ops_per_s", "events_per_s")
+# Latency changes below this are timer and GC noise, whatever their relative size.
+MIN_DELTA_MS = 0.05
+
+
+def compare(
+    baseline: dict[str, dict[str, float]],
+    current: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """
+    Regressions of `current` against `baseline` beyond `threshold` (0.2 = 20% worse), as
+    readable lines. Benchmarks or metrics missing from either side are ignored.
+    """
+    regressions = []
+    for name, metrics in baseline.items():
+        for metric, before in metrics.items():
+            after = current.get(name, {}).get(metric)
+            if metric not in GATED_METRICS or after is None or before <= 0:
+                continue
+            if metric.endswith("_ms"):
+                if after - before < MIN_DELTA_MS:
+                    continue
+                change = (after - before) / before
+            else:
+                change = (before - after) / before
+            if change > threshold:
+                regressions.append(
+                    f"{name}.{metric}: {before:.3f} -> {after:.3f} ({change:+.0%} worse)"
+                )
+    return regressions
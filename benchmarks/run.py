@@ -0,0 +1,79 @@
+"""
+Latency and throughput benchmarks for the write and read paths.
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --compare bench.json --threshold 0.25
+
+Runs against DATABASE_URL (SQLite or a local Postgres); without it, a throwaway SQLite
+file is used. `--compare` exits non-zero when any metric is worse than the baseline by
+more than the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import UTC, datetime
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--only", action="append", help="scenario to run (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0, help="shrink/grow dataset sizes")
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="quota-ledger-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    # Imported after DATABASE_URL is settled: the engine is created at import time.
+    from app.infra.db.init_db import init_db
+    from benchmarks.harness import compare
+    from benchmarks.scenarios import SCENARIOS
+
+    init_db()
+    names = args.only or list(SCENARIOS)
+    results: dict[str, dict[str, float]] = {}
+    for name in names:
+        print(f"running {name} ...", file=sys.stderr)
+        results.update(SCENARIOS[name](args.scale))
+
+    report = {
+        "meta": {
+            "at": datetime.now(UTC).isoformat(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "python": platform.python_version(),
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline_report = json.load(f)
+        if baseline_report["meta"].get("scale") != args.scale:
+            print("warning: baseline was recorded at a different --scale", file=sys.stderr)
+        baseline = baseline_report["results"]
+        regressions = compare(baseline, results, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
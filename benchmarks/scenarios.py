@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import random
+from collections.abc import Callable
+from datetime import UTC, datetime
+from functools import reduce
+from itertools import count
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.domain.aggregate import apply_event
+from app.domain.commands import CreateAccount, RecordUsage
+from app.domain.events import EventEnvelope
+from app.domain.fold import fold
+from app.domain.types import AccountQuotaState
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.codec import COMPACT, decode_payload, encode_payload
+from app.infra.event_store.idempotency import IdempotencyCache
+from app.infra.event_store.models import Event, Stream
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.projections.state_cache import AccountStateCache
+from app.services.account_service import AccountService
+from benchmarks.harness import measure, rate
+
+Scenario = Callable[[float], dict[str, dict[str, float]]]
+
+_OCCURRED = "2026-01-28T01:00:00Z"
+
+
+def _uncached_store() -> SqlAlchemyEventStore:
+    # Measure the database paths, not the in-process caches.
+    return SqlAlchemyEventStore(
+        idempotency=IdempotencyCache(max_entries=0), state_cache=AccountStateCache(max_entries=0)
+    )
+
+
+def _usage_event(i: int) -> EventEnvelope:
+    return EventEnvelope(
+        event_type="UsageRecorded",
+        schema_version=2,
+        occurred_at=_OCCURRED,
+        payload={"meter": "api_calls" if i % 3 else "storage_mb", "units": 1, "source": "bench"},
+        idempotency_key=f"seed-{i}",
+    )
+
+
+def seed_stream(length: int) -> str:
+    """An account stream with `length` events, bulk-inserted (bypassing the write path)."""
+    stream_id = f"bench-{uuid4().hex[:10]}"
+    AccountService(SqlAlchemyEventStore(), group_commit=None).create_account(
+        CreateAccount(stream_id, "basic", "2026-01")
+    )
+    occurred = datetime(2026, 1, 28, tzinfo=UTC)
+    with SessionLocal() as session:
+        for start in range(2, length + 1, 10_000):
+            session.execute(
+                insert(Event),
+                [
+                    {
+                        "event_id": str(uuid4()),
+                        "stream_id": stream_id,
+                        "stream_version": v,
+                        "event_type": "UsageRecorded",
+                        "event_schema_version": 2,
+                        "occurred_at": occurred,
+                        "idempotency_key": f"seed-{v}",
+                        "payload": {"meter": "api_calls", "units": 1, "source": "bench"},
+                        "meta": {},
+                    }
+                    for v in range(start, min(start + 10_000, length + 1))
+                ],
+            )
+        session.get(Stream, stream_id).version = max(length, 1)
+        session.commit()
+    return stream_id
+
+
+def _append_on_stream(length: int) -> dict[str, dict[str, float]]:
+    stream_id = seed_stream(length)
+    store = _uncached_store()
+    keys = count()
+    version = [length]
+
+    def append() -> None:
+        version[0] = store.append(stream_id, version[0], [_usage_event(1_000_000 + next(keys))])
+
+    svc = AccountService(store, group_commit=None)
+
+    def record_usage() -> None:
+        svc.record_usage(RecordUsage(stream_id, "api_calls", 1, _OCCURRED, f"cmd-{next(keys)}"))
+
+    return {
+        "append": measure(append, iterations=50),
+        "record_usage": measure(record_usage, iterations=50),
+    }
+
+
+def append_latency(scale: float) -> dict[str, dict[str, float]]:
+    """
+    store.append and a full record_usage command on streams of 1, 1k and 100k events
+    (sizes other than 1 are multiplied by `scale`; names keep the nominal size).
+    """
+    results = {}
+    for label, length in (("1", 1), ("1k", 1_000), ("100k", 100_000)):
+        if length > 1:
+            length = max(2, int(length * scale))
+        for name, metrics in _append_on_stream(length).items():
+            results[f"{name}[{label}]"] = metrics
+    return results
+
+
+def replay_throughput(scale: float) -> dict[str, dict[str, float]]:
+    """In-memory fold speed, apply_event vs the compact fold (events/s)."""
+    rng = random.Random(16)
+    events = [
+        EventEnvelope(
+            event_type="AccountCreated",
+            schema_version=1,
+            occurred_at=_OCCURRED,
+            payload={"plan_id": "basic", "period": "2026-01"},
+        )
+    ] + [_usage_event(rng.randrange(1_000)) for _ in range(int(200_000 * scale))]
+
+    def by_apply_event() -> int:
+        reduce(apply_event, events, AccountQuotaState())
+        return len(events)
+
+    def by_fold() -> int:
+        fold(events)
+        return len(events)
+
+    return {
+        "replay.apply_event": {"events_per_s": rate(by_apply_event)},
+        "replay.fold": {"events_per_s": rate(by_fold)},
+    }
+
+
+def payload_codecs(scale: float) -> dict[str, dict[str, float]]:
+    """Stored bytes per usage event and payload decode speed (events/s), JSON vs compact."""
+    rng = random.Random(18)
+    payloads = [_usage_event(rng.randrange(1_000)).payload for _ in range(int(100_000 * scale))]
+    # The JSON column holds json.dumps text, which the driver hands to json.loads on read.
+    as_json = [json.dumps(p) for p in payloads]
+    packed = [encode_payload("UsageRecorded", 2, p, COMPACT)[2] for p in payloads]
+
+    def decode_json() -> int:
+        for text in as_json:
+            json.loads(text)
+        return len(as_json)
+
+    def decode_compact() -> int:
+        for buf in packed:
+            decode_payload(COMPACT, "UsageRecorded", 2, None, buf)
+        return len(packed)
+
+    return {
+        "codec.json": {
+            "bytes_per_event": sum(map(len, as_json)) / len(as_json),
+            "events_per_s": rate(decode_json),
+        },
+        "codec.compact": {
+            "bytes_per_event": sum(map(len, packed)) / len(packed),  # type: ignore[arg-type]
+            "events_per_s": rate(decode_compact),
+        },
+    }
+
+
+def get_state_reads(scale: float) -> dict[str, dict[str, float]]:
+    """get_state from the projection vs from a replay (no snapshots) of a long stream."""
+    stream_id = seed_stream(max(2, int(10_000 * scale)))
+    store = _uncached_store()
+    svc = AccountService(store, snapshot_every=0, group_commit=None)
+    # One real write so account_current reflects the bulk-seeded events.
+    svc.record_usage(RecordUsage(stream_id, "api_calls", 1, _OCCURRED, "touch"))
+    cached = AccountService(
+        SqlAlchemyEventStore(state_cache=AccountStateCache(ttl_seconds=3600)), group_commit=None
+    )
+
+    return {
+        "get_state.projection": measure(lambda: svc.get_state(stream_id), iterations=200),
+        "get_state.replay": measure(lambda: svc.executor.load(stream_id), iterations=20),
+        "get_state.cached": measure(lambda: cached.get_state(stream_id), iterations=1_000),
+    }
+
+
+def idempotent_retries(scale: float) -> dict[str, dict[str, float]]:
+    """Replaying an already recorded command: from the idempotency cache vs the database."""
+    stream_id = seed_stream(100)
+    cmd = RecordUsage(stream_id, "api_calls", 1, _OCCURRED, "retry")
+
+    cached = AccountService(SqlAlchemyEventStore(idempotency=IdempotencyCache()), group_commit=None)
+    cached.record_usage(cmd)
+    uncached = AccountService(_uncached_store(), group_commit=None)
+
+    return {
+        "retry.cached": measure(lambda: cached.record_usage(cmd), iterations=1_000),
+        "retry.database": measure(lambda: uncached.record_usage(cmd), iterations=100),
+    }
+
+
+def http_usage_writes(scale: float) -> dict[str, dict[str, float]]:
+    """End-to-end POST /usage through the ASGI app (TestClient, no network)."""
+    from app.main import app
+
+    client = TestClient(app)
+    account_id = f"bench-{uuid4().hex[:10]}"
+    client.post(
+        "/v1/accounts",
+        json={"account_id": account_id, "initial_plan_id": "basic", "period": "2026-01"},
+    )
+    keys = count()
+
+    def write() -> None:
+        r = client.post(
+            f"/v1/accounts/{account_id}/usage",
+            headers={"Idempotency-Key": f"http-{next(keys)}"},
+            json={"meter": "api_calls", "units": 1, "occurred_at": _OCCURRED},
+        )
+        r.raise_for_status()
+
+    return {"http.usage": measure(write, iterations=max(20, int(200 * scale)))}
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "append": append_latency,
+    "replay": replay_throughput,
+    "codec": payload_codecs,
+    "get_state": get_state_reads,
+    "retries": idempotent_retries,
+    "http": http_usage_writes,
+}
@@ -19,7 +19,9 @@ if config.config_file_name is not None:
 
 # Import models so Base.metadata is fully populated
 import app.infra.event_store.models  # noqa: F401,E402
+import app.infra.plans.models  # noqa: F401,E402
 import app.infra.projections.models  # noqa: F401,E402
+import app.infra.snapshots.models  # noqa: F401,E402
 from app.infra.db.base import Base  # noqa: E402
 
 target_metadata = Base.metadata
@@ -0,0 +1,34 @@
+"""usage sub-streams for sharded accounts
+
+Revision ID: 0a7d4e9b3c62
+Revises: c93d5e8f1a27
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0a7d4e9b3c62"
+down_revision: str | None = "c93d5e8f1a27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usage_shard_totals",
+        sa.Column("stream_id", sa.String(), primary_key=True),
+        sa.Column("period", sa.String(), primary_key=True),
+        sa.Column("meter", sa.String(), primary_key=True),
+        sa.Column("units", sa.BigInteger(), nullable=False),
+    )
+    op.add_column(
+        "account_current",
+        sa.Column("usage_shards", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("account_current", "usage_shards")
+    op.drop_table("usage_shard_totals")
@@ -0,0 +1,24 @@
+"""derive remaining quota on read instead of storing it on account_current
+
+Revision ID: 5b8e2f0c4d17
+Revises: 0a7d4e9b3c62
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "5b8e2f0c4d17"
+down_revision: str | None = "0a7d4e9b3c62"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_column("account_current", "remaining")
+
+
+def downgrade() -> None:
+    # Filled in again on each account's next write, as when it was first added.
+    op.add_column("account_current", sa.Column("remaining", sa.JSON(), nullable=True))
@@ -0,0 +1,35 @@
+"""account snapshots
+
+Revision ID: 7c41e9a0b2f3
+Revises: 25d17e2a7853
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "7c41e9a0b2f3"
+down_revision: str | None = "25d17e2a7853"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "account_snapshots",
+        sa.Column("stream_id", sa.String(), primary_key=True),
+        sa.Column("stream_version", sa.BigInteger(), primary_key=True),
+        sa.Column("fold_version", sa.Integer(), primary_key=True),
+        sa.Column("state", sa.JSON(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("account_snapshots")
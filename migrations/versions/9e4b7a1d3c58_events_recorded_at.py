@@ -0,0 +1,50 @@
+"""record commit time on events so timestamp as_of follows commit order
+
+Revision ID: 9e4b7a1d3c58
+Revises: 5b8e2f0c4d17
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "9e4b7a1d3c58"
+down_revision: str | None = "5b8e2f0c4d17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("events", sa.Column("recorded_at", sa.DateTime(timezone=True), nullable=True))
+    # The commit time of existing events is unknown; the running max of occurred_at per
+    # stream is the closest value that still never decreases with stream_version.
+    op.execute(
+        """
+        UPDATE events SET recorded_at = (
+            SELECT max(e.occurred_at) FROM events e
+            WHERE e.stream_id = events.stream_id AND e.stream_version <= events.stream_version
+        )
+        """
+    )
+    op.alter_column(
+        "events",
+        "recorded_at",
+        existing_type=sa.DateTime(timezone=True),
+        nullable=False,
+        server_default=sa.func.now(),
+    )
+    op.create_index("ix_events_stream_recorded_at", "events", ["stream_id", "recorded_at"])
+    op.drop_index("ix_events_stream_occurred_at", table_name="events")
+    # NULL on existing segments; readers fall back to min_occurred_at for them.
+    op.add_column(
+        "event_segments",
+        sa.Column("min_recorded_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("event_segments", "min_recorded_at")
+    op.create_index("ix_events_stream_occurred_at", "events", ["stream_id", "occurred_at"])
+    op.drop_index("ix_events_stream_recorded_at", table_name="events")
+    op.drop_column("events", "recorded_at")
@@ -0,0 +1,32 @@
+"""hourly and daily usage rollups
+
+Revision ID: a6d0e2c94b15
+Revises: f3c81d5a9b27
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "a6d0e2c94b15"
+down_revision: str | None = "f3c81d5a9b27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Starts empty: fill it from existing events with `python -m app.tools.backfill_rollups`.
+    op.create_table(
+        "usage_rollups",
+        sa.Column("account_id", sa.String(), primary_key=True),
+        sa.Column("granularity", sa.String(), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("meter", sa.String(), primary_key=True),
+        sa.Column("units", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("events", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("usage_rollups")
@@ -0,0 +1,22 @@
+"""index events by (stream_id, occurred_at) for point-in-time reads
+
+Revision ID: b47e1c0d8a36
+Revises: a6d0e2c94b15
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision: str = "b47e1c0d8a36"
+down_revision: str | None = "a6d0e2c94b15"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_events_stream_occurred_at", "events", ["stream_id", "occurred_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_stream_occurred_at", table_name="events")
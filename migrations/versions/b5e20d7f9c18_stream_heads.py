@@ -0,0 +1,32 @@
+"""stream head table
+
+Revision ID: b5e20d7f9c18
+Revises: 7c41e9a0b2f3
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "b5e20d7f9c18"
+down_revision: str | None = "7c41e9a0b2f3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "streams",
+        sa.Column("stream_id", sa.String(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+    )
+    # Existing streams get their head from the event log.
+    op.execute(
+        "INSERT INTO streams (stream_id, version) "
+        "SELECT stream_id, max(stream_version) FROM events GROUP BY stream_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("streams")
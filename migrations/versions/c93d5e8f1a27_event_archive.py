@@ -0,0 +1,41 @@
+"""cold-segment archive for closed billing periods
+
+Revision ID: c93d5e8f1a27
+Revises: b47e1c0d8a36
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "c93d5e8f1a27"
+down_revision: str | None = "b47e1c0d8a36"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "streams",
+        sa.Column("archived_through", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "event_segments",
+        sa.Column("stream_id", sa.String(), primary_key=True),
+        sa.Column("first_version", sa.BigInteger(), primary_key=True),
+        sa.Column("last_version", sa.BigInteger(), nullable=False),
+        sa.Column("events", sa.Integer(), nullable=False),
+        sa.Column("min_occurred_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("max_occurred_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()
+        ),
+    )
+
+
+def downgrade() -> None:
+    # Archived events are not moved back: run this on a database without segments only.
+    op.drop_table("event_segments")
+    op.drop_column("streams", "archived_through")
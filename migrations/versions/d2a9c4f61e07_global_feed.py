@@ -0,0 +1,61 @@
+"""global event feed position and projector checkpoints
+
+Revision ID: d2a9c4f61e07
+Revises: b5e20d7f9c18
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "d2a9c4f61e07"
+down_revision: str | None = "b5e20d7f9c18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # bigserial numbers existing rows in physical order; renumber them in commit order.
+    # No column records that order (event_id is random), and occurred_at is client-supplied,
+    # so a backdated event would jump ahead of its stream's earlier versions. Order by the
+    # running max of occurred_at along each stream instead: close to commit order across
+    # streams, and positions always increase with stream_version within a stream.
+    op.execute("ALTER TABLE events ADD COLUMN position BIGSERIAL")
+    op.execute(
+        "UPDATE events SET position = o.rn FROM ("
+        "  SELECT event_id, row_number() OVER (ORDER BY committed, stream_id, stream_version)"
+        "  AS rn FROM ("
+        "    SELECT event_id, stream_id, stream_version, max(occurred_at) OVER ("
+        "      PARTITION BY stream_id ORDER BY stream_version"
+        "      ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS committed"
+        "    FROM events) c"
+        ") o WHERE events.event_id = o.event_id"
+    )
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('events', 'position'), "
+        "coalesce((SELECT max(position) FROM events), 0) + 1, false)"
+    )
+    op.drop_constraint("events_pkey", "events", type_="primary")
+    op.create_primary_key("events_pkey", "events", ["position"])
+    op.create_unique_constraint("uq_events_event_id", "events", ["event_id"])
+
+    op.create_table(
+        "projector_checkpoints",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("position", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("projector_checkpoints")
+    op.drop_constraint("uq_events_event_id", "events", type_="unique")
+    op.drop_constraint("events_pkey", "events", type_="primary")
+    op.create_primary_key("events_pkey", "events", ["event_id"])
+    op.drop_column("events", "position")
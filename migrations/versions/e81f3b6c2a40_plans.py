@@ -0,0 +1,36 @@
+"""plans catalog and remaining quota on account_current
+
+Revision ID: e81f3b6c2a40
+Revises: d2a9c4f61e07
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "e81f3b6c2a40"
+down_revision: str | None = "d2a9c4f61e07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "plans",
+        sa.Column("plan_id", sa.String(), primary_key=True),
+        sa.Column("limits", sa.JSON(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    # Filled in on each account's next write, or all at once by app.tools.rebuild_projections.
+    op.add_column("account_current", sa.Column("remaining", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("account_current", "remaining")
+    op.drop_table("plans")
@@ -0,0 +1,33 @@
+"""compact binary event payloads
+
+Revision ID: f3c81d5a9b27
+Revises: e81f3b6c2a40
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "f3c81d5a9b27"
+down_revision: str | None = "e81f3b6c2a40"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows become payload_codec='json' and read exactly as before; convert them
+    # with `python -m app.tools.recode_payloads` (optional, batched, resumable).
+    op.add_column(
+        "events",
+        sa.Column("payload_codec", sa.String(), nullable=False, server_default="json"),
+    )
+    op.add_column("events", sa.Column("payload_bin", sa.LargeBinary(), nullable=True))
+    op.alter_column("events", "payload", existing_type=sa.JSON(), nullable=True)
+
+
+def downgrade() -> None:
+    # Run `python -m app.tools.recode_payloads --to json` first; compact rows have no JSON.
+    op.alter_column("events", "payload", existing_type=sa.JSON(), nullable=False)
+    op.drop_column("events", "payload_bin")
+    op.drop_column("events", "payload_codec")
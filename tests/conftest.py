@@ -4,7 +4,9 @@ import pytest
 
 from app.infra.db.session import engine
 from app.infra.event_store.models import Base as EventStoreBase
+from app.infra.plans.models import Base as PlanBase
 from app.infra.projections.models import Base as ProjectionBase
+from app.infra.snapshots.models import Base as SnapshotBase
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -15,6 +17,8 @@ def _create_schema() -> None:
     """
     assert os.getenv("DATABASE_URL"), "DATABASE_URL must be set for integration tests"
 
-    # Create both sets of tables (event store + projections) on the same engine.
+    # Create all tables (event store + projections + snapshots) on the same engine.
     EventStoreBase.metadata.create_all(bind=engine)
     ProjectionBase.metadata.create_all(bind=engine)
+    SnapshotBase.metadata.create_all(bind=engine)
+    PlanBase.metadata.create_all(bind=engine)
@@ -0,0 +1,252 @@
+from datetime import timedelta
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.domain.commands import CreateAccount, RecordUsage, ResetPeriod, ShardUsage
+from app.domain.fold import fold
+from app.infra.db.session import SessionLocal
+from app.infra.event_store import archive as archive_module
+from app.infra.event_store.models import Event, EventSegment, Stream
+from app.infra.event_store.pushdown import check_pushdown, pushdown_state
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.event_store.usage_shards import shard_stream_ids
+from app.infra.projections.models import AccountCurrent, UsageRollup
+from app.main import app
+from app.services.account_service import AccountService
+from app.services.point_in_time import states_as_of
+from app.tools.archive_streams import archive
+from app.tools.backfill_rollups import backfill
+from app.tools.rebuild_projections import rebuild
+
+
+def _account() -> tuple[AccountService, str]:
+    """Three periods (2026-01 .. 2026-03) with usage in each; 2026-03 is still open."""
+    account_id = f"arch-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=None, group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    for month in (1, 2, 3):
+        if month > 1:
+            svc.reset_period(ResetPeriod(account_id, f"2026-{month:02d}"))
+        for day in (3, 4):
+            svc.record_usage(
+                RecordUsage(
+                    account_id,
+                    "api_calls",
+                    month * 10 + day,
+                    f"2026-{month:02d}-{day:02d}T12:00:00Z",
+                    f"u{month}-{day}",
+                )
+            )
+    return svc, account_id
+
+
+def _hot_events(account_id: str) -> int:
+    with SessionLocal() as session:
+        return session.execute(
+            select(func.count()).where(Event.stream_id == account_id)
+        ).scalar_one()
+
+
+def _rollups(account_id: str) -> list[tuple]:
+    with SessionLocal() as session:
+        return [
+            (r.granularity, r.bucket_start, r.meter, r.units, r.events)
+            for r in session.execute(
+                select(UsageRollup)
+                .where(UsageRollup.account_id == account_id)
+                .order_by(UsageRollup.granularity, UsageRollup.bucket_start)
+            ).scalars()
+        ]
+
+
+def test_archiving_keeps_every_read_the_same() -> None:
+    svc, account_id = _account()
+    client = TestClient(app)
+    events = svc.store.load_stream(account_id)
+    listing = client.get(f"/v1/accounts/{account_id}/events").json()
+    with SessionLocal() as session:
+        pushed = pushdown_state(session, account_id)
+        as_of = [
+            states_as_of(session, svc.snapshots, [account_id], v)[account_id]
+            for v in range(1, len(events) + 1)
+        ]
+    rollups = _rollups(account_id)
+
+    stats = archive(min_age=timedelta(0), account_ids=[account_id])
+
+    # Everything up to the second reset (create, 2 usage, reset, 2 usage, reset) moved.
+    assert (stats.streams, stats.events) == (1, 7)
+    assert _hot_events(account_id) == 2
+    with SessionLocal() as session:
+        assert session.get(Stream, account_id).archived_through == 7
+        assert session.execute(
+            select(EventSegment.first_version, EventSegment.last_version).where(
+                EventSegment.stream_id == account_id
+            )
+        ).all() == [(1, 7)]
+
+    fresh = AccountService(SqlAlchemyEventStore(), snapshot_every=None, group_commit=None)
+    assert fresh.store.load_stream(account_id) == events
+    assert fresh.get_state(account_id)["used"] == {"api_calls": 33 + 34}
+    assert client.get(f"/v1/accounts/{account_id}/events").json() == listing
+    with SessionLocal() as session:
+        assert pushdown_state(session, account_id) == pushed
+        assert check_pushdown(session, account_id) is None
+        assert [
+            states_as_of(session, svc.snapshots, [account_id], v)[account_id]
+            for v in range(1, len(events) + 1)
+        ] == as_of
+
+    backfill(account_ids=[account_id])
+    assert _rollups(account_id) == rollups
+
+    with SessionLocal() as session:
+        session.get(AccountCurrent, account_id).used = {"api_calls": 999}
+        session.commit()
+    rebuild(workers=1, partitions=1)
+    with SessionLocal() as session:
+        proj = session.get(AccountCurrent, account_id)
+        assert (proj.stream_version, proj.used) == (9, {"api_calls": 33 + 34})
+
+
+def test_event_pages_cross_the_archive_boundary() -> None:
+    svc, account_id = _account()
+    archive(min_age=timedelta(0), account_ids=[account_id])
+    client = TestClient(app)
+
+    seen, after = [], 0
+    while after is not None:
+        page = client.get(f"/v1/accounts/{account_id}/events?after={after}&limit=4").json()
+        seen += [e["stream_version"] for e in page["events"]]
+        after = page["next_after"]
+    assert seen == list(range(1, 10))
+
+    usage = client.get(
+        f"/v1/accounts/{account_id}/events?type=UsageRecorded&from=2026-01-04T00:00:00Z"
+    ).json()
+    assert [e["payload"]["units"] for e in usage["events"]] == [14, 23, 24, 33, 34]
+
+
+def test_appends_and_as_of_timestamps_after_archiving() -> None:
+    svc, account_id = _account()
+    with SessionLocal() as session:
+        at = session.execute(
+            select(Event.recorded_at).where(
+                Event.stream_id == account_id, Event.stream_version == 2
+            )
+        ).scalar_one()
+    archive(min_age=timedelta(0), account_ids=[account_id])
+
+    svc.record_usage(RecordUsage(account_id, "api_calls", 1, "2026-03-05T12:00:00Z", "u3-5"))
+    assert svc.get_state(account_id)["used"] == {"api_calls": 33 + 34 + 1}
+
+    # A timestamp inside the archived range resolves from the segment.
+    view = svc.get_state_as_of(account_id, at)
+    assert (view["stream_version"], view["used"]) == (2, {"api_calls": 13})
+    events = svc.store.load_stream(account_id)
+    assert svc.get_state_as_of(account_id, 10)["used"] == fold(events).used
+
+
+def test_missing_projection_rows_are_rebuilt_from_the_archive_boundary() -> None:
+    svc, account_id = _account()
+    archive(min_age=timedelta(0), account_ids=[account_id])
+    with SessionLocal() as session:
+        session.delete(session.get(AccountCurrent, account_id))
+        session.commit()
+
+    svc.record_usage(RecordUsage(account_id, "api_calls", 1, "2026-03-05T12:00:00Z", "u3-5"))
+    with SessionLocal() as session:
+        row = session.get(AccountCurrent, account_id)
+        assert (row.status, row.plan_id, row.period, row.used, row.stream_version) == (
+            "active",
+            "basic",
+            "2026-03",
+            {"api_calls": 33 + 34 + 1},
+            10,
+        )
+    body = TestClient(app).get(f"/v1/accounts/{account_id}").json()
+    assert (body["source"], body["used"]) == ("projection", {"api_calls": 33 + 34 + 1})
+
+
+def test_usage_sub_streams_are_archived_up_to_the_account_boundary() -> None:
+    account_id = f"arch-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=None, group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    svc.shard_usage(ShardUsage(account_id, 2))
+    for month in (1, 2, 3):
+        if month > 1:
+            svc.reset_period(ResetPeriod(account_id, f"2026-{month:02d}"))
+        for day in range(1, 5):
+            svc.record_usage(
+                RecordUsage(
+                    account_id,
+                    "api_calls",
+                    day,
+                    f"2026-{month:02d}-{day:02d}T12:00:00Z",
+                    f"u{month}-{day}",
+                )
+            )
+    state = svc.get_state(account_id)
+    rollups = _rollups(account_id)
+    shards = shard_stream_ids(account_id, 2)
+
+    stats = archive(min_age=timedelta(0), account_ids=[account_id])
+
+    # The account's stream and both shards, up to the reset that opened 2026-03.
+    assert (stats.streams, stats.events) == (3, 4 + 8)
+    with SessionLocal() as session:
+        hot = session.execute(select(Event.meta).where(Event.stream_id.in_(shards))).scalars().all()
+        assert len(hot) == 4 and {m["period"] for m in hot} == {"2026-03"}
+        assert all(session.get(Stream, sid).archived_through > 0 for sid in shards)
+    assert svc.get_state(account_id) == state
+    backfill(account_ids=[account_id])
+    assert _rollups(account_id) == rollups
+
+    # Usage keeps going to the shards; a re-run has nothing more to move.
+    svc.record_usage(RecordUsage(account_id, "api_calls", 5, "2026-03-05T12:00:00Z", "u3-5"))
+    assert svc.get_state(account_id)["used"] == {"api_calls": 1 + 2 + 3 + 4 + 5}
+    assert archive(min_age=timedelta(0), account_ids=[account_id]).events == 0
+
+
+def test_open_periods_and_recent_resets_stay_hot() -> None:
+    _, account_id = _account()
+
+    assert archive(min_age=timedelta(days=90), account_ids=[account_id]).events == 0
+    assert _hot_events(account_id) == 9
+
+    archive(min_age=timedelta(0), account_ids=[account_id])
+    assert archive(min_age=timedelta(0), account_ids=[account_id]).events == 0
+    assert _hot_events(account_id) == 2
+
+
+def test_segments_are_bounded_and_pages_read_only_theirs(monkeypatch) -> None:
+    svc, account_id = _account()
+    events = svc.store.load_stream(account_id)
+    client = TestClient(app)
+    listing = client.get(f"/v1/accounts/{account_id}/events").json()
+
+    assert archive(min_age=timedelta(0), account_ids=[account_id], segment_events=3).events == 7
+    with SessionLocal() as session:
+        assert session.execute(
+            select(EventSegment.first_version, EventSegment.last_version)
+            .where(EventSegment.stream_id == account_id)
+            .order_by(EventSegment.first_version)
+        ).all() == [(1, 3), (4, 6), (7, 7)]
+
+    decoded: list[int] = []
+    decode = archive_module.decode_segment
+
+    def counting(data: bytes):
+        out = decode(data)
+        decoded.append(out[0].stream_version)
+        return out
+
+    monkeypatch.setattr(archive_module, "decode_segment", counting)
+    page = client.get(f"/v1/accounts/{account_id}/events?after=3&limit=2").json()
+    assert [e["stream_version"] for e in page["events"]] == [4, 5]
+    assert decoded == [4]
+
+    assert client.get(f"/v1/accounts/{account_id}/events").json() == listing
+    assert AccountService(SqlAlchemyEventStore()).store.load_stream(account_id) == events
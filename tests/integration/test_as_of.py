@@ -0,0 +1,127 @@
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+from app.domain.commands import CreateAccount, RecordUsage, ResetPeriod
+from app.domain.errors import NotFound
+from app.domain.fold import fold
+from app.infra.db.session import SessionLocal, engine
+from app.infra.event_store.models import Event
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.main import app
+from app.services.account_service import AccountService
+from app.services.point_in_time import states_as_of
+
+
+def _account(n: int = 12) -> tuple[AccountService, str]:
+    """Usage at 01:00, 02:00, ... on 2026-01-28, a period reset half way, snapshots every 3."""
+    account_id = f"asof-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=3, group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    for i in range(1, n + 1):
+        if i == n // 2:
+            svc.reset_period(ResetPeriod(account_id, "2026-02"))
+        svc.record_usage(
+            RecordUsage(account_id, "api_calls", i, f"2026-01-28T{i:02d}:00:00Z", f"u{i}")
+        )
+        svc.executor.load(account_id)  # leaves snapshots along the way
+    return svc, account_id
+
+
+def test_states_by_version_match_a_prefix_replay() -> None:
+    svc, account_id = _account()
+    events = svc.store.load_stream(account_id)
+
+    with SessionLocal() as session:
+        for version in range(1, len(events) + 1):
+            state, v = states_as_of(session, svc.snapshots, [account_id], version)[account_id]
+            assert (state, v) == (fold(events[:version]), version)
+
+        # Past the head: the current state.
+        state, v = states_as_of(session, svc.snapshots, [account_id], 10_000)[account_id]
+        assert (state, v) == (fold(events), len(events))
+
+
+def _recorded_at(account_id: str, version: int) -> datetime:
+    with SessionLocal() as session:
+        at = session.execute(
+            select(Event.recorded_at).where(
+                Event.stream_id == account_id, Event.stream_version == version
+            )
+        ).scalar_one()
+    return at if at.tzinfo is not None else at.replace(tzinfo=UTC)
+
+
+def test_timestamps_resolve_to_the_last_event_recorded_at_or_before_them() -> None:
+    svc, account_id = _account()
+
+    # Usage at 01:00 .. 12:00 was recorded "now"; a timestamp follows commit order.
+    at = _recorded_at(account_id, 5)
+    view = svc.get_state_as_of(account_id, at)
+    assert view["source"] == "as_of"
+    assert view["as_of"] == at.isoformat().replace("+00:00", "Z")
+    events = svc.store.load_stream(account_id)
+    assert view["stream_version"] == 5
+    assert view["used"] == (fold(events[:5]).used or {})
+
+    # Before anything was recorded, whatever the events' occurred_at.
+    with pytest.raises(NotFound):
+        svc.get_state_as_of(account_id, datetime(2026, 1, 28, 3, 30, tzinfo=UTC))
+
+
+def test_backdated_usage_is_left_out_of_earlier_timestamps() -> None:
+    account_id = f"asof-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=None, group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    svc.record_usage(RecordUsage(account_id, "api_calls", 1, "2026-01-28T10:00:00Z", "u1"))
+    before_backdated = datetime.now(UTC)
+    svc.record_usage(RecordUsage(account_id, "api_calls", 5, "2026-01-28T09:00:00Z", "u2"))
+
+    view = svc.get_state_as_of(account_id, before_backdated)
+    assert (view["stream_version"], view["used"]) == (2, {"api_calls": 1})
+    view = svc.get_state_as_of(account_id, datetime.now(UTC))
+    assert (view["stream_version"], view["used"]) == (3, {"api_calls": 6})
+
+
+def test_batch_cost_does_not_grow_with_accounts() -> None:
+    ids = [_account(n)[1] for n in (4, 8, 12)]
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=3)
+
+    statements: list[str] = []
+
+    def count(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        views = list(svc.states_as_of([*ids, "asof-missing"], 5))
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert [v["account_id"] for v in views] == ids
+    assert all(v["stream_version"] == 5 for v in views)
+    assert len(statements) <= 4
+
+
+def test_as_of_http() -> None:
+    _, account_id = _account(4)
+    client = TestClient(app)
+
+    r = client.get(f"/v1/accounts/{account_id}", params={"as_of": "2"})
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["stream_version"], body["as_of"], body["used"]) == (2, 2, {"api_calls": 1})
+
+    # Usage 2 follows the period reset.
+    at = _recorded_at(account_id, 4).isoformat().replace("+00:00", "Z")
+    r = client.get(f"/v1/accounts/{account_id}", params={"as_of": at})
+    assert r.status_code == 200
+    assert (r.json()["stream_version"], r.json()["used"]) == (4, {"api_calls": 2})
+
+    # Before the account existed.
+    r = client.get(f"/v1/accounts/{account_id}", params={"as_of": "0"})
+    assert r.status_code == 404
+    assert client.get(f"/v1/accounts/{account_id}", params={"as_of": "soon"}).status_code == 422
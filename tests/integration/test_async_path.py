@@ -0,0 +1,72 @@
+import asyncio
+from uuid import uuid4
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.routes import accounts_async
+from app.domain.commands import CreateAccount, RecordUsage
+from app.infra.db.async_session import get_async_engine
+from app.infra.event_store.async_repository import AsyncSqlAlchemyEventStore
+from app.services.async_account_service import AsyncAccountService
+
+
+def test_async_service_round_trip() -> None:
+    account_id = f"async-{uuid4().hex[:8]}"
+
+    async def scenario() -> dict:
+        svc = AsyncAccountService(AsyncSqlAlchemyEventStore(), snapshot_every=2)
+        await svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+        for i in range(3):
+            await svc.record_usage(
+                RecordUsage(account_id, "api_calls", 2, "2026-01-28T01:00:00Z", f"k{i}")
+            )
+        # Retry is idempotent.
+        await svc.record_usage(
+            RecordUsage(account_id, "api_calls", 2, "2026-01-28T01:00:00Z", "k0")
+        )
+        try:
+            return await svc.get_state(account_id)
+        finally:
+            # Pooled connections belong to this event loop; TestClient runs its own.
+            await get_async_engine().dispose()
+
+    state = asyncio.run(scenario())
+    assert state["used"] == {"api_calls": 6}
+    assert state["stream_version"] == 4
+
+
+def test_async_routes_serve_same_contract() -> None:
+    app = FastAPI()
+    app.include_router(accounts_async.router, prefix="/v1/accounts")
+    client = TestClient(app)
+    account_id = f"async-{uuid4().hex[:8]}"
+
+    r = client.post(
+        "/v1/accounts",
+        json={"account_id": account_id, "initial_plan_id": "basic", "period": "2026-01"},
+    )
+    assert r.status_code == 201, r.text
+
+    r = client.post(
+        f"/v1/accounts/{account_id}/usage",
+        headers={"Idempotency-Key": "u1"},
+        json={"meter": "api_calls", "units": 3, "occurred_at": "2026-01-28T01:30:00Z"},
+    )
+    assert r.status_code == 200, r.text
+
+    assert (
+        client.post(f"/v1/accounts/{account_id}/suspend", json={"reason": "x"}).status_code == 200
+    )
+    r = client.post(
+        f"/v1/accounts/{account_id}/usage",
+        headers={"Idempotency-Key": "u2"},
+        json={"meter": "api_calls", "units": 1, "occurred_at": "2026-01-28T01:31:00Z"},
+    )
+    assert r.status_code == 409
+
+    s = client.get(f"/v1/accounts/{account_id}").json()
+    assert s["source"] == "projection"
+    assert s["status"] == "suspended"
+    assert s["used"]["api_calls"] == 3
+    assert len(client.get(f"/v1/accounts/{account_id}/events").json()["events"]) == 3
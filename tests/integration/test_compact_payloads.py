@@ -0,0 +1,110 @@
+import random
+from uuid import uuid4
+
+from sqlalchemy import insert, select
+
+from app.domain.commands import CreateAccount, RecordUsage, ResetPeriod
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.models import Event
+from app.infra.event_store.pushdown import check_pushdown
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.services.account_service import AccountService
+from app.tools.recode_payloads import recode
+
+
+def _account(store: SqlAlchemyEventStore, rng: random.Random) -> str:
+    account_id = f"codec-{uuid4().hex[:8]}"
+    svc = AccountService(store, snapshot_every=0, group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    for i in range(20):
+        if i == 10:
+            svc.reset_period(ResetPeriod(account_id, "2026-02"))
+        svc.record_usage(
+            RecordUsage(
+                account_id,
+                rng.choice(["api_calls", "storage_mb"]),
+                rng.randint(1, 9),
+                "2026-01-28T01:00:00Z",
+                f"u{i}",
+            )
+        )
+    return account_id
+
+
+def _codecs(account_id: str) -> set[str]:
+    with SessionLocal() as session:
+        return set(
+            session.execute(
+                select(Event.payload_codec).where(Event.stream_id == account_id)
+            ).scalars()
+        )
+
+
+def _contents(store: SqlAlchemyEventStore, account_id: str) -> list[tuple]:
+    return [
+        (e.event_type, e.schema_version, e.payload, e.idempotency_key)
+        for e in store.load_stream(account_id)
+    ]
+
+
+def test_compact_rows_read_like_json_rows() -> None:
+    json_id = _account(SqlAlchemyEventStore(codec="json"), random.Random(18))
+    compact_id = _account(SqlAlchemyEventStore(codec="compact"), random.Random(18))
+
+    assert _codecs(json_id) == {"json"}
+    assert _codecs(compact_id) == {"compact"}
+
+    store = SqlAlchemyEventStore()
+    assert _contents(store, json_id) == _contents(store, compact_id)
+
+    svc = AccountService(store, snapshot_every=0, group_commit=None)
+    assert svc.executor.load(json_id) == svc.executor.load(compact_id)
+    with SessionLocal() as session:
+        assert check_pushdown(session, compact_id) is None
+
+
+def test_recode_round_trip_and_mixed_streams() -> None:
+    account_id = _account(SqlAlchemyEventStore(codec="json"), random.Random(5))
+    store = SqlAlchemyEventStore()
+    before = store.load_stream(account_id)
+
+    stats = recode(to="compact", batch_size=7)
+    assert stats.recoded >= len(before)
+    assert _codecs(account_id) == {"compact"}
+    assert store.load_stream(account_id) == before
+
+    # New JSON appends on a recoded stream: a mixed stream still folds and pushes down.
+    AccountService(SqlAlchemyEventStore(codec="json"), group_commit=None).record_usage(
+        RecordUsage(account_id, "api_calls", 4, "2026-01-28T01:00:00Z", "mixed")
+    )
+    assert _codecs(account_id) == {"compact", "json"}
+    with SessionLocal() as session:
+        assert check_pushdown(session, account_id) is None
+
+    recode(to="json")
+    assert _codecs(account_id) == {"json"}
+    assert store.load_stream(account_id)[: len(before)] == before
+
+
+def test_v1_usage_rows_are_upcast_on_read() -> None:
+    account_id = f"codec-{uuid4().hex[:8]}"
+    store = SqlAlchemyEventStore()
+    AccountService(store, group_commit=None).create_account(
+        CreateAccount(account_id, "basic", "2026-01")
+    )
+    with SessionLocal() as session:
+        session.execute(
+            insert(Event).values(
+                event_id=str(uuid4()),
+                stream_id=account_id,
+                stream_version=2,
+                event_type="UsageRecorded",
+                event_schema_version=1,
+                payload={"meter": "api_calls", "units": 5},
+                meta={},
+            )
+        )
+        session.commit()
+
+    usage = store.load_stream(account_id)[1]
+    assert (usage.schema_version, usage.payload["source"]) == (2, "api")
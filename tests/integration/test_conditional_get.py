@@ -0,0 +1,46 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.infra.db.session import engine
+from app.main import app
+
+
+def test_etag_and_cached_reads() -> None:
+    client = TestClient(app)
+    account_id = f"etag-{uuid4().hex[:8]}"
+    client.post(
+        "/v1/accounts",
+        json={"account_id": account_id, "initial_plan_id": "basic", "period": "2026-01"},
+    )
+
+    r = client.get(f"/v1/accounts/{account_id}")
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert etag == 'W/"1"'
+
+    statements: list[str] = []
+
+    def count(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        r = client.get(f"/v1/accounts/{account_id}", headers={"If-None-Match": etag})
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert r.status_code == 304
+    assert r.content == b""
+    assert statements == []  # answered from the read cache
+
+    # An append invalidates the cached state and moves the ETag.
+    client.post(
+        f"/v1/accounts/{account_id}/usage",
+        headers={"Idempotency-Key": "u1"},
+        json={"meter": "api_calls", "units": 3, "occurred_at": "2026-01-28T01:00:00Z"},
+    )
+    r = client.get(f"/v1/accounts/{account_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] == 'W/"2"'
+    assert r.json()["used"] == {"api_calls": 3}
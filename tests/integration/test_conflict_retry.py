@@ -0,0 +1,148 @@
+import threading
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_account_service, get_async_account_service
+from app.domain.commands import CreateAccount, RecordUsage
+from app.domain.errors import ConcurrencyConflict
+from app.domain.events import EventEnvelope
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.metrics import Metrics
+from app.main import app
+from app.services.account_service import AccountService
+from app.services.stream_locks import KeyedLocks
+from app.services.unit_of_work import CommandExecutor, ConflictRetry
+
+
+def _usage_event(key: str) -> EventEnvelope:
+    return EventEnvelope(
+        event_type="UsageRecorded",
+        schema_version=2,
+        occurred_at="2026-01-28T01:00:00Z",
+        payload={"meter": "api_calls", "units": 1, "source": "api"},
+        idempotency_key=key,
+    )
+
+
+class _RacingExecutor(CommandExecutor):
+    """Another process appends to the stream right after each of the first `races` hydrations."""
+
+    def __init__(self, races: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.races = races
+        self.other = SqlAlchemyEventStore()
+
+    def _decide_and_append(self, session, hydrated, stream_id, cmd, require_exists):
+        if self.races:
+            self.races -= 1
+            _, version, _ = hydrated
+            self.other.append(stream_id, version, [_usage_event(f"other-{uuid4().hex[:6]}")])
+        return super()._decide_and_append(session, hydrated, stream_id, cmd, require_exists)
+
+
+def _account() -> str:
+    account_id = f"race-{uuid4().hex[:8]}"
+    AccountService(SqlAlchemyEventStore(), group_commit=None).create_account(
+        CreateAccount(account_id, "basic", "2026-01")
+    )
+    return account_id
+
+
+def _executor(races: int, attempts: int = 3) -> _RacingExecutor:
+    return _RacingExecutor(
+        races,
+        store=SqlAlchemyEventStore(metrics=Metrics(enabled=True)),
+        snapshot_every=0,
+        retry=ConflictRetry(attempts=attempts, base_ms=1, max_ms=2),
+    )
+
+
+def _value(metrics: Metrics, name: str) -> float:
+    for line in metrics.render().splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[1])
+    return 0
+
+
+def _usage(account_id: str, key: str) -> RecordUsage:
+    return RecordUsage(account_id, "api_calls", 1, "2026-01-28T02:00:00Z", key)
+
+
+def test_lost_race_is_redecided_on_the_newer_state() -> None:
+    account_id = _account()
+    executor = _executor(races=2)
+
+    # Created (1), two racing appends (2, 3), then ours.
+    assert executor.execute(account_id, _usage(account_id, "mine")) == 4
+
+    m = executor.metrics
+    assert _value(m, "quota_ledger_conflicts_total") == 2
+    assert _value(m, "quota_ledger_conflict_retries_total") == 2
+    assert _value(m, "quota_ledger_conflicts_exhausted_total") == 0
+    assert len(executor.store.load_stream(account_id)) == 4
+
+
+def test_retries_are_bounded() -> None:
+    account_id = _account()
+    executor = _executor(races=10, attempts=2)
+
+    with pytest.raises(ConcurrencyConflict):
+        executor.execute(account_id, _usage(account_id, "mine"))
+
+    m = executor.metrics
+    assert _value(m, "quota_ledger_conflicts_total") == 3
+    assert _value(m, "quota_ledger_conflicts_exhausted_total") == 1
+
+
+def test_commands_on_one_stream_do_not_race_within_a_process() -> None:
+    account_id = _account()
+    metrics = Metrics(enabled=True)
+    svc = AccountService(SqlAlchemyEventStore(metrics=metrics), group_commit=None)
+    svc.executor.stream_locks = KeyedLocks()
+    svc.executor.retry = ConflictRetry(attempts=0)
+
+    versions: list[int] = []
+    errors: list[Exception] = []
+
+    def record(n: int) -> None:
+        try:
+            versions.append(svc.record_usage(_usage(account_id, f"t{n}")))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert sorted(versions) == list(range(2, 10))
+    assert _value(metrics, "quota_ledger_conflicts_total") == 0
+
+
+class _Conflicting:
+    def record_usage(self, cmd):
+        raise ConcurrencyConflict(f"Concurrency conflict for stream '{cmd.account_id}'")
+
+
+class _AsyncConflicting:
+    async def record_usage(self, cmd):
+        raise ConcurrencyConflict(f"Concurrency conflict for stream '{cmd.account_id}'")
+
+
+def test_unresolved_conflict_is_a_409() -> None:
+    app.dependency_overrides[get_account_service] = _Conflicting
+    app.dependency_overrides[get_async_account_service] = _AsyncConflicting
+    try:
+        r = TestClient(app).post(
+            "/v1/accounts/a1/usage",
+            headers={"Idempotency-Key": "k"},
+            json={"meter": "api_calls", "units": 1, "occurred_at": "2026-01-28T01:00:00Z"},
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 409
+    assert "Concurrency conflict" in r.json()["detail"]
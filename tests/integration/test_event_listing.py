@@ -0,0 +1,65 @@
+import json
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _account_with_usage(client: TestClient, n: int) -> str:
+    account_id = f"evt-{uuid4().hex[:8]}"
+    client.post(
+        "/v1/accounts",
+        json={"account_id": account_id, "initial_plan_id": "basic", "period": "2026-01"},
+    )
+    for i in range(n):
+        client.post(
+            f"/v1/accounts/{account_id}/usage",
+            headers={"Idempotency-Key": f"u{i}"},
+            json={"meter": "api_calls", "units": 1, "occurred_at": f"2026-01-{10 + i}T00:00:00Z"},
+        )
+    return account_id
+
+
+def test_keyset_pagination_walks_whole_stream() -> None:
+    client = TestClient(app)
+    account_id = _account_with_usage(client, 5)
+
+    seen, after = [], 0
+    while True:
+        page = client.get(f"/v1/accounts/{account_id}/events?after={after}&limit=2").json()
+        seen += [e["stream_version"] for e in page["events"]]
+        if page["next_after"] is None:
+            break
+        after = page["next_after"]
+
+    assert seen == [1, 2, 3, 4, 5, 6]
+
+
+def test_type_and_time_filters() -> None:
+    client = TestClient(app)
+    account_id = _account_with_usage(client, 5)
+
+    r = client.get(
+        f"/v1/accounts/{account_id}/events",
+        params={
+            "type": "UsageRecorded",
+            "from": "2026-01-11T00:00:00Z",
+            "to": "2026-01-13T00:00:00Z",
+        },
+    )
+    events = r.json()["events"]
+    assert [e["idempotency_key"] for e in events] == ["u1", "u2"]
+
+    r = client.get(f"/v1/accounts/{account_id}/events", params={"from": "yesterday"})
+    assert r.status_code == 422
+
+
+def test_ndjson_streams_one_event_per_line() -> None:
+    client = TestClient(app)
+    account_id = _account_with_usage(client, 3)
+
+    r = client.get(f"/v1/accounts/{account_id}/events", headers={"Accept": "application/x-ndjson"})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [e["type"] for e in lines] == ["AccountCreated"] + ["UsageRecorded"] * 3
@@ -0,0 +1,90 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+import pytest
+
+from app.domain.commands import CreateAccount, RecordUsage, ShardUsage, SuspendAccount
+from app.domain.errors import InvariantViolation, NotFound
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.services.account_service import AccountService
+from app.services.group_commit import UsageGroupCommitter
+from app.services.unit_of_work import CommandExecutor
+
+
+def _usage(account_id: str, key: str) -> RecordUsage:
+    return RecordUsage(account_id, "api_calls", 1, "2026-01-28T01:00:00Z", key)
+
+
+def test_concurrent_usage_is_coalesced_into_few_commits() -> None:
+    account_id = f"gc-{uuid4().hex[:8]}"
+    committer = UsageGroupCommitter(
+        CommandExecutor(SqlAlchemyEventStore()), window_ms=50, max_batch=100
+    )
+    svc = AccountService(SqlAlchemyEventStore(), group_commit=committer)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        versions = list(
+            pool.map(lambda i: svc.record_usage(_usage(account_id, f"k{i}")), range(20))
+        )
+
+    assert sorted(versions) == list(range(2, 22))
+    assert committer.batches_committed < 20
+    assert svc.get_state(account_id)["used"]["api_calls"] == 20
+
+    # Retries resolve to the original version.
+    assert svc.record_usage(_usage(account_id, "k3")) == versions[3]
+
+
+def test_each_caller_gets_its_own_error() -> None:
+    account_id = f"gc-{uuid4().hex[:8]}"
+    committer = UsageGroupCommitter(CommandExecutor(SqlAlchemyEventStore()), window_ms=1)
+    svc = AccountService(SqlAlchemyEventStore(), group_commit=committer)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    svc.suspend_account(SuspendAccount(account_id, "manual"))
+
+    with pytest.raises(InvariantViolation):
+        svc.record_usage(_usage(account_id, "k1"))
+    with pytest.raises(NotFound):
+        svc.record_usage(_usage(f"gc-missing-{uuid4().hex[:8]}", "k1"))
+
+
+def test_cancelled_waiters_do_not_stop_the_flusher() -> None:
+    account_id = f"gc-{uuid4().hex[:8]}"
+    committer = UsageGroupCommitter(CommandExecutor(SqlAlchemyEventStore()), window_ms=100)
+    svc = AccountService(SqlAlchemyEventStore(), group_commit=committer)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+
+    # The caller gives up while its command waits in the window.
+    assert committer.enqueue(_usage(account_id, "gone")).cancel()
+    assert committer.enqueue(_usage(account_id, "k1")).result(timeout=5) == 2
+    assert committer.enqueue(_usage(account_id, "k2")).result(timeout=5) == 3
+    assert svc.get_state(account_id)["used"]["api_calls"] == 2
+
+
+def test_sharded_usage_runs_beside_the_flusher(monkeypatch) -> None:
+    sharded, plain = f"gc-{uuid4().hex[:8]}", f"gc-{uuid4().hex[:8]}"
+    executor = CommandExecutor(SqlAlchemyEventStore())
+    committer = UsageGroupCommitter(executor, window_ms=1)
+    svc = AccountService(SqlAlchemyEventStore(), group_commit=committer)
+    svc.create_account(CreateAccount(sharded, "basic", "2026-01"))
+    svc.create_account(CreateAccount(plain, "basic", "2026-01"))
+    svc.shard_usage(ShardUsage(sharded, 4))
+    # The first one goes through a batch, which tells the executor the account is sharded.
+    assert svc.record_usage(_usage(sharded, "k0")) == 3
+
+    release = threading.Event()
+    execute = executor.execute
+
+    def slow(stream_id: str, cmd, **kwargs) -> int:
+        release.wait(5)
+        return execute(stream_id, cmd, **kwargs)
+
+    monkeypatch.setattr(executor, "execute", slow)
+    held = committer.enqueue(_usage(sharded, "k1"))
+    # The flusher is free while the sharded command waits.
+    assert committer.enqueue(_usage(plain, "k1")).result(timeout=5) == 2
+    assert not held.done()
+    release.set()
+    assert held.result(timeout=5) == 4
@@ -0,0 +1,51 @@
+from uuid import uuid4
+
+from sqlalchemy import event
+
+from app.domain.commands import CreateAccount, RecordUsage
+from app.infra.db.session import engine
+from app.infra.event_store.idempotency import IdempotencyCache
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.services.account_service import AccountService
+
+
+def _usage(account_id: str, key: str) -> RecordUsage:
+    return RecordUsage(account_id, "api_calls", 1, "2026-01-28T01:00:00Z", key)
+
+
+def test_retry_is_answered_without_the_database() -> None:
+    account_id = f"idem-{uuid4().hex[:8]}"
+    cache = IdempotencyCache()
+    svc = AccountService(SqlAlchemyEventStore(idempotency=cache))
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    version = svc.record_usage(_usage(account_id, "k1"))
+
+    statements = []
+
+    def count(*args) -> None:
+        statements.append(args)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert svc.record_usage(_usage(account_id, "k1")) == version
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert statements == []
+    assert cache.stats()["hits"] == 1
+
+
+def test_bloom_skip_falls_back_to_replay_on_collision() -> None:
+    account_id = f"idem-{uuid4().hex[:8]}"
+    worker_a = AccountService(SqlAlchemyEventStore(idempotency=IdempotencyCache()))
+    worker_b_cache = IdempotencyCache(bloom_bits=1024)
+    worker_b = AccountService(SqlAlchemyEventStore(idempotency=worker_b_cache))
+
+    worker_a.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    worker_b.record_usage(_usage(account_id, "from-b"))  # worker B now tracks the stream
+    version = worker_a.record_usage(_usage(account_id, "from-a"))
+
+    # Worker B has never seen "from-a": it skips the SELECT, collides, and replays.
+    assert worker_b.record_usage(_usage(account_id, "from-a")) == version
+    assert worker_b_cache.stats()["bloom_skips"] == 1
+    assert len(worker_a.store.load_stream(account_id)) == 3
@@ -0,0 +1,45 @@
+from uuid import uuid4
+
+from app.domain.commands import CreateAccount, RecordUsage
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.invalidation import MemoryInvalidationBus, subscribe_caches
+from app.infra.metrics import Metrics
+from app.infra.plans.catalog import PlanCatalog, save_plan
+from app.infra.projections.state_cache import AccountStateCache
+from app.services.account_service import AccountService
+
+
+def _worker(bus: MemoryInvalidationBus) -> AccountService:
+    cache = AccountStateCache(max_entries=100, ttl_seconds=60)
+    subscribe_caches(bus, cache, PlanCatalog())
+    store = SqlAlchemyEventStore(state_cache=cache, bus=bus)
+    return AccountService(store, group_commit=None)
+
+
+def test_appends_in_one_worker_invalidate_the_others() -> None:
+    metrics = Metrics(enabled=True)
+    bus = MemoryInvalidationBus(metrics=metrics)
+    a, b = _worker(bus), _worker(bus)
+    account_id = f"bus-{uuid4().hex[:8]}"
+
+    a.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    assert b.get_state(account_id)["used"] == {}
+    assert b.store.state_cache.get(account_id) is not None
+
+    a.record_usage(RecordUsage(account_id, "api_calls", 3, "2026-01-28T02:00:00Z", "k1"))
+    # Without the bus, b would serve the cached view until its 60 s TTL ran out.
+    assert b.get_state(account_id)["used"] == {"api_calls": 3}
+    assert 'quota_ledger_invalidations_published_total{bus="memory"} 2\n' in metrics.render()
+
+
+def test_plan_edits_reload_the_other_workers_catalogs() -> None:
+    bus = MemoryInvalidationBus()
+    plans = PlanCatalog(ttl_seconds=60)
+    subscribe_caches(bus, AccountStateCache(max_entries=10, ttl_seconds=60), plans)
+    plan_id = f"plan-{uuid4().hex[:8]}"
+
+    save_plan(plan_id, {"api_calls": 5}, catalog=PlanCatalog(), bus=bus)
+    assert plans.get(plan_id).limits == {"api_calls": 5}
+    save_plan(plan_id, {"api_calls": 10}, catalog=PlanCatalog(), bus=bus)
+    # Without the bus, the catalog would serve the old limits until its 60 s TTL ran out.
+    assert plans.get(plan_id).limits == {"api_calls": 10}
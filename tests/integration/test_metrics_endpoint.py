@@ -0,0 +1,60 @@
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.domain.commands import CreateAccount, RecordUsage
+from app.domain.errors import ConcurrencyConflict
+from app.domain.events import EventEnvelope
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.metrics import Metrics, start_request_timings
+from app.main import app
+from app.services.account_service import AccountService
+
+
+def _usage(account_id: str, key: str) -> RecordUsage:
+    return RecordUsage(account_id, "api_calls", 1, "2026-01-28T01:00:00Z", key)
+
+
+def test_write_path_is_instrumented() -> None:
+    metrics = Metrics(enabled=True)
+    svc = AccountService(SqlAlchemyEventStore(metrics=metrics), snapshot_every=0)
+    account_id = f"met-{uuid4().hex[:8]}"
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+
+    timings = start_request_timings()
+    svc.record_usage(_usage(account_id, "k1"))
+    svc.record_usage(_usage(account_id, "k1"))  # retry: answered from the cache, no replay
+
+    for stage in ("pool_checkout", "load_stream", "fold", "decide", "insert", "commit"):
+        assert stage in timings
+
+    text = metrics.render()
+    assert "quota_ledger_events_appended_total 2\n" in text
+    assert 'quota_ledger_idempotent_hits_total{source="cache"} 1\n' in text
+    assert "quota_ledger_replay_events_count 2\n" in text
+
+
+def test_conflicts_are_counted() -> None:
+    metrics = Metrics(enabled=True)
+    store = SqlAlchemyEventStore(metrics=metrics)
+    svc = AccountService(store, snapshot_every=0)
+    account_id = f"met-{uuid4().hex[:8]}"
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+
+    stale = store.load_stream(account_id)
+    stale_usage = EventEnvelope(
+        event_type="UsageRecorded",
+        schema_version=1,
+        occurred_at="2026-01-28T01:00:00Z",
+        payload={"meter": "api_calls", "units": 1},
+    )
+    svc.record_usage(_usage(account_id, "k1"))
+    with pytest.raises(ConcurrencyConflict):
+        store.append(account_id, len(stale), [stale_usage])
+    assert "quota_ledger_conflicts_total 1\n" in metrics.render()
+
+
+def test_metrics_endpoint_is_off_by_default() -> None:
+    r = TestClient(app).get("/metrics")
+    assert r.status_code == 404
@@ -0,0 +1,84 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+from app.infra.db.session import SessionLocal
+from app.infra.plans.catalog import get_plan_catalog
+from app.infra.plans.models import PlanRecord
+from app.main import app
+from app.tools.set_plan import main as set_plan
+
+
+def _plan(limits: dict[str, int]) -> str:
+    plan_id = f"plan-{uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        session.add(PlanRecord(plan_id=plan_id, limits=limits))
+        session.commit()
+    get_plan_catalog().invalidate()
+    return plan_id
+
+
+def _use(client: TestClient, account_id: str, key: str, units: int):
+    return client.post(
+        f"/v1/accounts/{account_id}/usage",
+        headers={"Idempotency-Key": key},
+        json={"meter": "api_calls", "units": units, "occurred_at": "2026-01-28T01:00:00Z"},
+    )
+
+
+def test_limits_follow_plan_changes_and_period_resets() -> None:
+    client = TestClient(app)
+    small, large = _plan({"api_calls": 5}), _plan({"api_calls": 20})
+    account_id = f"lim-{uuid4().hex[:8]}"
+    client.post(
+        "/v1/accounts",
+        json={"account_id": account_id, "initial_plan_id": small, "period": "2026-01"},
+    )
+
+    assert _use(client, account_id, "u1", 4).status_code == 200
+    assert client.get(f"/v1/accounts/{account_id}").json()["remaining"] == {"api_calls": 1}
+    r = _use(client, account_id, "u2", 2)
+    assert r.status_code == 409, r.text
+
+    assert (
+        client.post(f"/v1/accounts/{account_id}/plan", json={"plan_id": large}).status_code == 200
+    )
+    assert client.get(f"/v1/accounts/{account_id}").json()["remaining"] == {"api_calls": 16}
+    assert _use(client, account_id, "u3", 16).status_code == 200
+    assert _use(client, account_id, "u4", 1).status_code == 409
+
+    r = client.post(f"/v1/accounts/{account_id}/period", json={"period": "2026-02"})
+    assert r.status_code == 200, r.text
+    s = client.get(f"/v1/accounts/{account_id}").json()
+    assert (s["used"], s["remaining"]) == ({}, {"api_calls": 20})
+    assert _use(client, account_id, "u5", 20).status_code == 200
+
+
+def test_remaining_follows_edits_to_plan_limits() -> None:
+    client = TestClient(app)
+    plan_id = _plan({"api_calls": 5})
+    account_id = f"lim-{uuid4().hex[:8]}"
+    client.post(
+        "/v1/accounts",
+        json={"account_id": account_id, "initial_plan_id": plan_id, "period": "2026-01"},
+    )
+    assert _use(client, account_id, "u1", 3).status_code == 200
+
+    with SessionLocal() as session:
+        session.get(PlanRecord, plan_id).limits = {"api_calls": 10}
+        session.commit()
+    get_plan_catalog().invalidate()
+
+    # No write since the edit, yet neither the read nor the limit check is stale.
+    assert client.get(f"/v1/accounts/{account_id}", params={"max_lag": 0}).json()["remaining"] == {
+        "api_calls": 7
+    }
+    assert _use(client, account_id, "u2", 7).status_code == 200
+
+
+def test_set_plan_tool_replaces_limits() -> None:
+    plan_id = _plan({"api_calls": 5, "storage_mb": 1})
+    assert get_plan_catalog().get(plan_id).limits == {"api_calls": 5, "storage_mb": 1}
+
+    set_plan([plan_id, "api_calls=7"])
+    assert get_plan_catalog().get(plan_id).limits == {"api_calls": 7}
@@ -2,6 +2,8 @@ import os
 
 from fastapi.testclient import TestClient
 
+from app.infra.db.session import SessionLocal
+from app.infra.projections.models import AccountCurrent
 from app.main import app
 
 
@@ -23,3 +25,34 @@ def test_projection_updates_on_append() -> None:
     s = client.get("/v1/accounts/p1").json()
     assert s["source"] == "projection"
     assert s["used"]["api_calls"] == 3
+
+
+def test_projection_rebuilds_when_row_has_gap() -> None:
+    client = TestClient(app)
+    client.post(
+        "/v1/accounts", json={"account_id": "p2", "initial_plan_id": "basic", "period": "2026-01"}
+    )
+    for i in range(2):
+        client.post(
+            "/v1/accounts/p2/usage",
+            headers={"Idempotency-Key": f"p2-u{i}"},
+            json={"meter": "api_calls", "units": 2, "occurred_at": "2026-01-28T01:30:00Z"},
+        )
+
+    # Corrupt the row so it no longer sits at the stream head.
+    with SessionLocal() as session:
+        proj = session.get(AccountCurrent, "p2")
+        proj.stream_version = 1
+        proj.used = {"api_calls": 999}
+        session.commit()
+
+    r = client.post(
+        "/v1/accounts/p2/usage",
+        headers={"Idempotency-Key": "p2-u2"},
+        json={"meter": "api_calls", "units": 2, "occurred_at": "2026-01-28T01:31:00Z"},
+    )
+    assert r.status_code == 200, r.text
+
+    s = client.get("/v1/accounts/p2").json()
+    assert s["stream_version"] == 4
+    assert s["used"]["api_calls"] == 6
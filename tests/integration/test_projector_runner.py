@@ -0,0 +1,104 @@
+from uuid import uuid4
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.domain.commands import CreateAccount, RecordUsage
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.feed import CatchUpSubscription
+from app.infra.event_store.models import Base as EventStoreBase
+from app.infra.event_store.models import Event
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.projections.account_current import AccountCurrentProjector
+from app.infra.projections.models import AccountCurrent
+from app.infra.projections.runner import ProjectorRunner
+from app.services.account_service import AccountService
+
+
+def _service() -> AccountService:
+    return AccountService(SqlAlchemyEventStore(inline_projections=False), group_commit=None)
+
+
+def _use(svc: AccountService, account_id: str, key: str) -> int:
+    return svc.record_usage(
+        RecordUsage(
+            account_id=account_id,
+            meter="api_calls",
+            units=2,
+            occurred_at="2026-01-28T01:00:00Z",
+            idempotency_key=key,
+        )
+    )
+
+
+def _runner() -> ProjectorRunner:
+    return ProjectorRunner(AccountCurrentProjector(), gap_timeout=0)
+
+
+def test_runner_catches_up_and_resumes_from_checkpoint() -> None:
+    account_id = f"feed-{uuid4().hex[:8]}"
+    svc = _service()
+    svc.create_account(
+        CreateAccount(account_id=account_id, initial_plan_id="basic", period="2026-01")
+    )
+    _use(svc, account_id, "u1")
+
+    with SessionLocal() as session:
+        assert session.get(AccountCurrent, account_id) is None
+
+    assert _runner().catch_up() >= 2
+    with SessionLocal() as session:
+        proj = session.get(AccountCurrent, account_id)
+        assert (proj.stream_version, proj.used) == (2, {"api_calls": 2})
+
+    # A fresh runner starts at the stored checkpoint and only sees what came after it.
+    _use(svc, account_id, "u2")
+    assert _runner().catch_up() == 1
+    with SessionLocal() as session:
+        proj = session.get(AccountCurrent, account_id)
+        assert (proj.stream_version, proj.used) == (3, {"api_calls": 4})
+
+
+def test_stale_projection_falls_back_to_replay() -> None:
+    account_id = f"feed-{uuid4().hex[:8]}"
+    svc = _service()
+    svc.create_account(
+        CreateAccount(account_id=account_id, initial_plan_id="basic", period="2026-01")
+    )
+    _runner().catch_up()
+    _use(svc, account_id, "u1")
+
+    s = svc.get_state(account_id)
+    assert (s["source"], s["stream_version"]) == ("replay", 2)
+
+    s = svc.get_state(account_id, max_lag=1)
+    assert (s["source"], s["stream_version"]) == ("projection", 1)
+
+
+def test_subscription_waits_for_gaps_to_settle() -> None:
+    engine = create_engine("sqlite://")
+    EventStoreBase.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+
+    with session_factory() as session:
+        for position in (1, 2, 4):
+            session.add(
+                Event(
+                    position=position,
+                    event_id=str(uuid4()),
+                    stream_id="gap",
+                    stream_version=position,
+                    event_type="UsageRecorded",
+                    event_schema_version=2,
+                    payload={"meter": "api_calls", "units": 1, "source": "api"},
+                )
+            )
+        session.commit()
+
+        # Position 3 may still be in flight: stop short of it.
+        waiting = CatchUpSubscription(gap_timeout=60)
+        assert [e.position for e in waiting.poll(session)] == [1, 2]
+
+        # Once the head that was seen beyond the hole is old enough, the hole is skipped.
+        settled = CatchUpSubscription(gap_timeout=0)
+        assert [e.position for e in settled.poll(session)] == [1, 2, 4]
@@ -0,0 +1,60 @@
+import random
+from uuid import uuid4
+
+from app.domain.commands import ChangePlan, CreateAccount, RecordUsage, ResetPeriod, SuspendAccount
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.services.account_service import AccountService
+from app.services.unit_of_work import CommandExecutor
+from app.tools.check_pushdown import check_streams
+
+
+def _random_account(rng: random.Random) -> str:
+    account_id = f"push-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    month = 1
+    for i in range(rng.randint(5, 40)):
+        roll = rng.random()
+        if roll < 0.05:
+            month += 1
+            svc.reset_period(ResetPeriod(account_id, f"2026-{month:02d}"))
+        elif roll < 0.1:
+            svc.change_plan(ChangePlan(account_id, rng.choice(["basic", "pro"])))
+        else:
+            svc.record_usage(
+                RecordUsage(
+                    account_id,
+                    rng.choice(["api_calls", "storage_mb"]),
+                    rng.randint(1, 20),
+                    "2026-01-28T01:00:00Z",
+                    f"u{i}",
+                )
+            )
+    return account_id
+
+
+def test_pushdown_matches_fold() -> None:
+    rng = random.Random(14)
+    ids = [_random_account(rng) for _ in range(8)]
+
+    suspended = ids[0]
+    AccountService(SqlAlchemyEventStore(), group_commit=None).suspend_account(
+        SuspendAccount(suspended, "manual")
+    )
+
+    assert check_streams(ids) == []
+
+
+def test_pushdown_hydration_serves_commands() -> None:
+    rng = random.Random(7)
+    account_id = _random_account(rng)
+    folded = CommandExecutor(SqlAlchemyEventStore()).load(account_id)
+
+    executor = CommandExecutor(SqlAlchemyEventStore(), hydration_mode="pushdown")
+    assert executor.load(account_id) == folded
+
+    version = executor.execute(
+        account_id,
+        RecordUsage(account_id, "api_calls", 1, "2026-01-28T02:00:00Z", "pushdown-1"),
+    )
+    assert version == folded[1] + 1
@@ -0,0 +1,64 @@
+from uuid import uuid4
+
+from sqlalchemy import select
+
+from app.domain.aggregate import apply_event
+from app.domain.commands import CreateAccount, RecordUsage
+from app.domain.types import AccountQuotaState
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.snapshots.models import AccountSnapshot
+from app.services.account_service import AccountService
+
+
+def _record(svc: AccountService, account_id: str, n: int) -> None:
+    for i in range(n):
+        svc.record_usage(
+            RecordUsage(account_id, "api_calls", 1, "2026-01-28T01:00:00Z", f"{account_id}-{i}")
+        )
+
+
+def test_hydration_from_snapshot_matches_full_replay() -> None:
+    account_id = f"snap-{uuid4().hex[:8]}"
+    store = SqlAlchemyEventStore()
+    svc = AccountService(store, snapshot_every=3)
+
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    _record(svc, account_id, 7)
+
+    with SessionLocal() as session:
+        versions = (
+            session.execute(
+                select(AccountSnapshot.stream_version).where(
+                    AccountSnapshot.stream_id == account_id
+                )
+            )
+            .scalars()
+            .all()
+        )
+    assert versions, "expected at least one snapshot to be written"
+
+    replayed = AccountQuotaState()
+    for e in store.load_stream(account_id):
+        replayed = apply_event(replayed, e)
+
+    state, version = svc._hydrate(account_id)
+    assert state == replayed
+    assert version == 8
+    assert state.used == {"api_calls": 7}
+
+
+def test_snapshots_from_other_fold_versions_are_ignored(monkeypatch) -> None:
+    account_id = f"snap-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=2)
+
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    _record(svc, account_id, 4)
+    assert svc.snapshots.load_latest(account_id) is not None
+
+    monkeypatch.setattr("app.infra.snapshots.store.FOLD_VERSION", 999)
+    assert svc.snapshots.load_latest(account_id) is None
+
+    state, version = svc._hydrate(account_id)
+    assert version == 5
+    assert state.used == {"api_calls": 4}
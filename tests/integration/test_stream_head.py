@@ -0,0 +1,62 @@
+from uuid import uuid4
+
+import pytest
+
+from app.domain.errors import ConcurrencyConflict
+from app.domain.events import EventEnvelope
+from app.infra.event_store.repository import SqlAlchemyEventStore
+
+
+def _created() -> EventEnvelope:
+    return EventEnvelope(
+        event_type="AccountCreated",
+        schema_version=1,
+        occurred_at="now",
+        payload={"plan_id": "basic", "period": "2026-01"},
+    )
+
+
+def _usage(key: str) -> EventEnvelope:
+    return EventEnvelope(
+        event_type="UsageRecorded",
+        schema_version=2,
+        occurred_at="2026-01-28T01:00:00Z",
+        payload={"meter": "api_calls", "units": 1, "source": "api"},
+        idempotency_key=key,
+    )
+
+
+def test_stale_expected_version_is_a_conflict() -> None:
+    stream_id = f"head-{uuid4().hex[:8]}"
+    store = SqlAlchemyEventStore()
+    assert store.append(stream_id, 0, [_created()]) == 1
+
+    with pytest.raises(ConcurrencyConflict):
+        store.append(stream_id, 0, [_created()])
+
+    assert store.append(stream_id, 1, [_usage("k1")]) == 2
+    with pytest.raises(ConcurrencyConflict):
+        store.append(stream_id, 1, [_usage("k2")])
+
+
+def test_retry_with_same_key_replays_original_version() -> None:
+    stream_id = f"head-{uuid4().hex[:8]}"
+    store = SqlAlchemyEventStore()
+    store.append(stream_id, 0, [_created()])
+    assert store.append(stream_id, 1, [_usage("k1")]) == 2
+    assert store.append(stream_id, 2, [_usage("k2")]) == 3
+
+    # A retry carrying a stale expected_version is still recognised as a replay.
+    assert store.append(stream_id, 1, [_usage("k1")]) == 2
+    assert len(store.load_stream(stream_id)) == 3
+
+
+def test_multi_event_append_advances_head_once() -> None:
+    stream_id = f"head-{uuid4().hex[:8]}"
+    store = SqlAlchemyEventStore()
+    assert store.append(stream_id, 0, [_created(), _usage("a"), _usage("b")]) == 3
+    assert [e.event_type for e in store.load_stream(stream_id)] == [
+        "AccountCreated",
+        "UsageRecorded",
+        "UsageRecorded",
+    ]
@@ -0,0 +1,38 @@
+from uuid import uuid4
+
+import pytest
+
+from app.domain.commands import CreateAccount, RecordUsage
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.services.account_service import AccountService
+from app.services.unit_of_work import RoundTripBudgetExceeded
+
+
+def _usage(account_id: str, key: str) -> RecordUsage:
+    return RecordUsage(account_id, "api_calls", 1, "2026-01-28T01:00:00Z", key)
+
+
+def test_usage_write_round_trips_do_not_grow_with_stream() -> None:
+    account_id = f"uow-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=0)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+
+    counts = []
+    for i in range(5):
+        svc.record_usage(_usage(account_id, f"k{i}"))
+        counts.append(svc.executor.last_round_trips)
+
+    assert len(set(counts)) == 1
+    assert counts[0] <= 10
+
+
+def test_round_trip_budget_rolls_back_command() -> None:
+    account_id = f"uow-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), snapshot_every=0)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+
+    capped = AccountService(SqlAlchemyEventStore(), snapshot_every=0, max_round_trips=2)
+    with pytest.raises(RoundTripBudgetExceeded):
+        capped.record_usage(_usage(account_id, "k1"))
+
+    assert len(svc.store.load_stream(account_id)) == 1
@@ -0,0 +1,71 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _item(account_id: str, key: str, units: int = 1) -> dict:
+    return {
+        "account_id": account_id,
+        "meter": "api_calls",
+        "units": units,
+        "occurred_at": "2026-01-28T01:00:00Z",
+        "idempotency_key": key,
+    }
+
+
+def test_batch_reports_per_item_results() -> None:
+    client = TestClient(app)
+    a, b, suspended = (f"batch-{uuid4().hex[:8]}" for _ in range(3))
+    for account_id in (a, b, suspended):
+        client.post(
+            "/v1/accounts",
+            json={"account_id": account_id, "initial_plan_id": "basic", "period": "2026-01"},
+        )
+    client.post(f"/v1/accounts/{suspended}/suspend", json={"reason": "manual"})
+    client.post(
+        f"/v1/accounts/{a}/usage",
+        headers={"Idempotency-Key": "seen"},
+        json={"meter": "api_calls", "units": 1, "occurred_at": "2026-01-28T01:00:00Z"},
+    )
+
+    r = client.post(
+        "/v1/usage:batch",
+        json={
+            "items": [
+                _item(a, "a1", 2),
+                _item(b, "b1", 3),
+                _item(a, "seen"),
+                _item(a, "a1", 2),
+                _item(suspended, "s1"),
+                _item("batch-missing", "m1"),
+                _item(b, "b2", 0),
+                _item(a, "a2", 5),
+            ]
+        },
+    )
+    assert r.status_code == 200, r.text
+    results = r.json()["results"]
+
+    assert [x["status"] for x in results] == [
+        "accepted",
+        "accepted",
+        "duplicate",
+        "duplicate",
+        "rejected",
+        "rejected",
+        "rejected",
+        "accepted",
+    ]
+    assert results[0]["stream_version"] == 3
+    assert results[2]["stream_version"] == 2
+    assert results[3]["stream_version"] == 3
+    assert results[7]["stream_version"] == 4
+    assert "suspended" in results[4]["error"]
+    assert results[5]["error"] == "Account does not exist"
+
+    assert client.get(f"/v1/accounts/{a}").json()["used"]["api_calls"] == 8
+    s = client.get(f"/v1/accounts/{b}").json()
+    assert s["used"]["api_calls"] == 3
+    assert s["stream_version"] == 2
@@ -0,0 +1,136 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app.domain.commands import CreateAccount, RecordUsage
+from app.infra.db.dialect import upsert_insert
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.feed import head_position
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.projections.models import ProjectorCheckpoint, UsageRollup
+from app.infra.projections.runner import ProjectorRunner
+from app.infra.projections.usage_rollups import UsageRollupProjector
+from app.main import app
+from app.services.account_service import AccountService
+from app.tools.backfill_rollups import backfill
+
+USAGE = [
+    ("api_calls", 2, "2026-01-28T01:05:00Z"),
+    ("api_calls", 3, "2026-01-28T01:59:59Z"),
+    ("storage_mb", 7, "2026-01-28T01:30:00Z"),
+    ("api_calls", 1, "2026-01-28T02:00:00Z"),
+    ("api_calls", 4, "2026-01-29T23:00:00+02:00"),  # 21:00 UTC
+]
+
+
+def _account(client: TestClient) -> str:
+    account_id = f"roll-{uuid4().hex[:8]}"
+    client.post(
+        "/v1/accounts",
+        json={"account_id": account_id, "initial_plan_id": "basic", "period": "2026-01"},
+    )
+    for i, (meter, units, occurred_at) in enumerate(USAGE):
+        r = client.post(
+            f"/v1/accounts/{account_id}/usage",
+            headers={"Idempotency-Key": f"u{i}"},
+            json={"meter": meter, "units": units, "occurred_at": occurred_at},
+        )
+        assert r.status_code == 200
+    return account_id
+
+
+def _buckets(client: TestClient, account_id: str, **params) -> list[tuple]:
+    r = client.get(f"/v1/accounts/{account_id}/usage", params=params)
+    assert r.status_code == 200, r.text
+    return [(b["start"], b["meter"], b["units"], b["events"]) for b in r.json()["buckets"]]
+
+
+def test_hourly_and_daily_rollups() -> None:
+    client = TestClient(app)
+    account_id = _account(client)
+    window = {"from": "2026-01-28T00:00:00Z", "to": "2026-02-01T00:00:00Z"}
+
+    assert _buckets(client, account_id, **window) == [
+        ("2026-01-28T01:00:00Z", "api_calls", 5, 2),
+        ("2026-01-28T01:00:00Z", "storage_mb", 7, 1),
+        ("2026-01-28T02:00:00Z", "api_calls", 1, 1),
+        ("2026-01-29T21:00:00Z", "api_calls", 4, 1),
+    ]
+    assert _buckets(client, account_id, granularity="day", meter="api_calls", **window) == [
+        ("2026-01-28T00:00:00Z", "api_calls", 6, 3),
+        ("2026-01-29T00:00:00Z", "api_calls", 4, 1),
+    ]
+    # `from` is rounded down to its bucket; `to` is exclusive.
+    assert _buckets(
+        client, account_id, **{"from": "2026-01-28T01:45:00Z", "to": "2026-01-28T02:00:00Z"}
+    ) == [
+        ("2026-01-28T01:00:00Z", "api_calls", 5, 2),
+        ("2026-01-28T01:00:00Z", "storage_mb", 7, 1),
+    ]
+
+
+def test_usage_query_validation() -> None:
+    client = TestClient(app)
+    account_id = _account(client)
+
+    assert client.get("/v1/accounts/nope-" + uuid4().hex[:8] + "/usage").status_code == 404
+    for params in (
+        {"from": "yesterday"},
+        {"from": "2026-01-02T00:00:00Z", "to": "2026-01-01T00:00:00Z"},
+        {"from": "2025-01-01T00:00:00Z", "to": "2026-01-01T00:00:00Z"},  # too many hours
+        {"granularity": "minute"},
+    ):
+        r = client.get(f"/v1/accounts/{account_id}/usage", params=params)
+        assert r.status_code == 422, params
+
+    r = client.get(
+        f"/v1/accounts/{account_id}/usage",
+        params={"granularity": "day", "from": "2025-01-01T00:00:00Z", "to": "2026-02-01T00:00:00Z"},
+    )
+    assert r.status_code == 200
+
+
+def test_backfill_rebuilds_rollups_from_events() -> None:
+    client = TestClient(app)
+    account_id = _account(client)
+    window = {"from": "2026-01-28T00:00:00Z", "to": "2026-02-01T00:00:00Z"}
+    expected = _buckets(client, account_id, **window)
+
+    with SessionLocal() as session:
+        session.execute(delete(UsageRollup).where(UsageRollup.account_id == account_id))
+        session.commit()
+    assert _buckets(client, account_id, **window) == []
+
+    stats = backfill([account_id])
+    assert (stats.accounts, stats.events) == (1, len(USAGE))
+    assert _buckets(client, account_id, **window) == expected
+
+    backfill([account_id])  # re-running replaces rather than adds
+    assert _buckets(client, account_id, **window) == expected
+
+
+def test_projector_maintains_rollups_in_async_mode() -> None:
+    # Start the projector at the current head: everything before it was rolled up inline.
+    with SessionLocal() as session:
+        session.execute(
+            upsert_insert(session, ProjectorCheckpoint.__table__)
+            .values(name=UsageRollupProjector.name, position=head_position(session))
+            .on_conflict_do_update(
+                index_elements=["name"], set_={"position": head_position(session)}
+            )
+        )
+        session.commit()
+
+    account_id = f"roll-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(inline_projections=False), group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    for i in range(3):
+        svc.record_usage(RecordUsage(account_id, "api_calls", 2, "2026-01-28T01:00:00Z", f"u{i}"))
+
+    client = TestClient(app)
+    window = {"from": "2026-01-28T00:00:00Z", "to": "2026-01-29T00:00:00Z"}
+    assert _buckets(client, account_id, **window) == []
+
+    assert ProjectorRunner(UsageRollupProjector(), gap_timeout=0).catch_up() >= 4
+    assert _buckets(client, account_id, **window) == [("2026-01-28T01:00:00Z", "api_calls", 6, 3)]
@@ -0,0 +1,232 @@
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.domain.commands import CreateAccount, RecordUsage, ShardUsage, SuspendAccount
+from app.domain.errors import InvariantViolation
+from app.infra.db.session import SessionLocal
+from app.infra.event_store.models import Event
+from app.infra.event_store.repository import SqlAlchemyEventStore
+from app.infra.event_store.usage_shards import pick_shard, shard_stream_ids
+from app.infra.metrics import Metrics
+from app.infra.plans.catalog import get_plan_catalog
+from app.infra.plans.models import PlanRecord
+from app.infra.projections.usage_rollups import RollupQuery
+from app.main import app
+from app.services.account_service import AccountService
+from app.services.stream_locks import KeyedLocks
+from app.services.unit_of_work import CommandExecutor, ConflictRetry
+
+
+def _plan(limits: dict[str, int]) -> str:
+    plan_id = f"plan-{uuid4().hex[:8]}"
+    with SessionLocal() as session:
+        session.add(PlanRecord(plan_id=plan_id, limits=limits))
+        session.commit()
+    get_plan_catalog().invalidate()
+    return plan_id
+
+
+def _sharded(shards: int = 4, plan_id: str = "basic") -> tuple[AccountService, str]:
+    account_id = f"shard-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), group_commit=None)
+    svc.create_account(CreateAccount(account_id, plan_id, "2026-01"))
+    svc.shard_usage(ShardUsage(account_id, shards))
+    return svc, account_id
+
+
+def _usage(account_id: str, key: str, units: int = 1) -> RecordUsage:
+    return RecordUsage(account_id, "api_calls", units, "2026-01-28T02:00:00Z", key)
+
+
+def _events_per_stream(account_id: str, shards: int) -> dict[str, int]:
+    with SessionLocal() as session:
+        rows = session.execute(
+            select(Event.stream_id, func.count())
+            .where(Event.stream_id.in_([account_id, *shard_stream_ids(account_id, shards)]))
+            .group_by(Event.stream_id)
+        )
+        return {sid: n for sid, n in rows}
+
+
+def test_usage_is_spread_over_shards_and_merged_on_read() -> None:
+    svc, account_id = _sharded()
+    svc.record_usage(RecordUsage(account_id, "storage_mb", 7, "2026-01-28T02:00:00Z", "s"))
+    versions = [svc.record_usage(_usage(account_id, f"u{i}", i)) for i in range(1, 21)]
+
+    per_stream = _events_per_stream(account_id, 4)
+    # Created and sharded stay on the account's stream; the usage went to the shards.
+    assert per_stream.pop(account_id) == 2
+    assert sum(per_stream.values()) == 21 and len(per_stream) > 1
+
+    view = svc.get_state(account_id)
+    assert view["used"] == {"api_calls": 210, "storage_mb": 7}
+    assert view["usage_shards"] == 4
+    # The account version counts the appends on its stream and on every shard.
+    assert view["stream_version"] == 2 + 21 == max(versions)
+    assert len(set(versions)) == len(versions)
+
+    # A retry replays the version the command produced, even from a fresh process.
+    fresh = AccountService(SqlAlchemyEventStore(), group_commit=None)
+    assert fresh.record_usage(_usage(account_id, "u5", 5)) == versions[4]
+    assert fresh.get_state(account_id)["used"]["api_calls"] == 210
+
+    usage = svc.usage_over_time(
+        account_id,
+        RollupQuery(datetime(2026, 1, 28, tzinfo=UTC), datetime(2026, 1, 29, tzinfo=UTC), "day"),
+    )
+    assert {b["meter"]: b["units"] for b in usage["buckets"]} == {"api_calls": 210, "storage_mb": 7}
+
+
+def test_shards_stay_within_the_plan_limit_together() -> None:
+    svc, account_id = _sharded(shards=3, plan_id=_plan({"api_calls": 10}))
+
+    accepted = 0
+    for i in range(15):
+        try:
+            svc.record_usage(_usage(account_id, f"u{i}"))
+            accepted += 1
+        except InvariantViolation as e:
+            assert "limit exceeded" in str(e)
+
+    # Each shard holds its share and a full one hands the command to the next.
+    assert accepted == 10
+    view = svc.get_state(account_id)
+    assert (view["used"], view["remaining"]) == ({"api_calls": 10}, {"api_calls": 0})
+
+
+def test_usage_larger_than_a_share_goes_to_the_account_stream() -> None:
+    svc, account_id = _sharded(shards=8, plan_id=_plan({"api_calls": 1000}))
+
+    # 200 units fit the plan but not a 125-unit share.
+    version = svc.record_usage(_usage(account_id, "big", 200))
+    assert _events_per_stream(account_id, 8) == {account_id: 3}
+    view = svc.get_state(account_id)
+    assert (view["used"], view["stream_version"]) == ({"api_calls": 200}, version)
+    fresh = AccountService(SqlAlchemyEventStore(), group_commit=None)
+    assert fresh.record_usage(_usage(account_id, "big", 200)) == version
+
+    # The shards split what is left, and the account as a whole stays within the limit.
+    with pytest.raises(InvariantViolation, match="limit exceeded"):
+        svc.record_usage(_usage(account_id, "too-big", 801))
+    assert svc.get_state(account_id)["remaining"] == {"api_calls": 800}
+
+
+def test_usage_spanning_nearly_full_shards_is_accepted() -> None:
+    svc, account_id = _sharded(shards=4, plan_id=_plan({"api_calls": 8}))
+    # One unit short of each 2-unit share.
+    for k in range(4):
+        svc.record_usage(
+            _usage(account_id, next(f"u{i}" for i in range(100) if pick_shard(f"u{i}", 4) == k))
+        )
+
+    svc.record_usage(_usage(account_id, "two", 2))
+    view = svc.get_state(account_id)
+    assert (view["used"], view["remaining"]) == ({"api_calls": 6}, {"api_calls": 2})
+    with pytest.raises(InvariantViolation, match="limit exceeded"):
+        svc.record_usage(_usage(account_id, "three", 3))
+
+
+def test_lifecycle_events_gate_sharded_usage() -> None:
+    client = TestClient(app)
+    svc, account_id = _sharded()
+
+    def use(key: str, units: int = 1):
+        return client.post(
+            f"/v1/accounts/{account_id}/usage",
+            headers={"Idempotency-Key": key},
+            json={"meter": "api_calls", "units": units, "occurred_at": "2026-01-28T01:00:00Z"},
+        )
+
+    assert use("a", 3).status_code == 200
+    assert (
+        client.post(f"/v1/accounts/{account_id}/suspend", json={"reason": "x"}).status_code == 200
+    )
+    assert use("b").status_code == 409
+    assert client.post(f"/v1/accounts/{account_id}/reinstate").status_code == 200
+    assert (
+        client.post(f"/v1/accounts/{account_id}/period", json={"period": "2026-02"}).status_code
+        == 200
+    )
+    assert client.get(f"/v1/accounts/{account_id}").json()["used"] == {}
+    assert use("c", 2).status_code == 200
+
+    state = client.get(f"/v1/accounts/{account_id}").json()
+    assert (state["period"], state["used"]) == ("2026-02", {"api_calls": 2})
+    r = client.post(f"/v1/accounts/{account_id}/usage-shards", json={"shards": 2})
+    assert r.status_code == 409, r.text
+
+
+class _SuspendingExecutor(CommandExecutor):
+    """The account is suspended by another process right after the first hydration."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.raced = False
+
+    def _decide_and_append(self, session, hydrated, stream_id, cmd, require_exists):
+        if not self.raced:
+            self.raced = True
+            AccountService(SqlAlchemyEventStore(), group_commit=None).suspend_account(
+                SuspendAccount(stream_id, "raced")
+            )
+        return super()._decide_and_append(session, hydrated, stream_id, cmd, require_exists)
+
+
+def test_usage_decided_before_a_suspension_conflicts_and_is_rejected() -> None:
+    svc, account_id = _sharded()
+    executor = _SuspendingExecutor(
+        store=SqlAlchemyEventStore(metrics=Metrics(enabled=True)),
+        snapshot_every=0,
+        retry=ConflictRetry(attempts=3, base_ms=1, max_ms=2),
+        stream_locks=KeyedLocks(),  # not the lock the suspension takes
+    )
+
+    with pytest.raises(InvariantViolation, match="suspended"):
+        executor.execute(account_id, _usage(account_id, "late"))
+    assert "quota_ledger_conflict_retries_total 1\n" in executor.metrics.render()
+    assert svc.get_state(account_id)["used"] == {}
+
+
+def test_batches_record_sharded_usage_per_command() -> None:
+    svc, account_id = _sharded()
+    plain = f"plain-{uuid4().hex[:8]}"
+    svc.create_account(CreateAccount(plain, "basic", "2026-01"))
+
+    results = svc.record_usage_batch(
+        [
+            _usage(account_id, "k1", 2),
+            _usage(plain, "k1", 5),
+            _usage(account_id, "k2", 3),
+            _usage(account_id, "k1", 2),
+        ]
+    )
+    assert [r.status for r in results] == ["accepted", "accepted", "accepted", "duplicate"]
+    assert results[3].stream_version == results[0].stream_version
+    assert svc.record_usage_batch([_usage(account_id, "k2", 3)])[0].status == "duplicate"
+    assert svc.get_state(account_id)["used"] == {"api_calls": 5}
+    assert svc.get_state(plain)["used"] == {"api_calls": 5}
+
+
+def test_as_of_reads_are_refused_once_sharded() -> None:
+    client = TestClient(app)
+    account_id = f"shard-{uuid4().hex[:8]}"
+    svc = AccountService(SqlAlchemyEventStore(), group_commit=None)
+    svc.create_account(CreateAccount(account_id, "basic", "2026-01"))
+    svc.record_usage(_usage(account_id, "before", 2))
+    svc.shard_usage(ShardUsage(account_id, 4))
+    svc.record_usage(_usage(account_id, "after", 3))
+
+    # Before sharding the account's own stream holds everything.
+    r = client.get(f"/v1/accounts/{account_id}", params={"as_of": "2"})
+    assert (r.status_code, r.json()["used"]) == (200, {"api_calls": 2})
+
+    live = client.get(f"/v1/accounts/{account_id}").json()
+    r = client.get(f"/v1/accounts/{account_id}", params={"as_of": str(live["stream_version"])})
+    assert r.status_code == 422 and "sharded" in r.json()["detail"]
+    [audited] = svc.states_as_of([account_id], 10)
+    assert (audited["account_id"], audited["as_of"]) == (account_id, 10)
+    assert "sharded" in audited["error"] and "used" not in audited
@@ -1,9 +1,9 @@
 import pytest
 
-from app.domain.aggregate import apply_event, decide
-from app.domain.commands import CreateAccount, RecordUsage, SuspendAccount
+from app.domain.aggregate import apply_event, decide, remaining_quota, shard_allowance
+from app.domain.commands import CreateAccount, RecordUsage, ShardUsage, SuspendAccount
 from app.domain.errors import InvariantViolation, NotFound
-from app.domain.types import AccountQuotaState
+from app.domain.types import AccountQuotaState, Plan
 
 
 def test_cannot_record_usage_before_create() -> None:
@@ -31,3 +31,40 @@ def test_cannot_record_usage_when_suspended() -> None:
 
     with pytest.raises(InvariantViolation):
         decide(state, RecordUsage("a1", "api_calls", 1, "2026-01-01T00:00:00Z", "k1"))
+
+
+def test_usage_over_plan_limit_is_rejected() -> None:
+    plan = Plan(plan_id="basic", limits={"api_calls": 10})
+    state = AccountQuotaState()
+    for e in decide(state, CreateAccount("a1", "basic", "2026-01")):
+        state = apply_event(state, e)
+    for e in decide(state, RecordUsage("a1", "api_calls", 10, "2026-01-01T00:00:00Z", "k1"), plan):
+        state = apply_event(state, e)
+
+    assert remaining_quota(state, plan) == {"api_calls": 0}
+    with pytest.raises(InvariantViolation):
+        decide(state, RecordUsage("a1", "api_calls", 1, "2026-01-01T00:00:00Z", "k2"), plan)
+    # Unlimited meters and unknown plans are not checked.
+    decide(state, RecordUsage("a1", "storage_mb", 99, "2026-01-01T00:00:00Z", "k3"), plan)
+    decide(state, RecordUsage("a1", "api_calls", 1, "2026-01-01T00:00:00Z", "k4"))
+
+
+def test_usage_shards_can_only_grow() -> None:
+    state = AccountQuotaState()
+    for e in decide(state, CreateAccount("a1", "basic", "2026-01")):
+        state = apply_event(state, e)
+    for e in decide(state, ShardUsage("a1", 4)):
+        state = apply_event(state, e)
+
+    assert state.usage_shards == 4
+    for shards in (4, 2):
+        with pytest.raises(InvariantViolation):
+            decide(state, ShardUsage("a1", shards))
+    decide(state, ShardUsage("a1", 8))
+
+
+def test_shard_allowances_split_what_the_stream_left() -> None:
+    assert [shard_allowance(10, 0, 4, k) for k in range(4)] == [3, 3, 2, 2]
+    assert sum(shard_allowance(10, 3, 4, k) for k in range(4)) == 7
+    assert [shard_allowance(10, 12, 3, k) for k in range(3)] == [0, 0, 0]
+    assert shard_allowance(None, 5, 4, 0) is None
@@ -0,0 +1,22 @@
+from benchmarks.harness import compare
+
+
+def test_compare_flags_only_gated_regressions_beyond_threshold() -> None:
+    baseline = {
+        "append[1]": {"p50_ms": 2.0, "p95_ms": 4.0, "ops_per_s": 500.0},
+        "replay.fold": {"events_per_s": 1_000_000.0},
+        "retry.cached": {"p50_ms": 0.001},
+    }
+    current = {
+        "append[1]": {"p50_ms": 3.0, "p95_ms": 40.0, "ops_per_s": 450.0},
+        "replay.fold": {"events_per_s": 500_000.0},
+        "retry.cached": {"p50_ms": 0.004},  # 4x, but far below timer noise
+    }
+
+    regressions = compare(baseline, current, threshold=0.2)
+
+    assert [line.split(":")[0] for line in regressions] == [
+        "append[1].p50_ms",
+        "replay.fold.events_per_s",
+    ]
+    assert compare(baseline, baseline, threshold=0.0) == []
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from app.domain.events import EventEnvelope
+from app.domain.upcasting import upcast
+from app.infra.event_store.codec import COMPACT, JSON, LAYOUTS, decode_payload, encode_payload
+
+
+@pytest.mark.parametrize(
+    ("event_type", "version", "payload"),
+    [
+        ("AccountCreated", 1, {"plan_id": "basic", "period": "2026-01"}),
+        ("PlanChanged", 1, {"plan_id": "pro"}),
+        ("UsageRecorded", 1, {"meter": "api_calls", "units": 3}),
+        ("UsageRecorded", 2, {"meter": "storage_mb", "units": -(2**63), "source": "api"}),
+        ("PeriodReset", 1, {"period": "2026-02"}),
+        ("AccountSuspended", 1, {"reason": "überfällig"}),
+        ("AccountReinstated", 1, {}),
+    ],
+)
+def test_compact_round_trip(event_type: str, version: int, payload: dict) -> None:
+    codec, as_json, packed = encode_payload(event_type, version, payload, COMPACT)
+    assert (codec, as_json) == (COMPACT, None)
+    assert decode_payload(codec, event_type, version, None, packed) == payload
+
+
+def test_compact_usage_is_smaller_than_json() -> None:
+    payload = {"meter": "api_calls", "units": 1, "source": "api"}
+    _, _, packed = encode_payload("UsageRecorded", 2, payload, COMPACT)
+    assert packed is not None
+    assert len(packed) * 2 <= len(json.dumps(payload))
+
+
+@pytest.mark.parametrize(
+    ("event_type", "version", "payload"),
+    [
+        ("UsageRecorded", 2, {"meter": "api_calls", "units": 1}),  # missing key
+        ("UsageRecorded", 2, {"meter": "api_calls", "units": 1, "source": "api", "x": 1}),
+        ("UsageRecorded", 2, {"meter": "api_calls", "units": "1", "source": "api"}),
+        ("UsageRecorded", 2, {"meter": "api_calls", "units": True, "source": "api"}),
+        ("UsageRecorded", 2, {"meter": "api_calls", "units": 2**63, "source": "api"}),
+        ("AccountSuspended", 1, {"reason": None}),
+        ("AccountSuspended", 1, {"reason": "x" * 70_000}),
+        ("UsageRecorded", 3, {"meter": "api_calls", "units": 1}),  # no layout
+    ],
+)
+def test_unrepresentable_payloads_fall_back_to_json(
+    event_type: str, version: int, payload: dict
+) -> None:
+    assert encode_payload(event_type, version, payload, COMPACT) == (JSON, payload, None)
+
+
+def test_json_codec_stores_json() -> None:
+    payload = {"plan_id": "basic", "period": "2026-01"}
+    assert encode_payload("AccountCreated", 1, payload, JSON) == (JSON, payload, None)
+    assert ("AccountCreated", 1) in LAYOUTS
+
+
+def test_unknown_codec_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        decode_payload("msgpack", "PlanChanged", 1, None, b"")
+
+
+def test_usage_v1_is_upcast_to_v2() -> None:
+    e = EventEnvelope("UsageRecorded", 1, "now", {"meter": "api_calls", "units": 2}, "k1")
+    up = upcast(e)
+    assert up.schema_version == 2
+    assert up.payload == {"meter": "api_calls", "units": 2, "source": "api"}
+    assert up.idempotency_key == "k1"
+    assert e.payload == {"meter": "api_calls", "units": 2}  # not mutated
+
+
+def test_current_events_are_not_copied() -> None:
+    e = EventEnvelope("UsageRecorded", 2, "now", {"meter": "api_calls", "units": 2, "source": "x"})
+    assert upcast(e) is e
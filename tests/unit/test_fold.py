@@ -0,0 +1,77 @@
+import random
+from functools import reduce
+
+import pytest
+
+from app.domain.aggregate import apply_event
+from app.domain.events import EventEnvelope
+from app.domain.fold import StateFold, fold
+from app.domain.types import AccountQuotaState
+
+METERS = ["api_calls", "storage_mb"]
+
+
+def _random_event(rng: random.Random) -> EventEnvelope:
+    kind = rng.choices(
+        [
+            "AccountCreated",
+            "PlanChanged",
+            "UsageRecorded",
+            "PeriodReset",
+            "AccountSuspended",
+            "AccountReinstated",
+            "UsageSharded",
+            "Unknown",
+        ],
+        weights=[1, 2, 20, 2, 2, 2, 1, 1],
+    )[0]
+    if kind == "AccountCreated":
+        payload = {"plan_id": rng.choice(["basic", "pro"]), "period": "2026-01"}
+    elif kind == "PlanChanged":
+        payload = {"plan_id": rng.choice(["basic", "pro", "team"])}
+    elif kind == "UsageRecorded":
+        payload = {"meter": rng.choice(METERS), "units": rng.randint(1, 50), "source": "api"}
+    elif kind == "PeriodReset":
+        payload = {"period": f"2026-{rng.randint(2, 12):02d}"}
+    elif kind == "UsageSharded":
+        payload = {"shards": rng.randint(1, 8)}
+    else:
+        payload = {}
+    # Mostly known schema versions, sometimes one without a dedicated handler.
+    version = rng.choice([1, 1, 1, 2, 3])
+    return EventEnvelope(
+        event_type=kind,  # type: ignore[arg-type]
+        schema_version=version,
+        occurred_at="2026-01-28T01:00:00Z",
+        payload=payload,
+    )
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fold_matches_apply_event(seed: int) -> None:
+    rng = random.Random(seed)
+    events = [_random_event(rng) for _ in range(rng.randint(0, 60))]
+
+    assert fold(events) == reduce(apply_event, events, AccountQuotaState())
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_fold_from_a_snapshot_state_matches_and_does_not_mutate_it(seed: int) -> None:
+    rng = random.Random(seed)
+    start = AccountQuotaState(
+        exists=True, status="active", plan_id="basic", period="2026-01", used={"api_calls": 7}
+    )
+    events = [_random_event(rng) for _ in range(rng.randint(1, 40))]
+
+    assert fold(events, start) == reduce(apply_event, events, start)
+    assert start.used == {"api_calls": 7}
+
+
+def test_accumulator_freezes_independent_copies() -> None:
+    acc = StateFold()
+    acc.apply(EventEnvelope("AccountCreated", 1, "now", {"plan_id": "basic", "period": "2026-01"}))
+    first = acc.freeze()
+    acc.apply(EventEnvelope("UsageRecorded", 2, "now", {"meter": "api_calls", "units": 3}))
+
+    assert first.used == {}
+    assert acc.freeze().used == {"api_calls": 3}
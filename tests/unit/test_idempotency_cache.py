@@ -0,0 +1,50 @@
+import time
+
+from app.infra.event_store.idempotency import BloomFilter, IdempotencyCache
+
+
+def test_lru_eviction_and_counters() -> None:
+    cache = IdempotencyCache(max_entries=2, ttl_seconds=60)
+    cache.put("s", "a", 1)
+    cache.put("s", "b", 2)
+    assert cache.get("s", "a") == 1  # "a" is now most recent
+    cache.put("s", "c", 3)  # evicts "b"
+
+    assert cache.get("s", "b") is None
+    assert cache.get("s", "c") == 3
+    assert cache.stats() == {
+        "size": 2,
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+        "expirations": 0,
+        "bloom_skips": 0,
+    }
+
+
+def test_entries_expire() -> None:
+    cache = IdempotencyCache(max_entries=10, ttl_seconds=0.01)
+    cache.put("s", "a", 1)
+    time.sleep(0.02)
+    assert cache.get("s", "a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_bloom_only_vouches_for_streams_it_tracks() -> None:
+    cache = IdempotencyCache(bloom_bits=1024)
+    assert not cache.definitely_new("s", "a")  # no filter for the stream yet
+
+    cache.put("s", "a", 1)
+    assert not cache.definitely_new("s", "a")
+    assert cache.definitely_new("s", "b")
+
+    cache.remember("s", "b")
+    assert not cache.definitely_new("s", "b")
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(bits=4096)
+    keys = [f"k{i}" for i in range(200)]
+    for k in keys:
+        bloom.add(k)
+    assert all(k in bloom for k in keys)
@@ -0,0 +1,117 @@
+import socket
+import threading
+import time
+
+from app.infra.invalidation import (
+    MAX_PAYLOAD,
+    Invalidation,
+    MemoryInvalidationBus,
+    SocketInvalidationBus,
+    decode,
+    pack,
+    subscribe_caches,
+)
+from app.infra.metrics import Metrics
+from app.infra.plans.catalog import PlanCatalog
+from app.infra.projections.state_cache import AccountStateCache
+
+
+def test_messages_are_packed_into_bounded_payloads() -> None:
+    bus = MemoryInvalidationBus(metrics=Metrics(enabled=True))
+    sent: list[Invalidation] = []
+    bus._send = sent.extend
+    bus.publish([(f"acct-{i:04d}", i) for i in range(1000)])
+    assert len(sent) == 16 and sum(len(m.streams) for m in sent) == 1000
+
+    payloads, oversize = pack(sent)
+    assert oversize == 0 and len(payloads) > 1
+    assert all(len(p) <= MAX_PAYLOAD for p, _ in payloads)
+    assert [m for p, _ in payloads for m in decode(p)] == sent
+
+    huge = Invalidation("o", 1, 0.0, tuple((f"{i:0200d}", 1) for i in range(64)))
+    assert pack([huge]) == ([], 1)
+
+
+def test_gaps_reset_the_subscribers_and_are_counted() -> None:
+    metrics = Metrics(enabled=True)
+    bus = MemoryInvalidationBus(metrics=metrics)
+    cache = AccountStateCache(max_entries=10, ttl_seconds=60)
+    subscribe_caches(bus, cache, PlanCatalog())
+    cache.put("a", 1, {"stream_version": 1})
+    cache.put("b", 1, {"stream_version": 1})
+
+    sent_at = time.time() - 0.3
+    bus.deliver([Invalidation("other", 1, sent_at, (("a", 2),))])
+    assert cache.get("a") is None and cache.get("b") is not None
+
+    # Messages 2 and 3 never arrived: nothing cached can be trusted any more.
+    bus.deliver([Invalidation("other", 4, sent_at, (("c", 2),))])
+    assert cache.stats()["size"] == 1  # only the floor for "c"
+
+    text = metrics.render()
+    assert 'quota_ledger_invalidations_dropped_total{bus="memory",reason="gap"} 2\n' in text
+    assert 'quota_ledger_invalidations_received_total{bus="memory"} 2\n' in text
+    assert 'quota_ledger_invalidation_lag_seconds_bucket{bus="memory",le="0.25"} 0\n' in text
+    assert 'quota_ledger_invalidation_lag_seconds_bucket{bus="memory",le="0.5"} 2\n' in text
+
+
+def test_concurrent_publishes_are_not_mistaken_for_gaps(tmp_path) -> None:
+    stop = threading.Event()
+    memory = MemoryInvalidationBus(metrics=Metrics(enabled=True))
+    sender = SocketInvalidationBus(tmp_path, metrics=Metrics(enabled=True), poll_s=0.05)
+    receiver = SocketInvalidationBus(tmp_path, metrics=Metrics(enabled=True), poll_s=0.05)
+    resets: list[str] = []
+    received: list[Invalidation] = []
+    memory.subscribe(lambda m: None, lambda: resets.append("memory"))
+    receiver.subscribe(received.append, lambda: resets.append("socket"))
+
+    def publish(thread: int) -> None:
+        for i in range(200):
+            memory.publish([(f"acct-{thread}", i)])
+            # Paced, so the receiver's socket buffer never fills (that would be a real loss).
+            if i % 20 == 0:
+                sender.publish([(f"acct-{thread}", i)])
+                time.sleep(0.005)
+
+    try:
+        receiver.start(stop)
+        threads = [threading.Thread(target=publish, args=(t,)) for t in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        deadline = time.monotonic() + 5
+        while len(received) < 80 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop.set()
+
+    assert len(received) == 80
+    assert resets == []
+    for bus in (memory, receiver):
+        assert "quota_ledger_invalidations_dropped_total{" not in bus.metrics.render()
+
+
+def test_socket_bus_reaches_the_other_workers(tmp_path) -> None:
+    stop = threading.Event()
+    a = SocketInvalidationBus(tmp_path, metrics=Metrics(enabled=True), poll_s=0.05)
+    b = SocketInvalidationBus(tmp_path, metrics=Metrics(enabled=True), poll_s=0.05)
+    got: list[Invalidation] = []
+    done = threading.Event()
+    b.subscribe(lambda m: (got.append(m), done.set()), lambda: None)
+
+    # A socket file left by a worker that exited is cleaned up on the next publish.
+    stale = tmp_path / "gone.sock"
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    s.bind(str(stale))
+    s.close()
+
+    try:
+        a.start(stop)
+        b.start(stop)
+        a.publish([("acct", 7)])
+        assert done.wait(2)
+        assert [(m.origin, m.streams) for m in got] == [(a.origin, (("acct", 7),))]
+        assert not stale.exists()
+    finally:
+        stop.set()
@@ -0,0 +1,46 @@
+from app.infra.metrics import Metrics, server_timing_header, start_request_timings
+
+
+def test_disabled_metrics_are_noops() -> None:
+    m = Metrics(enabled=False)
+    assert m.stage("insert") is m.stage("commit")  # shared no-op, nothing allocated
+    with m.stage("insert"):
+        pass
+    m.events_appended.inc(3)
+    m.replay_events.observe(10)
+    assert "quota_ledger_events_appended_total 3" not in m.render()
+    assert "quota_ledger_replay_events_count" not in m.render()
+
+
+def test_render_prometheus_text() -> None:
+    m = Metrics(enabled=True)
+    m.events_appended.inc(2)
+    m.idempotent_hits.inc(1, "cache")
+    m.replay_events.observe(3)
+    m.replay_events.observe(700)
+
+    text = m.render()
+    assert "# TYPE quota_ledger_events_appended_total counter" in text
+    assert "quota_ledger_events_appended_total 2\n" in text
+    assert 'quota_ledger_idempotent_hits_total{source="cache"} 1\n' in text
+    assert "# TYPE quota_ledger_replay_events histogram" in text
+    assert 'quota_ledger_replay_events_bucket{le="1"} 0\n' in text
+    assert 'quota_ledger_replay_events_bucket{le="5"} 1\n' in text
+    assert 'quota_ledger_replay_events_bucket{le="+Inf"} 2\n' in text
+    assert "quota_ledger_replay_events_sum 703\n" in text
+    assert "quota_ledger_replay_events_count 2\n" in text
+
+
+def test_stage_feeds_histogram_and_request_timings() -> None:
+    m = Metrics(enabled=True)
+    timings = start_request_timings()
+    with m.stage("insert"):
+        pass
+    with m.stage("insert"):
+        pass
+
+    assert list(timings) == ["insert"]
+    assert 'quota_ledger_stage_seconds_count{stage="insert"} 2\n' in m.render()
+    assert server_timing_header({"insert": 1.5, "commit": 0.25}) == (
+        "insert;dur=1.500, commit;dur=0.250"
+    )
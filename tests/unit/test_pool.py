@@ -0,0 +1,69 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.infra.db.pool import TimedQueuePool, configure_engine, engine_options
+from app.infra.metrics import Metrics
+from app.settings import Settings
+
+
+@pytest.fixture
+def metrics(monkeypatch) -> Metrics:
+    m = Metrics(enabled=True)
+    monkeypatch.setattr("app.infra.db.pool.get_metrics", lambda: m)
+    return m
+
+
+def _engine(tmp_path, settings: Settings):
+    url = f"sqlite:///{tmp_path}/pool.db"
+    engine = create_engine(url, **engine_options(url, settings))
+    configure_engine(engine, settings, "test")
+    return engine
+
+
+def test_engine_options_follow_settings() -> None:
+    settings = Settings(db_pool_size=7, db_max_overflow=3, db_pre_ping="always")
+    opts = engine_options("postgresql+psycopg://u:p@h/db", settings)
+    assert (opts["poolclass"], opts["pool_size"], opts["max_overflow"]) == (TimedQueuePool, 7, 3)
+    assert opts["pool_pre_ping"] is True
+    assert "connect_args" not in opts
+
+    opts = engine_options("postgresql+psycopg://u:p@h/db", Settings(db_prepare_threshold=0))
+    assert opts["pool_pre_ping"] is False
+    assert opts["connect_args"] == {"prepare_threshold": 0}
+
+    # In-memory SQLite keeps its single-connection pool.
+    assert "poolclass" not in engine_options("sqlite://", settings)
+
+
+def test_idle_pre_ping_skips_recently_used_connections(tmp_path, metrics: Metrics) -> None:
+    engine = _engine(tmp_path, Settings(db_pre_ping="idle", db_pre_ping_idle_s=3600))
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    assert 'quota_ledger_pool_pings_total{pool="test"}' not in metrics.render()
+
+
+def test_idle_pre_ping_checks_connections_idle_for_long(tmp_path, metrics: Metrics) -> None:
+    engine = _engine(tmp_path, Settings(db_pre_ping="idle", db_pre_ping_idle_s=0.01))
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    time.sleep(0.02)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert 'quota_ledger_pool_pings_total{pool="test"} 1\n' in metrics.render()
+
+
+def test_pool_occupancy_waits_and_timeouts(tmp_path, metrics: Metrics) -> None:
+    engine = _engine(tmp_path, Settings(db_pool_size=1, db_max_overflow=0, db_pool_timeout_s=0.05))
+    with engine.connect():
+        assert 'quota_ledger_pool_checked_out{pool="test"} 1\n' in metrics.render()
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    text_ = metrics.render()
+    assert 'quota_ledger_pool_checked_out{pool="test"} 0\n' in text_
+    assert 'quota_ledger_pool_size{pool="test"} 1\n' in text_
+    assert 'quota_ledger_pool_timeouts_total{pool="sync"} 1\n' in text_
+    assert 'quota_ledger_pool_wait_seconds_count{pool="sync"} 2\n' in text_
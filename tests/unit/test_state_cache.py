@@ -0,0 +1,30 @@
+import time
+
+from app.infra.projections.state_cache import AccountStateCache
+
+
+def test_invalidation_blocks_older_versions() -> None:
+    cache = AccountStateCache(max_entries=10, ttl_seconds=60)
+    cache.put("a", 1, {"stream_version": 1})
+    assert cache.get("a") == {"stream_version": 1}
+
+    cache.invalidate("a", 2)
+    assert cache.get("a") is None
+
+    # A reader that loaded version 1 before the commit cannot put it back.
+    cache.put("a", 1, {"stream_version": 1})
+    assert cache.get("a") is None
+
+    cache.put("a", 2, {"stream_version": 2})
+    assert cache.get("a") == {"stream_version": 2}
+
+
+def test_entries_expire_and_evict() -> None:
+    cache = AccountStateCache(max_entries=1, ttl_seconds=0.01)
+    cache.put("a", 1, {"stream_version": 1})
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+    cache.put("a", 1, {"stream_version": 1})
+    cache.put("b", 1, {"stream_version": 1})
+    assert cache.stats()["size"] == 1
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from app.services.stream_locks import KeyedLocks
+from app.services.unit_of_work import ConflictRetry
+
+
+def test_same_key_runs_one_at_a_time_other_keys_do_not_wait() -> None:
+    locks = KeyedLocks()
+    inside: list[str] = []
+    overlaps: list[tuple[str, ...]] = []
+
+    def work(key: str) -> None:
+        with locks.hold(key):
+            inside.append(key)
+            overlaps.append(tuple(inside))
+            time.sleep(0.01)
+            inside.remove(key)
+
+    threads = [threading.Thread(target=work, args=(k,)) for k in ("a", "a", "a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(seen.count("a") <= 1 for seen in overlaps)
+    assert any(set(seen) == {"a", "b"} for seen in overlaps)
+    assert len(locks) == 0  # nothing kept once released
+
+
+def test_hold_many_takes_keys_in_order() -> None:
+    locks = KeyedLocks()
+    done: list[int] = []
+
+    def work(keys: list[str], n: int) -> None:
+        for _ in range(50):
+            with locks.hold_many(keys):
+                pass
+        done.append(n)
+
+    threads = [
+        threading.Thread(target=work, args=(["x", "y"], 1)),
+        threading.Thread(target=work, args=(["y", "x", "y"], 2)),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert sorted(done) == [1, 2]
+    assert len(locks) == 0
+
+
+def test_backoff_is_jittered_and_capped() -> None:
+    retry = ConflictRetry(attempts=5, base_ms=5, max_ms=20)
+    for attempt in range(6):
+        delays = [retry.delay(attempt) for _ in range(200)]
+        cap = min(20, 5 * 2**attempt) / 1000
+        assert all(0 <= d <= cap for d in delays)
+        assert len(set(delays)) > 1